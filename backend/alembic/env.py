@@ -22,10 +22,12 @@ from app.models import (  # noqa: F401
     content,
     coupon,
     order,
+    outbox,
     payment,
     points,
     product,
     returns,
+    search,
     shipping,
     user,
     wishlist,
@@ -0,0 +1,31 @@
+"""order number sequence
+
+Revision ID: 2e9b4c7d1a63
+Revises: 8d3f6a2b7c15
+Create Date: 2026-10-17 17:22:05.914420
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '2e9b4c7d1a63'
+down_revision: Union[str, None] = '8d3f6a2b7c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match app.utils.order_numbers.ORDER_NUMBER_BLOCK
+BLOCK_SIZE = 50
+
+
+def upgrade() -> None:
+    op.execute(f"CREATE SEQUENCE order_number_seq START WITH 1 INCREMENT BY {BLOCK_SIZE}")
+    # PFS + date (8) + sequence (6+) + check digit overflows 20 chars at 9 digits
+    op.alter_column('orders', 'order_number', type_=sa.String(length=32), existing_nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('orders', 'order_number', type_=sa.String(length=20), existing_nullable=False)
+    op.execute("DROP SEQUENCE order_number_seq")
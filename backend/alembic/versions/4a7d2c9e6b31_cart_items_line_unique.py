@@ -0,0 +1,46 @@
+"""cart items line unique
+
+Revision ID: 4a7d2c9e6b31
+Revises: 7c4e1f9a2b58
+Create Date: 2026-10-17 23:12:08.517204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '4a7d2c9e6b31'
+down_revision: Union[str, None] = '7c4e1f9a2b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Merge duplicate lines into the oldest row before the unique index
+    op.execute("""
+        UPDATE cart_items c SET quantity = d.total
+        FROM (
+            SELECT min(id) AS id, sum(quantity) AS total
+            FROM cart_items
+            GROUP BY user_id, product_id, coalesce(variant_id, 0)
+            HAVING count(*) > 1
+        ) d
+        WHERE c.id = d.id
+    """)
+    op.execute("""
+        DELETE FROM cart_items c USING cart_items k
+        WHERE c.user_id = k.user_id
+          AND c.product_id = k.product_id
+          AND coalesce(c.variant_id, 0) = coalesce(k.variant_id, 0)
+          AND c.id > k.id
+    """)
+    op.create_index(
+        'uq_cart_items_line', 'cart_items',
+        ['user_id', 'product_id', sa.text('coalesce(variant_id, 0)')], unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_cart_items_line', table_name='cart_items')
@@ -0,0 +1,103 @@
+"""product search documents
+
+Revision ID: 5b2e8c1d9f4a
+Revises: ca43a71c008c
+Create Date: 2026-10-17 10:12:41.118204
+
+"""
+import re
+import unicodedata
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e8c1d9f4a'
+down_revision: Union[str, None] = 'ca43a71c008c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must stay identical to app.utils.search.search_vector()
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, title_tokens), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, keyword_tokens), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, body_tokens), 'D')"
+)
+
+# Tokenizer as of this revision (app.utils.search.tokenize); frozen here so
+# later changes to the app do not alter what this migration backfills.
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_SEGMENT_RE = re.compile(rf"[{_CJK}]+|[0-9a-z\u00c0-\u024f]+")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+
+
+def _tokens(text):
+    tokens = []
+    for segment in _SEGMENT_RE.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        if _CJK_RE.match(segment):
+            tokens.extend(segment)
+            tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+        else:
+            tokens.append(segment)
+    joined = " ".join(dict.fromkeys(tokens))
+    return f" {joined} " if joined else ""
+
+
+def _document(row):
+    keywords = [row["brand_name"], row["category_name"], *(row["tags"] or [])]
+    return {
+        "title_tokens": _tokens(row["name"]),
+        "keyword_tokens": _tokens(" ".join(str(k) for k in keywords if k)),
+        "body_tokens": _tokens(f"{row['short_description'] or ''} {row['description'] or ''}"),
+    }
+
+
+def upgrade() -> None:
+    op.create_table('product_search_documents',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('title_tokens', sa.Text(), nullable=False),
+    sa.Column('keyword_tokens', sa.Text(), nullable=False),
+    sa.Column('body_tokens', sa.Text(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.execute(
+        f"CREATE INDEX ix_product_search_documents_vector "
+        f"ON product_search_documents USING gin (({SEARCH_VECTOR}))"
+    )
+
+    # Backfill existing products
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(
+        "SELECT p.id, p.name, p.short_description, p.description, p.tags, "
+        "b.name AS brand_name, c.name AS category_name "
+        "FROM products p "
+        "LEFT JOIN brands b ON b.id = p.brand_id "
+        "LEFT JOIN categories c ON c.id = p.category_id"
+    )).mappings().all()
+    documents = sa.table(
+        'product_search_documents',
+        sa.column('product_id', sa.Integer),
+        sa.column('title_tokens', sa.Text),
+        sa.column('keyword_tokens', sa.Text),
+        sa.column('body_tokens', sa.Text),
+        sa.column('updated_at', sa.DateTime(timezone=True)),
+    )
+    if rows:
+        now = datetime.now(timezone.utc)
+        op.bulk_insert(documents, [
+            {
+                "product_id": row["id"],
+                "updated_at": now,
+                **_document(row),
+            }
+            for row in rows
+        ])
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_product_search_documents_vector")
+    op.drop_table('product_search_documents')
@@ -0,0 +1,40 @@
+"""payment callbacks
+
+Revision ID: 6f2a8d4c1e97
+Revises: 9e1b5d3f7a42
+Create Date: 2026-10-18 02:17:08.551392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '6f2a8d4c1e97'
+down_revision: Union[str, None] = '9e1b5d3f7a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('payment_callbacks',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('gateway', sa.String(length=20), nullable=False),
+    sa.Column('trade_no', sa.String(length=100), nullable=False),
+    sa.Column('rtn_code', sa.String(length=10), nullable=False),
+    sa.Column('merchant_trade_no', sa.String(length=50), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('received_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('outcome', sa.String(length=30), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('gateway', 'trade_no', 'rtn_code', name='uq_payment_callbacks_notification')
+    )
+    op.create_index(op.f('ix_payment_callbacks_merchant_trade_no'), 'payment_callbacks', ['merchant_trade_no'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_payment_callbacks_merchant_trade_no'), table_name='payment_callbacks')
+    op.drop_table('payment_callbacks')
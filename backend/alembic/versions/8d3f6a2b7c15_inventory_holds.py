@@ -0,0 +1,33 @@
+"""inventory holds
+
+Revision ID: 8d3f6a2b7c15
+Revises: 5b2e8c1d9f4a
+Create Date: 2026-10-17 16:40:12.503817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f6a2b7c15'
+down_revision: Union[str, None] = '5b2e8c1d9f4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('inventory_holds',
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('order_id')
+    )
+    op.create_index(op.f('ix_inventory_holds_expires_at'), 'inventory_holds', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_inventory_holds_expires_at'), table_name='inventory_holds')
+    op.drop_table('inventory_holds')
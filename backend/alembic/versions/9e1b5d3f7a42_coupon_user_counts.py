@@ -0,0 +1,36 @@
+"""coupon user counts
+
+Revision ID: 9e1b5d3f7a42
+Revises: 4a7d2c9e6b31
+Create Date: 2026-10-18 00:41:53.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9e1b5d3f7a42'
+down_revision: Union[str, None] = '4a7d2c9e6b31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('coupon_user_counts',
+    sa.Column('coupon_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('used_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['coupon_id'], ['coupons.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('coupon_id', 'user_id')
+    )
+    op.execute("""
+        INSERT INTO coupon_user_counts (coupon_id, user_id, used_count)
+        SELECT coupon_id, user_id, count(*) FROM coupon_usages GROUP BY coupon_id, user_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('coupon_user_counts')
@@ -9,11 +9,11 @@ from typing import Optional
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
 from app.database import get_db
+from app.utils.token_revocation import is_token_revoked
 
 settings = get_settings()
 admin_security_scheme = HTTPBearer(auto_error=False)
@@ -66,17 +66,16 @@ async def check_admin_ip(request: Request):
         )
 
 
-async def get_current_admin_user(
+async def get_admin_token_payload(
     request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(admin_security_scheme),
-    db: AsyncSession = Depends(get_db),
-):
+) -> dict:
     """
-    Authenticate admin user using ADMIN-specific JWT token.
+    Validate an ADMIN-specific JWT token and return its payload.
+    - Enforces IP whitelist
     - Uses separate ADMIN_JWT_SECRET_KEY
     - Validates token type is 'admin_access'
-    - Checks admin role
-    - Enforces IP whitelist
+    - Rejects revoked tokens
     """
     # IP whitelist check
     await check_admin_ip(request)
@@ -121,11 +120,26 @@ async def get_current_admin_user(
             detail="無效的管理員 Token",
         )
 
-    # Fetch user from DB
-    from app.models.user import User
+    if await is_token_revoked(payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token 已失效，請重新登入",
+        )
+
+    return payload
+
+
+async def get_current_admin_user(
+    payload: dict = Depends(get_admin_token_payload),
+    db: AsyncSession = Depends(get_db),
+):
+    """Authenticate admin user (active, admin role) from a validated admin token"""
+    user_id = int(payload["sub"])
+
+    # Cached principal snapshot (see app.utils.principal)
+    from app.utils.principal import get_principal
 
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await get_principal(db, user_id)
 
     if user is None:
         raise HTTPException(
@@ -41,11 +41,74 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379/0"
     REDIS_PREFIX: str = "pfs:"
 
+    # ===== Cache =====
+    CACHE_BACKEND: str = "redis"  # redis | memory (in-process, single worker / tests)
+    CACHE_DEFAULT_TTL: int = 300  # seconds
+    CACHE_CONTENT_TTL: int = 60  # banners / announcements have time windows
+    CATEGORY_TREE_TTL: int = 300  # in-process category tree snapshot lifetime
+
+    # ===== View Counter =====
+    VIEW_COUNTER_BACKEND: str = "redis"  # redis | memory
+    VIEW_FLUSH_INTERVAL: int = 10  # seconds between batched view_count flushes
+
+    # ===== Inventory Holds =====
+    ORDER_HOLD_MINUTES: int = 30  # unpaid online-payment orders are cancelled after this long
+    ORDER_HOLD_SWEEP_INTERVAL: int = 60  # seconds between expired-hold sweeps
+    ORDER_HOLD_SWEEP_BATCH: int = 200  # orders released per sweep transaction
+
+    # ===== Idempotency =====
+    IDEMPOTENCY_BACKEND: str = "redis"  # redis | memory
+    IDEMPOTENCY_TTL: int = 86400  # seconds a completed response can be replayed
+    IDEMPOTENCY_LOCK_TTL: int = 60  # seconds an in-flight claim outlives a crashed worker
+    IDEMPOTENCY_WAIT_SECONDS: float = 10  # how long a concurrent duplicate waits for the first
+
+    # ===== Tasks (Celery + transactional outbox) =====
+    TASK_BACKEND: str = "celery"  # celery | memory (handlers run in-process after commit; tests)
+    CELERY_BROKER_URL: str = ""  # empty = REDIS_URL
+    TASK_MAX_RETRIES: int = 5  # per handler, exponential backoff
+    TASK_RETRY_BACKOFF_MAX: int = 600  # seconds, cap on the retry delay
+    OUTBOX_RELAY_INTERVAL: int = 5  # seconds between sweeps for events not yet published
+    OUTBOX_RELAY_BATCH: int = 100  # events published per relay transaction
+
+    # ===== Cart =====
+    CART_BACKEND: str = "redis"  # redis | memory | database (cart_items rows, read per request)
+    CART_TTL: int = 30 * 86400  # seconds an idle cart stays in Redis before it is re-read from cart_items
+    CART_WRITEBACK_INTERVAL: int = 5  # seconds between write-backs of changed carts to cart_items
+    CART_WRITEBACK_BATCH: int = 500  # carts written back per transaction
+
+    # ===== Order events (SSE) =====
+    ORDER_EVENTS_BACKEND: str = "redis"  # redis (pub/sub across workers) | memory (in-process; tests)
+    ORDER_EVENTS_BUFFER: int = 16  # events buffered per connection; the oldest are dropped beyond it
+    ORDER_EVENTS_HEARTBEAT: int = 15  # seconds between keep-alive comments
+    ORDER_EVENTS_IDLE_TIMEOUT: int = 300  # seconds without an event before the stream is closed
+
+    # ===== Pricing =====
+    PRICING_QUOTE_TTL: int = 300  # seconds a cart quote is reused while cart / price book are unchanged
+
+    # ===== Pagination =====
+    PAGINATION_COUNT_TTL: int = 30  # seconds an exact COUNT(*) is reused per filter signature
+    PAGINATION_ESTIMATE_MIN_ROWS: int = 10000  # below this, estimates fall back to an exact count
+
+    # ===== Search =====
+    SEARCH_POPULARITY_WEIGHT: float = 0.1  # relevance × (1 + w·ln(1 + sold_count))
+
+    # ===== Trending =====
+    TRENDING_HALF_LIFE_HOURS: float = 24  # a sale counts half as much after this long
+    TRENDING_WINDOW_DAYS: int = 14  # orders replayed when the score store is cold
+    TRENDING_VIEW_WEIGHT: float = 0.05  # score per product view (1.0 per unit sold)
+    TRENDING_CACHE_TTL: int = 60  # seconds GET /products/trending is cached
+
     # ===== JWT =====
     JWT_SECRET_KEY: str = "change-me-to-a-secure-random-key-in-production"
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    PRINCIPAL_CACHE_TTL: int = 30  # seconds an authenticated user snapshot is reused
+
+    # ===== Token Revocation =====
+    TOKEN_REVOCATION_BACKEND: str = "redis"  # redis | memory
+    TOKEN_BLOOM_CAPACITY: int = 100000  # revoked jtis per worker before the filter is rebuilt
+    TOKEN_BLOOM_ERROR_RATE: float = 0.001  # fraction of valid tokens that need a Redis check
 
     # ===== Admin JWT (separate secrets & shorter expiry) =====
     ADMIN_JWT_SECRET_KEY: str = "change-me-admin-secret-key-in-production"
@@ -65,11 +128,22 @@ class Settings(BaseSettings):
     ]
     ALLOWED_HOSTS: List[str] = ["*"]
 
-    # ===== Rate Limiting =====
+    # ===== Password Hashing =====
+    BCRYPT_ROUNDS: int = 12  # minimum cost; older hashes below it are upgraded on login
+    BCRYPT_MAX_ROUNDS: int = 15
+    BCRYPT_TARGET_MS: float = 250  # startup calibration picks the highest cost within this
+    BCRYPT_CALIBRATE: bool = True
+    PASSWORD_HASH_WORKERS: int = 4  # threads per worker process
+    PASSWORD_HASH_MAX_PENDING: int = 32  # queued hash / verify calls before 503
+
+    # ===== Rate Limiting =====  ("<count>/<second|minute|hour|day>", e.g. "10/5minutes")
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "redis"  # redis | memory
     RATE_LIMIT_LOGIN: str = "5/minute"
     RATE_LIMIT_REGISTER: str = "3/hour"
     RATE_LIMIT_API: str = "100/minute"
     RATE_LIMIT_SEARCH: str = "30/minute"
+    TRUSTED_PROXIES: List[str] = []  # IPs / CIDRs whose X-Forwarded-For is honoured
 
     # ===== File Upload =====
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
@@ -95,7 +169,7 @@ class Settings(BaseSettings):
 
     # ===== Payment (ECPay 綠界) =====
     ECPAY_MERCHANT_ID: str = ""
-    ECPAY_HASH_KEY: str = ""
+    ECPAY_HASH_KEY: str = ""  # callbacks are only CheckMacValue-verified when set (leave empty in dev only)
     ECPAY_HASH_IV: str = ""
     ECPAY_API_URL: str = "https://payment-stage.ecpay.com.tw"
 
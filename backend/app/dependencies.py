@@ -9,21 +9,20 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
 from app.database import get_db
+from app.utils.token_revocation import is_token_revoked
 
 settings = get_settings()
 security_scheme = HTTPBearer(auto_error=False)
 
 
-async def get_current_user(
+async def get_token_payload(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_scheme),
-    db: AsyncSession = Depends(get_db),
-):
-    """取得當前已認證的使用者"""
+) -> dict:
+    """驗證 Access Token（簽章、類型、期限、撤銷）並回傳 payload"""
     if credentials is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -62,11 +61,27 @@ async def get_current_user(
             detail="無效的認證 Token",
         )
 
+    if await is_token_revoked(payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token 已失效，請重新登入",
+        )
+
+    return payload
+
+
+async def get_current_user(
+    payload: dict = Depends(get_token_payload),
+    db: AsyncSession = Depends(get_db),
+):
+    """取得當前已認證的使用者"""
+    user_id = int(payload["sub"])
+
     # Import here to avoid circular dependency
-    from app.models.user import User
+    from app.utils.principal import get_principal
 
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    # Cached snapshot, not an ORM instance — see app.utils.principal.load_user
+    user = await get_principal(db, user_id)
 
     if user is None:
         raise HTTPException(
@@ -92,7 +107,7 @@ async def get_current_user_optional(
         return None
 
     try:
-        return await get_current_user(credentials, db)
+        return await get_current_user(await get_token_payload(credentials), db)
     except HTTPException:
         return None
 
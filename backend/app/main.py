@@ -10,12 +10,24 @@ from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 
 from app.config import get_settings
-from app.database import close_db, init_db
+from app.database import async_session, close_db, init_db
+from app.middleware.idempotency import IdempotencyMiddleware
 from app.middleware.logging import RequestLoggingMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
 from app.middleware.security_headers import SecurityHeadersMiddleware
+from app.tasks import start_outbox_relay, stop_outbox_relay
+from app.utils.cart_store import start_cart_writeback, stop_cart_writeback
+from app.utils.inventory import start_hold_sweeper, stop_hold_sweeper
+from app.utils.order_events import start_order_events_listener, stop_order_events_listener
+from app.utils.redis_client import close_redis
+from app.utils.security import init_password_hashing, shutdown_password_hashing
+from app.utils.token_revocation import start_revocation_listener, stop_revocation_listener
+from app.utils.view_counter import start_view_flusher, stop_view_flusher
 
 # ── Import Routers ──────────────────────
-from app.routers import auth, brands, cart, categories, content, orders, payments, points, products, users, wishlist
+from app.routers import (
+    auth, brands, cart, categories, content, orders, payments, points, products, shipping, users, wishlist,
+)
 from app.routers.admin import auth as admin_auth
 from app.routers.admin import content as admin_content
 from app.routers.admin import dashboard as admin_dashboard
@@ -34,7 +46,22 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     """Application startup / shutdown events."""
     await init_db()
+    await init_password_hashing()
+    start_view_flusher(async_session)
+    start_revocation_listener()
+    start_hold_sweeper(async_session)
+    start_outbox_relay(async_session)
+    start_cart_writeback(async_session)
+    start_order_events_listener()
     yield
+    await stop_order_events_listener()
+    await stop_cart_writeback(async_session)
+    await stop_outbox_relay()
+    await stop_hold_sweeper()
+    await stop_revocation_listener()
+    await stop_view_flusher(async_session)
+    shutdown_password_hashing()
+    await close_redis()
     await close_db()
 
 
@@ -51,6 +78,8 @@ app = FastAPI(
 
 
 # ── Middleware (order matters: last added = first executed) ──
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(RequestLoggingMiddleware)
 app.add_middleware(SecurityHeadersMiddleware)
 app.add_middleware(GZipMiddleware, minimum_size=500)
@@ -89,6 +118,7 @@ app.include_router(payments.router, prefix=API_PREFIX)
 app.include_router(wishlist.router, prefix=API_PREFIX)
 app.include_router(points.router, prefix=API_PREFIX)
 app.include_router(content.router, prefix=API_PREFIX)
+app.include_router(shipping.router, prefix=API_PREFIX)
 
 # ── Admin API Routes (/api/v1/admin/*) ── Independent auth ──
 app.include_router(admin_auth.router, prefix=API_PREFIX)
@@ -0,0 +1,127 @@
+"""
+Idempotency middleware — ``Idempotency-Key`` for order / payment creation
+
+Pure ASGI: the request body is buffered once (for the fingerprint) and
+handed to the app unchanged; the response is streamed to the client while
+being captured for replay. A replayed response never reaches the router,
+so no business table is touched. Requests without the header pass through.
+"""
+
+import json
+
+import structlog
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.utils import idempotency
+from app.utils.rate_limit import client_ip, token_subject
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+IDEMPOTENT_ROUTES = {
+    ("POST", f"{settings.API_PREFIX}/orders"),
+    ("POST", f"{settings.API_PREFIX}/payments/create"),
+}
+
+
+async def _send_error(send, status_code: int, message: str, code: str):
+    body = json.dumps({"success": False, "error": {"message": message, "code": code}}, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """Replay stored responses for repeated Idempotency-Key requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"].rstrip("/")) not in IDEMPOTENT_ROUTES:
+            return await self.app(scope, receive, send)
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        key = headers.get("idempotency-key", "").strip()
+        if not key:
+            return await self.app(scope, receive, send)
+        if len(key) > idempotency.MAX_KEY_LENGTH:
+            return await _send_error(send, 400, "Idempotency-Key 過長", "IDEMPOTENCY_KEY_INVALID")
+
+        # Buffer the body once for the fingerprint, then replay it to the app
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+
+        async def replay_receive():
+            nonlocal body
+            if body is None:
+                return await receive()
+            message, body = {"type": "http.request", "body": body, "more_body": False}, None
+            return message
+
+        subject = token_subject(headers.get("authorization"))
+        identity = f"user:{subject}" if subject else f"ip:{client_ip(headers, scope.get('client'))}"
+        store_key = f"{identity}:{key}"
+        fingerprint = idempotency.request_fingerprint(
+            scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1"), body
+        )
+
+        try:
+            record = await idempotency.begin(store_key, fingerprint)
+        except idempotency.IdempotencyError as exc:
+            return await _send_error(send, exc.status_code, exc.message, exc.code)
+        except RedisError as exc:
+            logger.warning("idempotency_unavailable", error=str(exc))
+            return await self.app(scope, replay_receive, send)
+
+        if record is not None:
+            await send({
+                "type": "http.response.start",
+                "status": record["status"],
+                "headers": [
+                    *((k.encode("latin-1"), v.encode("latin-1")) for k, v in record["headers"]),
+                    (b"idempotent-replayed", b"true"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": record["body"].encode("latin-1")})
+            return
+
+        response = {"status": 500, "headers": [], "body": []}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await self._abandon(store_key)
+            raise
+
+        if not 200 <= response["status"] < 300:
+            return await self._abandon(store_key)
+        try:
+            await idempotency.complete(
+                store_key, fingerprint, response["status"], response["headers"], b"".join(response["body"])
+            )
+        except RedisError as exc:
+            logger.warning("idempotency_unavailable", error=str(exc))
+
+    async def _abandon(self, store_key: str):
+        try:
+            await idempotency.abandon(store_key)
+        except RedisError as exc:
+            logger.warning("idempotency_unavailable", error=str(exc))
@@ -0,0 +1,64 @@
+"""
+Rate limit middleware — RATE_LIMIT_API for every /api/v1 request
+
+Pure ASGI (no BaseHTTPMiddleware body buffering) and runs before routing, so
+a rejected request never reaches a dependency or opens a DB session.
+Identity is the authenticated user when the bearer token is validly signed,
+else the client IP. Route-specific limits live in app.utils.rate_limit.
+"""
+
+import json
+
+from app.config import get_settings
+from app.utils.rate_limit import client_ip, hit, token_subject
+
+settings = get_settings()
+
+
+class RateLimitMiddleware:
+    """Global per-user / per-IP limit with X-RateLimit-* headers"""
+
+    def __init__(self, app):
+        self.app = app
+        self.prefix = settings.API_PREFIX + "/"
+        self.admin_prefix = settings.API_PREFIX + "/admin/"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix) or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        subject = token_subject(headers.get("authorization"), admin=scope["path"].startswith(self.admin_prefix))
+        identity = f"user:{subject}" if subject else f"ip:{client_ip(headers, scope.get('client'))}"
+
+        result = await hit(f"api:{identity}", settings.RATE_LIMIT_API)
+        if result is None:
+            return await self.app(scope, receive, send)
+
+        limit_headers = [(k.lower().encode(), v.encode()) for k, v in result.headers().items()]
+        if not result.allowed:
+            body = json.dumps(
+                {"success": False, "error": {"message": "請求過於頻繁，請稍後再試", "code": "RATE_LIMITED"}},
+                ensure_ascii=False,
+            ).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    *limit_headers,
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                # A tighter per-route limit (set by the route dependency) takes precedence
+                existing = {name.lower() for name, _ in message.get("headers", [])}
+                extra = [h for h in limit_headers if h[0] not in existing]
+                message = {**message, "headers": [*message.get("headers", []), *extra]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -6,30 +6,34 @@ from app.models.user import User, UserAddress, UserCard
 from app.models.product import Product, ProductVariant, ProductImage, ProductReview
 from app.models.category import Category
 from app.models.brand import Brand
-from app.models.order import Order, OrderItem, OrderStatusLog
+from app.models.order import InventoryHold, Order, OrderItem, OrderStatusLog
 from app.models.cart import CartItem
-from app.models.payment import Payment
-from app.models.coupon import Coupon, CouponUsage
+from app.models.payment import Payment, PaymentCallback
+from app.models.coupon import Coupon, CouponUsage, CouponUserCount
 from app.models.content import Banner, Announcement, FeaturedSection
 from app.models.wishlist import Wishlist
 from app.models.points import PointsTransaction, CreditsTransaction
 from app.models.shipping import ShippingMethod
 from app.models.returns import ReturnRequest
 from app.models.audit import AuditLog
+from app.models.search import ProductSearchDocument
+from app.models.outbox import OutboxEvent, OutboxReceipt
 
 __all__ = [
     "User", "UserAddress", "UserCard",
     "Product", "ProductVariant", "ProductImage", "ProductReview",
     "Category",
     "Brand",
-    "Order", "OrderItem", "OrderStatusLog",
+    "Order", "OrderItem", "OrderStatusLog", "InventoryHold",
     "CartItem",
-    "Payment",
-    "Coupon", "CouponUsage",
+    "Payment", "PaymentCallback",
+    "Coupon", "CouponUsage", "CouponUserCount",
     "Banner", "Announcement", "FeaturedSection",
     "Wishlist",
     "PointsTransaction", "CreditsTransaction",
     "ShippingMethod",
     "ReturnRequest",
     "AuditLog",
+    "ProductSearchDocument",
+    "OutboxEvent", "OutboxReceipt",
 ]
@@ -4,7 +4,7 @@ Cart model — cart_items (使用者購物車項目)
 
 from datetime import datetime, timezone
 
-from sqlalchemy import DateTime, ForeignKey, Integer
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -12,6 +12,10 @@ from app.database import Base
 
 class CartItem(Base):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        # One row per cart line; the conflict target of the batch upsert (NULL variant = 0)
+        Index("uq_cart_items_line", "user_id", "product_id", text("coalesce(variant_id, 0)"), unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(
@@ -1,5 +1,5 @@
 """
-Coupon models — coupons, coupon_usages
+Coupon models — coupons, coupon_usages, coupon_user_counts
 """
 
 from datetime import datetime, timezone
@@ -77,3 +77,20 @@ class CouponUsage(Base):
 
     def __repr__(self):
         return f"<CouponUsage(coupon={self.coupon_id}, user={self.user_id})>"
+
+
+class CouponUserCount(Base):
+    """Per-user redemption counter (usage_per_user), kept by app.utils.coupons"""
+
+    __tablename__ = "coupon_user_counts"
+
+    coupon_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("coupons.id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    used_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+
+    def __repr__(self):
+        return f"<CouponUserCount(coupon={self.coupon_id}, user={self.user_id}, used={self.used_count})>"
@@ -1,5 +1,5 @@
 """
-Order models — orders, order_items, order_status_logs
+Order models — orders, order_items, order_status_logs, inventory_holds
 """
 
 from datetime import datetime, timezone
@@ -32,7 +32,7 @@ class Order(Base):
     user_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
     )
-    order_number: Mapped[str] = mapped_column(String(20), unique=True, nullable=False, index=True)
+    order_number: Mapped[str] = mapped_column(String(32), unique=True, nullable=False, index=True)
     status: Mapped[str] = mapped_column(ORDER_STATUS, default="pending", server_default="pending")
     subtotal: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
     discount: Mapped[float] = mapped_column(Numeric(10, 2), default=0, server_default="0")
@@ -72,6 +72,7 @@ class Order(Base):
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
     status_logs = relationship("OrderStatusLog", back_populates="order", cascade="all, delete-orphan", order_by="OrderStatusLog.created_at.desc()")
     payments = relationship("Payment", back_populates="order", cascade="all, delete-orphan")
+    inventory_hold = relationship("InventoryHold", back_populates="order", cascade="all, delete-orphan", uselist=False)
     return_requests = relationship("ReturnRequest", back_populates="order", cascade="all, delete-orphan")
 
     def __repr__(self):
@@ -125,3 +126,23 @@ class OrderStatusLog(Base):
 
     def __repr__(self):
         return f"<OrderStatusLog(order={self.order_id}, {self.from_status} → {self.to_status})>"
+
+
+class InventoryHold(Base):
+    """Stock reserved by an unpaid order; released by the sweeper once expires_at passes"""
+
+    __tablename__ = "inventory_holds"
+
+    order_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("orders.id", ondelete="CASCADE"), primary_key=True
+    )
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+    # Relationships
+    order = relationship("Order", back_populates="inventory_hold")
+
+    def __repr__(self):
+        return f"<InventoryHold(order={self.order_id}, expires_at={self.expires_at})>"
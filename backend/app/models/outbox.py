@@ -0,0 +1,53 @@
+"""
+Outbox models — outbox_events, outbox_receipts
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class OutboxEvent(Base):
+    """
+    Domain event written in the same transaction as the change it describes
+    (see app.tasks.outbox). ``published_at`` is set once its handlers have
+    been handed to the task queue.
+    """
+
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        Index("ix_outbox_events_unpublished", "id", postgresql_where=text("published_at IS NULL")),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    event_type: Mapped[str] = mapped_column(String(50), nullable=False)  # order_created
+    aggregate_id: Mapped[int] = mapped_column(Integer, nullable=False)  # e.g. order id
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    published_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<OutboxEvent(id={self.id}, type='{self.event_type}', aggregate={self.aggregate_id})>"
+
+
+class OutboxReceipt(Base):
+    """One row per (event, handler) that completed — makes redelivered tasks no-ops"""
+
+    __tablename__ = "outbox_receipts"
+
+    event_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("outbox_events.id", ondelete="CASCADE"), primary_key=True
+    )
+    handler: Mapped[str] = mapped_column(String(50), primary_key=True)
+    processed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+    def __repr__(self):
+        return f"<OutboxReceipt(event={self.event_id}, handler='{self.handler}')>"
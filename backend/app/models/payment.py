@@ -1,10 +1,10 @@
 """
-Payment model — 支付紀錄
+Payment models — 支付紀錄, payment_callbacks (gateway notification inbox)
 """
 
 from datetime import datetime, timezone
 
-from sqlalchemy import DateTime, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import DateTime, ForeignKey, Integer, Numeric, String, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -35,3 +35,31 @@ class Payment(Base):
 
     def __repr__(self):
         return f"<Payment(id={self.id}, amount={self.amount}, status='{self.status}')>"
+
+
+class PaymentCallback(Base):
+    """
+    Raw gateway notification, stored before anything is applied (see
+    app.tasks.payments). A redelivered notification hits the unique key and
+    is dropped; ``processed_at`` / ``outcome`` are set once it has been applied.
+    """
+
+    __tablename__ = "payment_callbacks"
+    __table_args__ = (
+        UniqueConstraint("gateway", "trade_no", "rtn_code", name="uq_payment_callbacks_notification"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    gateway: Mapped[str] = mapped_column(String(20), nullable=False)  # ecpay
+    trade_no: Mapped[str] = mapped_column(String(100), nullable=False)  # gateway transaction id
+    rtn_code: Mapped[str] = mapped_column(String(10), nullable=False)
+    merchant_trade_no: Mapped[str] = mapped_column(String(50), nullable=False, index=True)  # order_number
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    received_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    outcome: Mapped[str | None] = mapped_column(String(30), nullable=True)  # paid / failed / duplicate / ...
+
+    def __repr__(self):
+        return f"<PaymentCallback(id={self.id}, trade_no='{self.trade_no}', outcome='{self.outcome}')>"
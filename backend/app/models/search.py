@@ -0,0 +1,33 @@
+"""
+Search models — product_search_documents
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, ForeignKey, Integer, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class ProductSearchDocument(Base):
+    """
+    Pre-tokenized search text per product (see app.utils.search).
+
+    Tokens are space separated with CJK text split into uni/bigrams, so the
+    'simple' text search config works without a Chinese dictionary.
+    """
+
+    __tablename__ = "product_search_documents"
+
+    product_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
+    )
+    title_tokens: Mapped[str] = mapped_column(Text, nullable=False, default="")  # name
+    keyword_tokens: Mapped[str] = mapped_column(Text, nullable=False, default="")  # brand / category / tags
+    body_tokens: Mapped[str] = mapped_column(Text, nullable=False, default="")  # short_description / description
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
@@ -7,23 +7,27 @@ GET  /admin/auth/me             — 取得管理員資訊
 """
 
 from datetime import datetime, timezone
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.admin_dependencies import check_admin_ip, get_current_admin_user
+from app.admin_dependencies import check_admin_ip, get_admin_token_payload, get_current_admin_user
 from app.config import get_settings
 from app.database import get_db
 from app.models.user import User
 from app.schemas.common import SuccessResponse
-from app.schemas.user import LoginRequest, TokenResponse
+from app.schemas.user import LoginRequest, RefreshTokenRequest, TokenResponse
 from app.utils.admin_security import (
     create_admin_access_token,
     create_admin_refresh_token,
     decode_admin_token,
 )
-from app.utils.security import verify_password
+from app.utils.principal import load_user
+from app.utils.rate_limit import rate_limit
+from app.utils.token_revocation import is_token_revoked, revoke_token
+from app.utils.security import verify_and_update_password
 
 settings = get_settings()
 router = APIRouter(prefix="/admin/auth", tags=["管理後台 - 認證"])
@@ -31,7 +35,11 @@ router = APIRouter(prefix="/admin/auth", tags=["管理後台 - 認證"])
 ADMIN_ROLES = ("super_admin", "admin", "editor")
 
 
-@router.post("/login", response_model=SuccessResponse)
+@router.post(
+    "/login",
+    response_model=SuccessResponse,
+    dependencies=[Depends(rate_limit("RATE_LIMIT_LOGIN"))],
+)
 async def admin_login(
     data: LoginRequest,
     request: Request,
@@ -44,7 +52,10 @@ async def admin_login(
     result = await db.execute(select(User).where(User.email == data.email))
     user = result.scalar_one_or_none()
 
-    if not user or not verify_password(data.password, user.password_hash):
+    verified, new_hash = (
+        await verify_and_update_password(data.password, user.password_hash) if user else (False, None)
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email 或密碼錯誤",
@@ -63,8 +74,10 @@ async def admin_login(
             detail="此帳號無管理員權限",
         )
 
-    # Update last login
+    # Update last login; upgrade hashes made with an outdated bcrypt cost
     user.last_login_at = datetime.now(timezone.utc)
+    if new_hash:
+        user.password_hash = new_hash
 
     # Generate admin-specific tokens (separate secret key)
     access_token = create_admin_access_token(user.id, user.role)
@@ -100,7 +113,7 @@ async def admin_refresh_token(
 
     payload = decode_admin_token(token)
 
-    if not payload or payload.get("type") != "admin_refresh":
+    if not payload or payload.get("type") != "admin_refresh" or await is_token_revoked(payload):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="無效的管理員 Refresh Token",
@@ -136,15 +149,27 @@ async def admin_refresh_token(
 
 
 @router.post("/logout", response_model=SuccessResponse)
-async def admin_logout(current_admin=Depends(get_current_admin_user)):
-    """管理員登出"""
-    # TODO: Add admin token to Redis blacklist
+async def admin_logout(
+    data: Optional[RefreshTokenRequest] = None,
+    payload: dict = Depends(get_admin_token_payload),
+    current_admin=Depends(get_current_admin_user),
+):
+    """管理員登出（撤銷目前的 Token）"""
+    await revoke_token(payload)
+    if data:
+        refresh_payload = decode_admin_token(data.refresh_token)
+        if refresh_payload and refresh_payload.get("sub") == payload.get("sub"):
+            await revoke_token(refresh_payload)
     return SuccessResponse(message="管理員登出成功")
 
 
 @router.get("/me", response_model=SuccessResponse)
-async def admin_me(current_admin=Depends(get_current_admin_user)):
+async def admin_me(
+    current_admin=Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_db),
+):
     """取得當前管理員資訊"""
+    current_admin = await load_user(db, current_admin)
     return SuccessResponse(
         data={
             "id": current_admin.id,
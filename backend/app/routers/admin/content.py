@@ -5,7 +5,7 @@ CRUD /admin/content/announcements
 CRUD /admin/content/featured-sections
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -13,6 +13,7 @@ from app.database import get_db
 from app.admin_dependencies import require_admin_permission
 from app.models.content import Announcement, Banner, FeaturedSection
 from app.schemas.common import SuccessResponse
+from app.utils.cache import invalidate_cache_tags
 from app.utils.pagination import paginate
 from pydantic import BaseModel
 from typing import Optional
@@ -111,12 +112,14 @@ async def list_banners(
 @router.post("/banners", response_model=SuccessResponse, status_code=status.HTTP_201_CREATED)
 async def create_banner(
     data: BannerCreate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("content.write")),
     db: AsyncSession = Depends(get_db),
 ):
     banner = Banner(**data.model_dump())
     db.add(banner)
     await db.flush()
+    background_tasks.add_task(invalidate_cache_tags, "content:banners")
     return SuccessResponse(data={"id": banner.id}, message="Banner 已建立")
 
 
@@ -124,6 +127,7 @@ async def create_banner(
 async def update_banner(
     banner_id: int,
     data: BannerUpdate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("content.write")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -133,12 +137,14 @@ async def update_banner(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Banner 不存在")
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(banner, field, value)
+    background_tasks.add_task(invalidate_cache_tags, "content:banners")
     return SuccessResponse(data={"id": banner.id}, message="Banner 已更新")
 
 
 @router.delete("/banners/{banner_id}", response_model=SuccessResponse)
 async def delete_banner(
     banner_id: int,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("content.delete")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -147,6 +153,7 @@ async def delete_banner(
     if not banner:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Banner 不存在")
     await db.delete(banner)
+    background_tasks.add_task(invalidate_cache_tags, "content:banners")
     return SuccessResponse(data={"message": "Banner 已刪除"})
 
 
@@ -176,12 +183,14 @@ async def list_announcements(
 @router.post("/announcements", response_model=SuccessResponse, status_code=status.HTTP_201_CREATED)
 async def create_announcement(
     data: AnnouncementCreate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("content.write")),
     db: AsyncSession = Depends(get_db),
 ):
     ann = Announcement(**data.model_dump())
     db.add(ann)
     await db.flush()
+    background_tasks.add_task(invalidate_cache_tags, "content:announcements")
     return SuccessResponse(data={"id": ann.id}, message="公告已建立")
 
 
@@ -189,6 +198,7 @@ async def create_announcement(
 async def update_announcement(
     ann_id: int,
     data: AnnouncementUpdate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("content.write")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -198,12 +208,14 @@ async def update_announcement(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="公告不存在")
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(ann, field, value)
+    background_tasks.add_task(invalidate_cache_tags, "content:announcements")
     return SuccessResponse(data={"id": ann.id}, message="公告已更新")
 
 
 @router.delete("/announcements/{ann_id}", response_model=SuccessResponse)
 async def delete_announcement(
     ann_id: int,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("content.delete")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -212,6 +224,7 @@ async def delete_announcement(
     if not ann:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="公告不存在")
     await db.delete(ann)
+    background_tasks.add_task(invalidate_cache_tags, "content:announcements")
     return SuccessResponse(data={"message": "公告已刪除"})
 
 
@@ -239,12 +252,14 @@ async def list_featured_sections(
 @router.post("/featured-sections", response_model=SuccessResponse, status_code=status.HTTP_201_CREATED)
 async def create_featured_section(
     data: FeaturedSectionCreate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("content.write")),
     db: AsyncSession = Depends(get_db),
 ):
     section = FeaturedSection(**data.model_dump())
     db.add(section)
     await db.flush()
+    background_tasks.add_task(invalidate_cache_tags, "content:featured-sections")
     return SuccessResponse(data={"id": section.id}, message="區塊已建立")
 
 
@@ -252,6 +267,7 @@ async def create_featured_section(
 async def update_featured_section(
     section_id: int,
     data: FeaturedSectionUpdate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("content.write")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -261,12 +277,14 @@ async def update_featured_section(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="區塊不存在")
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(section, field, value)
+    background_tasks.add_task(invalidate_cache_tags, "content:featured-sections")
     return SuccessResponse(data={"id": section.id}, message="區塊已更新")
 
 
 @router.delete("/featured-sections/{section_id}", response_model=SuccessResponse)
 async def delete_featured_section(
     section_id: int,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("content.delete")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -275,4 +293,5 @@ async def delete_featured_section(
     if not section:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="區塊不存在")
     await db.delete(section)
+    background_tasks.add_task(invalidate_cache_tags, "content:featured-sections")
     return SuccessResponse(data={"message": "區塊已刪除"})
@@ -1,6 +1,7 @@
 """
 Admin Dashboard router
 GET /admin/dashboard
+GET /admin/dashboard/view-counter
 """
 
 from datetime import datetime, timedelta
@@ -15,6 +16,8 @@ from app.models.order import Order
 from app.models.product import Product
 from app.models.user import User
 from app.schemas.common import SuccessResponse
+from app.utils.trending import trending_product_ids
+from app.utils.view_counter import view_counter_stats
 
 router = APIRouter(prefix="/admin/dashboard", tags=["管理後台 - 儀表板"])
 
@@ -89,14 +92,11 @@ async def dashboard(
     )
     recent_orders = recent_orders_result.scalars().all()
 
-    # Top selling products
-    top_products_result = await db.execute(
-        select(Product)
-        .where(Product.is_active == True)
-        .order_by(Product.sold_count.desc())
-        .limit(10)
-    )
-    top_products = top_products_result.scalars().all()
+    # Top selling products (recent, time-decayed)
+    top_ids = await trending_product_ids(db, 10)
+    top_products_result = await db.execute(select(Product).where(Product.id.in_(top_ids)))
+    by_id = {p.id: p for p in top_products_result.scalars().all()}
+    top_products = [by_id[i] for i in top_ids if i in by_id]
 
     return SuccessResponse(data={
         "stats": {
@@ -131,3 +131,11 @@ async def dashboard(
             for p in top_products
         ],
     })
+
+
+@router.get("/view-counter", response_model=SuccessResponse)
+async def view_counter(
+    current_admin=Depends(get_current_admin_user),
+):
+    """瀏覽數寫入延遲（尚未 flush 的瀏覽數與最舊一筆的等待秒數）"""
+    return SuccessResponse(data=await view_counter_stats())
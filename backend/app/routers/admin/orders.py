@@ -7,7 +7,7 @@ PUT  /admin/orders/:id/status
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -18,13 +18,17 @@ from app.models.order import Order, OrderItem, OrderStatusLog
 from app.models.user import User
 from app.schemas.common import SuccessResponse
 from app.schemas.order import OrderStatusUpdate
+from app.tasks import add_event, publish_events
+from app.tasks.orders import ORDER_PAID, order_paid_payload
+from app.utils.inventory import cancel_orders, release_hold
+from app.utils.order_events import order_state, publish_order_events
 from app.utils.pagination import paginate
 
 router = APIRouter(prefix="/admin/orders", tags=["管理後台 - 訂單"])
 
 VALID_TRANSITIONS = {
-    "pending": ["confirmed", "cancelled"],
-    "confirmed": ["processing", "cancelled"],
+    "pending": ["paid", "cancelled"],
+    "paid": ["processing", "cancelled"],
     "processing": ["shipped", "cancelled"],
     "shipped": ["delivered"],
     "delivered": ["return_requested"],
@@ -41,15 +45,13 @@ async def list_orders(
     q: Optional[str] = None,
     page: int = Query(default=1, ge=1),
     per_page: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    exact: bool = Query(default=True, description="false = 大表允許估算總數"),
     _=Depends(require_admin_permission("orders.read")),
     db: AsyncSession = Depends(get_db),
 ):
     """列出所有訂單"""
-    query = (
-        select(Order)
-        .options(selectinload(Order.user))
-        .order_by(Order.created_at.desc())
-    )
+    query = select(Order).options(selectinload(Order.user))
 
     if status_filter:
         query = query.where(Order.status == status_filter)
@@ -59,7 +61,9 @@ async def list_orders(
         search_term = f"%{q}%"
         query = query.where(Order.order_number.ilike(search_term))
 
-    items, meta = await paginate(db, query, page, per_page)
+    items, meta = await paginate(
+        db, query, page, per_page, cursor=cursor, sort_column=Order.created_at, exact=exact
+    )
 
     data = [
         {
@@ -155,11 +159,15 @@ async def get_order(
 async def update_order_status(
     order_id: int,
     data: OrderStatusUpdate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("orders.write")),
     db: AsyncSession = Depends(get_db),
 ):
     """更新訂單狀態"""
-    result = await db.execute(select(Order).where(Order.id == order_id))
+    # Locked so the transition check cannot race the sweeper / payment callback
+    result = await db.execute(
+        select(Order).where(Order.id == order_id).options(selectinload(Order.items)).with_for_update()
+    )
     order = result.scalar_one_or_none()
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="訂單不存在")
@@ -171,17 +179,22 @@ async def update_order_status(
             detail=f"無法從 {order.status} 變更為 {data.status}",
         )
 
-    old_status = order.status
-    order.status = data.status
-
     if data.tracking_number:
         order.tracking_number = data.tracking_number
 
-    db.add(OrderStatusLog(
-        order_id=order.id,
-        from_status=old_status,
-        to_status=data.status,
-        note=data.note or f"狀態變更: {old_status} → {data.status}",
-    ))
+    note = data.admin_notes or f"狀態變更: {order.status} → {data.status}"
+    if data.status == "cancelled":
+        # Same release path as customer cancellation and the hold sweeper
+        background_tasks.add_task(await cancel_orders(db, [order], note=note))
+    else:
+        db.add(OrderStatusLog(order_id=order.id, from_status=order.status, to_status=data.status, note=note))
+        order.status = data.status
+        if data.status == "paid":
+            # Paid outside the gateway (COD, bank transfer): same effects as a payment callback
+            order.payment_status = "paid"
+            await release_hold(db, order.id)
+            event = await add_event(db, ORDER_PAID, order.id, order_paid_payload(order))
+            background_tasks.add_task(publish_events, event.id)
+        background_tasks.add_task(publish_order_events, order_state(order))
 
     return SuccessResponse(data={"message": f"訂單狀態已更新為 {data.status}"})
@@ -10,7 +10,7 @@ POST   /admin/products/:id/images
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy import or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -20,12 +20,24 @@ from app.admin_dependencies import get_current_admin_user, require_admin_permiss
 from app.models.product import Product, ProductImage, ProductVariant
 from app.schemas.common import SuccessResponse
 from app.schemas.product import ProductCreate, ProductUpdate
+from app.utils.cache import invalidate_cache_tags
 from app.utils.helpers import generate_slug
 from app.utils.pagination import paginate
+from app.utils.search import index_product
 
 router = APIRouter(prefix="/admin/products", tags=["管理後台 - 商品"])
 
 
+def _product_cache_tags(product: Product, *extra: str) -> list[str]:
+    """Cache tags touched by a write to this product"""
+    tags = ["products", f"product:{product.id}", *extra]
+    if product.brand_id:
+        tags.append(f"brand:{product.brand_id}")
+    if product.category_id:
+        tags.append(f"category:{product.category_id}")
+    return tags
+
+
 @router.get("", response_model=SuccessResponse)
 async def list_products(
     q: Optional[str] = None,
@@ -34,6 +46,8 @@ async def list_products(
     is_active: Optional[bool] = None,
     page: int = Query(default=1, ge=1),
     per_page: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    exact: bool = Query(default=True, description="false = 大表允許估算總數"),
     _=Depends(require_admin_permission("products.read")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -56,8 +70,9 @@ async def list_products(
     if is_active is not None:
         query = query.where(Product.is_active == is_active)
 
-    query = query.order_by(Product.created_at.desc())
-    items, meta = await paginate(db, query, page, per_page)
+    items, meta = await paginate(
+        db, query, page, per_page, cursor=cursor, sort_column=Product.created_at, exact=exact
+    )
 
     data = [
         {
@@ -86,6 +101,7 @@ async def list_products(
 @router.post("", response_model=SuccessResponse, status_code=status.HTTP_201_CREATED)
 async def create_product(
     data: ProductCreate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("products.write")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -147,6 +163,9 @@ async def create_product(
                 is_active=v.is_active if v.is_active is not None else True,
             ))
 
+    await index_product(db, product)
+
+    background_tasks.add_task(invalidate_cache_tags, *_product_cache_tags(product))
     return SuccessResponse(data={"id": product.id, "slug": product.slug}, message="商品已建立")
 
 
@@ -220,6 +239,7 @@ async def get_product(
 async def update_product(
     product_id: int,
     data: ProductUpdate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("products.write")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -229,6 +249,9 @@ async def update_product(
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="商品不存在")
 
+    # Purge tags for the old brand/category too, in case they change below
+    old_tags = _product_cache_tags(product)
+
     update_data = data.model_dump(exclude_unset=True)
 
     # Update slug if name changed
@@ -239,12 +262,16 @@ async def update_product(
         if field not in ("images", "variants"):
             setattr(product, field, value)
 
+    await index_product(db, product)
+
+    background_tasks.add_task(invalidate_cache_tags, *set(_product_cache_tags(product, *old_tags)))
     return SuccessResponse(data={"id": product.id}, message="商品已更新")
 
 
 @router.delete("/{product_id}", response_model=SuccessResponse)
 async def delete_product(
     product_id: int,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("products.delete")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -255,4 +282,5 @@ async def delete_product(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="商品不存在")
 
     product.is_active = False
+    background_tasks.add_task(invalidate_cache_tags, *_product_cache_tags(product))
     return SuccessResponse(data={"message": "商品已停用"})
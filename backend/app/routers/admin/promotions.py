@@ -9,7 +9,7 @@ DELETE /admin/promotions/coupons/:id
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -18,6 +18,7 @@ from app.admin_dependencies import require_admin_permission
 from app.models.coupon import Coupon
 from app.schemas.common import SuccessResponse
 from app.schemas.order import CouponCreate, CouponUpdate
+from app.utils.cache import invalidate_cache_tags
 from app.utils.pagination import paginate
 
 router = APIRouter(prefix="/admin/promotions", tags=["管理後台 - 促銷"])
@@ -28,15 +29,16 @@ async def list_coupons(
     is_active: Optional[bool] = None,
     page: int = Query(default=1, ge=1),
     per_page: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
     _=Depends(require_admin_permission("promotions.read")),
     db: AsyncSession = Depends(get_db),
 ):
     """列出所有優惠券"""
-    query = select(Coupon).order_by(Coupon.created_at.desc())
+    query = select(Coupon)
     if is_active is not None:
         query = query.where(Coupon.is_active == is_active)
 
-    items, meta = await paginate(db, query, page, per_page)
+    items, meta = await paginate(db, query, page, per_page, cursor=cursor, sort_column=Coupon.created_at)
 
     data = [
         {
@@ -63,6 +65,7 @@ async def list_coupons(
 @router.post("/coupons", response_model=SuccessResponse, status_code=status.HTTP_201_CREATED)
 async def create_coupon(
     data: CouponCreate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("promotions.write")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -90,6 +93,8 @@ async def create_coupon(
     db.add(coupon)
     await db.flush()
 
+    # Cart quotes are keyed on the coupons version (app.utils.pricing)
+    background_tasks.add_task(invalidate_cache_tags, "coupons")
     return SuccessResponse(data={"id": coupon.id, "code": coupon.code}, message="優惠券已建立")
 
 
@@ -127,6 +132,7 @@ async def get_coupon(
 async def update_coupon(
     coupon_id: int,
     data: CouponUpdate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("promotions.write")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -142,12 +148,14 @@ async def update_coupon(
     for field, value in update_data.items():
         setattr(coupon, field, value)
 
+    background_tasks.add_task(invalidate_cache_tags, "coupons")
     return SuccessResponse(data={"id": coupon.id}, message="優惠券已更新")
 
 
 @router.delete("/coupons/{coupon_id}", response_model=SuccessResponse)
 async def delete_coupon(
     coupon_id: int,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("promotions.delete")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -158,4 +166,5 @@ async def delete_coupon(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="優惠券不存在")
 
     coupon.is_active = False
+    background_tasks.add_task(invalidate_cache_tags, "coupons")
     return SuccessResponse(data={"message": "優惠券已停用"})
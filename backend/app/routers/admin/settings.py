@@ -8,7 +8,7 @@ CRUD /admin/settings/shipping-methods
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -17,6 +17,7 @@ from app.database import get_db
 from app.admin_dependencies import require_admin_permission
 from app.models.shipping import ShippingMethod
 from app.schemas.common import SuccessResponse
+from app.utils.cache import invalidate_cache_tags
 
 router = APIRouter(prefix="/admin/settings", tags=["管理後台 - 設定"])
 
@@ -73,6 +74,7 @@ async def list_shipping_methods(
 @router.post("/shipping-methods", response_model=SuccessResponse, status_code=status.HTTP_201_CREATED)
 async def create_shipping_method(
     data: ShippingMethodCreate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("settings.write")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -86,6 +88,7 @@ async def create_shipping_method(
     method = ShippingMethod(**data.model_dump())
     db.add(method)
     await db.flush()
+    background_tasks.add_task(invalidate_cache_tags, "shipping-methods")
     return SuccessResponse(data={"id": method.id}, message="運送方式已建立")
 
 
@@ -93,6 +96,7 @@ async def create_shipping_method(
 async def update_shipping_method(
     method_id: int,
     data: ShippingMethodUpdate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("settings.write")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -106,12 +110,14 @@ async def update_shipping_method(
 
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(method, field, value)
+    background_tasks.add_task(invalidate_cache_tags, "shipping-methods")
     return SuccessResponse(data={"id": method.id}, message="運送方式已更新")
 
 
 @router.delete("/shipping-methods/{method_id}", response_model=SuccessResponse)
 async def delete_shipping_method(
     method_id: int,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("settings.delete")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -124,4 +130,5 @@ async def delete_shipping_method(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="運送方式不存在")
 
     method.is_active = False
+    background_tasks.add_task(invalidate_cache_tags, "shipping-methods")
     return SuccessResponse(data={"message": "運送方式已停用"})
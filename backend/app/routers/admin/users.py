@@ -7,7 +7,7 @@ PUT  /admin/users/:id
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy import or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -17,6 +17,7 @@ from app.models.user import User
 from app.schemas.common import SuccessResponse
 from app.schemas.user import UserAdminUpdate
 from app.utils.pagination import paginate
+from app.utils.principal import invalidate_principal
 
 router = APIRouter(prefix="/admin/users", tags=["管理後台 - 會員"])
 
@@ -28,11 +29,13 @@ async def list_users(
     is_active: Optional[bool] = None,
     page: int = Query(default=1, ge=1),
     per_page: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    exact: bool = Query(default=True, description="false = 大表允許估算總數"),
     _=Depends(require_admin_permission("users.read")),
     db: AsyncSession = Depends(get_db),
 ):
     """列出所有會員"""
-    query = select(User).order_by(User.created_at.desc())
+    query = select(User)
 
     if q:
         search_term = f"%{q}%"
@@ -44,7 +47,9 @@ async def list_users(
     if is_active is not None:
         query = query.where(User.is_active == is_active)
 
-    items, meta = await paginate(db, query, page, per_page)
+    items, meta = await paginate(
+        db, query, page, per_page, cursor=cursor, sort_column=User.created_at, exact=exact
+    )
 
     data = [
         {
@@ -101,6 +106,7 @@ async def get_user(
 async def update_user(
     user_id: int,
     data: UserAdminUpdate,
+    background_tasks: BackgroundTasks,
     _=Depends(require_admin_permission("users.write")),
     db: AsyncSession = Depends(get_db),
 ):
@@ -114,4 +120,6 @@ async def update_user(
     for field, value in update_data.items():
         setattr(user, field, value)
 
+    # Role / status changes must reach the next request, not the next TTL
+    background_tasks.add_task(invalidate_principal, user.id)
     return SuccessResponse(data={"id": user.id}, message="會員資料已更新")
@@ -10,14 +10,15 @@ GET  /auth/me
 """
 
 from datetime import datetime, timezone
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
 from app.database import get_db
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, get_token_payload
 from app.models.user import User
 from app.models.points import PointsTransaction
 from app.schemas.user import (
@@ -30,13 +31,16 @@ from app.schemas.user import (
     UserResponse,
 )
 from app.schemas.common import SuccessResponse
+from app.utils.principal import invalidate_principal, load_user
+from app.utils.rate_limit import rate_limit
+from app.utils.token_revocation import is_token_revoked, revoke_token, revoke_user_tokens
 from app.utils.security import (
     create_access_token,
     create_password_reset_token,
     create_refresh_token,
     decode_token,
-    hash_password,
-    verify_password,
+    hash_password_async,
+    verify_and_update_password,
     verify_password_reset_token,
 )
 
@@ -44,7 +48,11 @@ settings = get_settings()
 router = APIRouter(prefix="/auth", tags=["認證"])
 
 
-@router.post("/register", response_model=SuccessResponse)
+@router.post(
+    "/register",
+    response_model=SuccessResponse,
+    dependencies=[Depends(rate_limit("RATE_LIMIT_REGISTER"))],
+)
 async def register(data: RegisterRequest, db: AsyncSession = Depends(get_db)):
     """註冊新帳號"""
     # Check existing email
@@ -58,7 +66,7 @@ async def register(data: RegisterRequest, db: AsyncSession = Depends(get_db)):
     # Create user
     user = User(
         email=data.email,
-        password_hash=hash_password(data.password),
+        password_hash=await hash_password_async(data.password),
         first_name=data.first_name,
         last_name=data.last_name,
         phone=data.phone,
@@ -95,13 +103,20 @@ async def register(data: RegisterRequest, db: AsyncSession = Depends(get_db)):
     )
 
 
-@router.post("/login", response_model=SuccessResponse)
+@router.post(
+    "/login",
+    response_model=SuccessResponse,
+    dependencies=[Depends(rate_limit("RATE_LIMIT_LOGIN"))],
+)
 async def login(data: LoginRequest, db: AsyncSession = Depends(get_db)):
     """登入"""
     result = await db.execute(select(User).where(User.email == data.email))
     user = result.scalar_one_or_none()
 
-    if not user or not verify_password(data.password, user.password_hash):
+    verified, new_hash = (
+        await verify_and_update_password(data.password, user.password_hash) if user else (False, None)
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email 或密碼錯誤",
@@ -113,8 +128,10 @@ async def login(data: LoginRequest, db: AsyncSession = Depends(get_db)):
             detail="帳號已被停用",
         )
 
-    # Update last login
+    # Update last login; upgrade hashes made with an outdated bcrypt cost
     user.last_login_at = datetime.now(timezone.utc)
+    if new_hash:
+        user.password_hash = new_hash
 
     access_token = create_access_token(user.id, user.role)
     refresh_token = create_refresh_token(user.id)
@@ -134,7 +151,7 @@ async def refresh_token(data: RefreshTokenRequest, db: AsyncSession = Depends(ge
     """刷新 Token"""
     payload = decode_token(data.refresh_token)
 
-    if not payload or payload.get("type") != "refresh":
+    if not payload or payload.get("type") != "refresh" or await is_token_revoked(payload):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="無效的 Refresh Token",
@@ -164,13 +181,25 @@ async def refresh_token(data: RefreshTokenRequest, db: AsyncSession = Depends(ge
 
 
 @router.post("/logout", response_model=SuccessResponse)
-async def logout(current_user=Depends(get_current_user)):
-    """登出（前端清除 Token、後端可加入黑名單）"""
-    # TODO: Add token to Redis blacklist for true invalidation
+async def logout(
+    data: Optional[RefreshTokenRequest] = None,
+    payload: dict = Depends(get_token_payload),
+    current_user=Depends(get_current_user),
+):
+    """登出（撤銷目前的 Access Token，並可一併撤銷 Refresh Token）"""
+    await revoke_token(payload)
+    if data:
+        refresh_payload = decode_token(data.refresh_token)
+        if refresh_payload and refresh_payload.get("sub") == payload.get("sub"):
+            await revoke_token(refresh_payload)
     return SuccessResponse(message="登出成功")
 
 
-@router.post("/forgot-password", response_model=SuccessResponse)
+@router.post(
+    "/forgot-password",
+    response_model=SuccessResponse,
+    dependencies=[Depends(rate_limit("RATE_LIMIT_LOGIN"))],
+)
 async def forgot_password(data: ForgotPasswordRequest, db: AsyncSession = Depends(get_db)):
     """忘記密碼 — 寄送重設密碼信"""
     result = await db.execute(select(User).where(User.email == data.email))
@@ -186,7 +215,11 @@ async def forgot_password(data: ForgotPasswordRequest, db: AsyncSession = Depend
 
 
 @router.post("/reset-password", response_model=SuccessResponse)
-async def reset_password(data: ResetPasswordRequest, db: AsyncSession = Depends(get_db)):
+async def reset_password(
+    data: ResetPasswordRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+):
     """重設密碼"""
     email = verify_password_reset_token(data.token)
     if not email:
@@ -204,14 +237,21 @@ async def reset_password(data: ResetPasswordRequest, db: AsyncSession = Depends(
             detail="使用者不存在",
         )
 
-    user.password_hash = hash_password(data.password)
+    user.password_hash = await hash_password_async(data.password)
+    background_tasks.add_task(invalidate_principal, user.id)
+    # Sessions opened with the old password (access + refresh) end here
+    await revoke_user_tokens(user.id)
 
     return SuccessResponse(message="密碼重設成功，請重新登入")
 
 
 @router.get("/me", response_model=SuccessResponse)
-async def get_me(current_user=Depends(get_current_user)):
+async def get_me(
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
     """取得當前使用者資訊"""
+    user = await load_user(db, current_user)
     return SuccessResponse(
-        data=UserResponse.model_validate(current_user).model_dump(),
+        data=UserResponse.model_validate(user).model_dump(),
     )
@@ -8,18 +8,32 @@ GET  /brands/:slug/products
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
+from app.config import get_settings
 from app.database import get_db
 from app.models.brand import Brand
 from app.models.product import Product
 from app.schemas.common import SuccessResponse
+from app.utils.cache import cached_response
+from app.utils.etag import etag_response, time_window
 from app.utils.pagination import paginate
+from app.utils.product_cards import product_card_query, serialize_card
 
+settings = get_settings()
 router = APIRouter(prefix="/brands", tags=["品牌"])
 
+# Brands have no admin write path that bumps the "brands" tag
+_brand_window = time_window(settings.CACHE_DEFAULT_TTL)
+
+
+def _brand_products_tags(payload, **_):
+    data = payload["data"]
+    return [f"brand:{data['brand']['id']}"] + [f"product:{p['id']}" for p in data["products"]]
+
 
 @router.get("", response_model=SuccessResponse)
+@etag_response("brands:list", tags=["brands"], stamp=_brand_window)
+@cached_response("brands:list", tags=["brands"])
 async def list_brands(
     db: AsyncSession = Depends(get_db),
 ):
@@ -46,6 +60,7 @@ async def list_brands(
 
 
 @router.get("/{slug}", response_model=SuccessResponse)
+@etag_response("brands:detail", tags=["brands"], stamp=_brand_window)
 async def get_brand(
     slug: str,
     db: AsyncSession = Depends(get_db),
@@ -70,6 +85,8 @@ async def get_brand(
 
 
 @router.get("/{slug}/products", response_model=SuccessResponse)
+@etag_response("brands:products", tags=["brands", "products"], stamp=_brand_window)
+@cached_response("brands:products", tags=_brand_products_tags)
 async def brand_products(
     slug: str,
     page: int = Query(default=1, ge=1),
@@ -86,34 +103,16 @@ async def brand_products(
     if not brand:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="品牌不存在")
 
-    query = (
-        select(Product)
-        .where(Product.is_active == True, Product.brand_id == brand.id)
-        .options(selectinload(Product.images), selectinload(Product.category))
-    )
+    query = product_card_query().where(Product.is_active == True, Product.brand_id == brand.id)
 
     sort_column = getattr(Product, sort_by, Product.created_at)
     if sort_order == "desc":
-        query = query.order_by(sort_column.desc())
+        query = query.order_by(sort_column.desc(), Product.id.desc())
     else:
-        query = query.order_by(sort_column.asc())
+        query = query.order_by(sort_column.asc(), Product.id.asc())
 
     items, meta = await paginate(db, query, page, per_page)
-
-    data = []
-    for item in items:
-        data.append({
-            "id": item.id,
-            "name": item.name,
-            "slug": item.slug,
-            "price": float(item.price),
-            "sale_price": float(item.sale_price) if item.sale_price else None,
-            "category_name": item.category.name if item.category else None,
-            "primary_image": item.primary_image,
-            "avg_rating": item.avg_rating,
-            "is_new": item.is_new,
-            "stock": item.stock,
-        })
+    data = [serialize_card(row) for row in items]
 
     return SuccessResponse(
         data={"brand": {"id": brand.id, "name": brand.name, "slug": brand.slug, "logo": brand.logo_url}, "products": data},
@@ -2,70 +2,96 @@
 Cart router — 購物車 API
 GET    /cart
 POST   /cart/items
+POST   /cart/items:batch
 PUT    /cart/items/:id
 DELETE /cart/items/:id
 POST   /cart/coupon
 DELETE /cart/coupon
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from app.database import get_db
 from app.dependencies import get_current_user
-from app.models.cart import CartItem
-from app.models.coupon import Coupon
-from app.models.product import Product
 from app.schemas.common import SuccessResponse
-from app.schemas.order import CartItemAdd, CartItemUpdate, CouponApplyRequest
+from app.schemas.order import CartBatchOperation, CartBatchRequest, CartItemAdd, CartItemUpdate, CouponApplyRequest
+from app.utils.cart_store import CartSnapshot, LineKey, get_cart_store
+from app.utils.pricing import quote_cart
+from app.utils.product_cards import load_cards
 
 router = APIRouter(prefix="/cart", tags=["購物車"])
 
+BATCH_ATTEMPTS = 3  # re-plans when the cart changes between read and apply
 
-@router.get("", response_model=SuccessResponse)
-async def get_cart(
-    current_user=Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
-):
-    """取得購物車"""
-    result = await db.execute(
-        select(CartItem)
-        .where(CartItem.user_id == current_user.id)
-        .options(selectinload(CartItem.product).selectinload(Product.images))
-        .order_by(CartItem.created_at.desc())
-    )
-    items = result.scalars().all()
+
+async def _cart_payload(db: AsyncSession, cart: CartSnapshot, **options) -> dict:
+    """購物車內容 + 報價（GET /cart 與批次操作共用）"""
+    cards = await load_cards(db, (line.product_id for line in cart.lines))
+    quote = await quote_cart(db, cart, cards=cards, **options)
+    priced = {line.item_id: line for line in quote.lines}
 
     cart_items = []
-    subtotal = 0
-    for item in items:
-        product = item.product
-        if not product or not product.is_active:
+    for item in reversed(cart.lines):  # newest first
+        line = priced.get(item.item_id)
+        if line is None:
             continue
-        price = float(product.sale_price or product.price)
-        line_total = price * item.quantity
-        subtotal += line_total
+        card = cards[item.product_id]
         cart_items.append({
-            "id": item.id,
-            "product_id": product.id,
-            "name": product.name,
-            "slug": product.slug,
-            "image": product.primary_image,
-            "price": float(product.price),
-            "sale_price": float(product.sale_price) if product.sale_price else None,
+            "id": item.item_id,
+            "product_id": item.product_id,
+            "name": card["name"],
+            "slug": card["slug"],
+            "image": card["primary_image"],
+            "price": card["price"],
+            "sale_price": card["sale_price"],
             "quantity": item.quantity,
             "variant_id": item.variant_id,
-            "stock": product.stock,
-            "line_total": line_total,
+            "stock": card["stock"],
+            "line_total": float(line.line_total),
         })
 
-    return SuccessResponse(data={
+    return {
         "items": cart_items,
         "item_count": len(cart_items),
-        "subtotal": subtotal,
-    })
+        "subtotal": float(quote.subtotal),
+        "coupon_code": quote.coupon_code,
+        "discount": float(quote.coupon_discount),
+        "points_used": quote.points_used,
+        "points_discount": float(quote.points_discount),
+        "credits_used": quote.credits_used,
+        "shipping_fee": float(quote.shipping_fee),
+        "total": float(quote.total),
+        "quote_id": quote.quote_id,
+    }
+
+
+@router.get("", response_model=SuccessResponse)
+async def get_cart(
+    coupon_code: Optional[str] = Query(default=None, max_length=50),
+    shipping_method: Optional[str] = None,
+    points_used: int = Query(default=0, ge=0),
+    credits_used: int = Query(default=0, ge=0),
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    取得購物車與結帳報價
+
+    With the checkout options as query params the response is the exact
+    quote POST /orders will charge; pass its ``quote_id`` along to be sure.
+    """
+    cart = await get_cart_store().load(db, current_user.id)
+    return SuccessResponse(data=await _cart_payload(
+        db,
+        cart,
+        coupon_code=coupon_code,
+        shipping_method=shipping_method,
+        points=points_used,
+        credits=credits_used,
+    ))
 
 
 @router.post("/items", response_model=SuccessResponse, status_code=status.HTTP_201_CREATED)
@@ -75,41 +101,104 @@ async def add_to_cart(
     db: AsyncSession = Depends(get_db),
 ):
     """新增商品到購物車"""
-    # Check product
-    result = await db.execute(
-        select(Product).where(Product.id == data.product_id, Product.is_active == True)
-    )
-    product = result.scalar_one_or_none()
-    if not product:
+    card = (await load_cards(db, [data.product_id])).get(data.product_id)
+    if not card or not card["is_active"]:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="商品不存在")
 
-    if product.stock < data.quantity:
+    if card["stock"] < data.quantity:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="庫存不足")
 
-    # Check if already in cart
-    existing = await db.execute(
-        select(CartItem).where(
-            CartItem.user_id == current_user.id,
-            CartItem.product_id == data.product_id,
-            CartItem.variant_id == data.variant_id,
-        )
+    # Existing line + new quantity is checked against stock atomically in the store
+    line = await get_cart_store().add(
+        db, current_user.id, data.product_id, data.variant_id, data.quantity, max_quantity=card["stock"]
     )
-    cart_item = existing.scalar_one_or_none()
+    if line is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="超過庫存數量")
+
+    return SuccessResponse(data={"message": "已加入購物車"})
+
+
+def _plan_batch(
+    cart: CartSnapshot, operations: List[CartBatchOperation], cards: Dict[int, dict]
+) -> Tuple[List[dict], Dict[LineKey, int]]:
+    """
+    Per-operation results and the new quantity of every changed line (0 = remove)
 
-    if cart_item:
-        cart_item.quantity += data.quantity
-        if cart_item.quantity > product.stock:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="超過庫存數量")
+    Operations apply in order on top of the cart; stock is then checked per
+    product over all of its lines as the whole batch leaves them. Lines a
+    product cannot cover fall back to their current quantity.
+    """
+    current = {(line.product_id, line.variant_id): line.quantity for line in cart.lines}
+    planned = dict(current)
+    touched: Dict[LineKey, List[int]] = {}
+    errors: Dict[int, str] = {}
+
+    for index, operation in enumerate(operations):
+        key = (operation.product_id, operation.variant_id)
+        card = cards.get(operation.product_id)
+        if operation.op == "remove":
+            if planned.get(key, 0) <= 0:
+                errors[index] = "購物車商品不存在"
+                continue
+            planned[key] = 0
+        elif card is None or not card["is_active"]:
+            errors[index] = "商品不存在"
+            continue
+        elif operation.op == "add":
+            planned[key] = planned.get(key, 0) + operation.quantity
+        else:
+            planned[key] = operation.quantity
+        touched.setdefault(key, []).append(index)
+
+    totals: Dict[int, int] = {}
+    for (product_id, _), quantity in planned.items():
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    for key, indexes in touched.items():
+        card = cards.get(key[0])
+        if card and totals[key[0]] > card["stock"] and planned[key] > current.get(key, 0):
+            planned[key] = current.get(key, 0)
+            errors.update((index, "庫存不足") for index in indexes)
+
+    results = []
+    for index, operation in enumerate(operations):
+        key = (operation.product_id, operation.variant_id)
+        result = {"op": operation.op, "product_id": operation.product_id, "variant_id": operation.variant_id}
+        if index in errors:
+            result.update(status="error", detail=errors[index])
+        else:
+            result.update(status="ok", quantity=planned[key])
+        results.append(result)
+
+    changes = {key: planned[key] for key in touched if planned[key] != current.get(key, 0)}
+    return results, changes
+
+
+@router.post("/items:batch", response_model=SuccessResponse)
+async def batch_cart_items(
+    data: CartBatchRequest,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    批次新增 / 更新 / 移除購物車商品
+
+    Products come from the shared card cache (one query for the misses), the
+    cart is read once and every change is written in one store operation —
+    on CART_BACKEND=database a single upsert in this request's transaction.
+    """
+    store = get_cart_store()
+    cards = await load_cards(db, {operation.product_id for operation in data.operations})
+
+    for _ in range(BATCH_ATTEMPTS):
+        cart = await store.load(db, current_user.id)
+        results, changes = _plan_batch(cart, data.operations, cards)
+        if not changes or await store.apply(db, current_user.id, cart.version, changes):
+            break
     else:
-        cart_item = CartItem(
-            user_id=current_user.id,
-            product_id=data.product_id,
-            variant_id=data.variant_id,
-            quantity=data.quantity,
-        )
-        db.add(cart_item)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="購物車正在更新，請稍後再試")
 
-    return SuccessResponse(data={"message": "已加入購物車"})
+    cart = await store.load(db, current_user.id)
+    return SuccessResponse(data={"results": results, "cart": await _cart_payload(db, cart)})
 
 
 @router.put("/items/{item_id}", response_model=SuccessResponse)
@@ -120,19 +209,17 @@ async def update_cart_item(
     db: AsyncSession = Depends(get_db),
 ):
     """更新購物車商品數量"""
-    result = await db.execute(
-        select(CartItem)
-        .where(CartItem.id == item_id, CartItem.user_id == current_user.id)
-        .options(selectinload(CartItem.product))
-    )
-    cart_item = result.scalar_one_or_none()
-    if not cart_item:
+    store = get_cart_store()
+    line = (await store.load(db, current_user.id)).find(item_id)
+    if not line:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="購物車商品不存在")
 
-    if cart_item.product.stock < data.quantity:
+    card = (await load_cards(db, [line.product_id])).get(line.product_id)
+    if card is None or card["stock"] < data.quantity:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="庫存不足")
 
-    cart_item.quantity = data.quantity
+    if await store.set_quantity(db, current_user.id, item_id, data.quantity) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="購物車商品不存在")
     return SuccessResponse(data={"message": "已更新數量"})
 
 
@@ -143,14 +230,8 @@ async def remove_cart_item(
     db: AsyncSession = Depends(get_db),
 ):
     """移除購物車商品"""
-    result = await db.execute(
-        select(CartItem).where(CartItem.id == item_id, CartItem.user_id == current_user.id)
-    )
-    cart_item = result.scalar_one_or_none()
-    if not cart_item:
+    if not await get_cart_store().remove(db, current_user.id, item_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="購物車商品不存在")
-
-    await db.delete(cart_item)
     return SuccessResponse(data={"message": "已移除商品"})
 
 
@@ -161,46 +242,16 @@ async def apply_coupon(
     db: AsyncSession = Depends(get_db),
 ):
     """套用優惠券"""
-    result = await db.execute(
-        select(Coupon).where(Coupon.code == data.code.upper())
-    )
-    coupon = result.scalar_one_or_none()
-    if not coupon:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="優惠券不存在")
-
-    if not coupon.is_valid:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="優惠券已失效或過期")
-
-    # Calculate cart subtotal
-    cart_result = await db.execute(
-        select(CartItem)
-        .where(CartItem.user_id == current_user.id)
-        .options(selectinload(CartItem.product))
-    )
-    items = cart_result.scalars().all()
-    subtotal = sum(
-        float(item.product.sale_price or item.product.price) * item.quantity
-        for item in items if item.product and item.product.is_active
-    )
-
-    if coupon.min_order_amount and subtotal < float(coupon.min_order_amount):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"訂單金額需滿 ${coupon.min_order_amount} 才能使用此優惠券",
-        )
-
-    # Calculate discount
-    if coupon.discount_type == "percentage":
-        discount = subtotal * (float(coupon.discount_value) / 100)
-        if coupon.max_discount_amount:
-            discount = min(discount, float(coupon.max_discount_amount))
-    else:
-        discount = float(coupon.discount_value)
+    cart = await get_cart_store().load(db, current_user.id)
+    quote = await quote_cart(db, cart, coupon_code=data.code)
 
     return SuccessResponse(data={
-        "code": coupon.code,
-        "discount_type": coupon.discount_type,
-        "discount_value": float(coupon.discount_value),
-        "discount_amount": round(discount, 2),
-        "message": f"已套用優惠券 {coupon.code}",
+        "code": quote.coupon_code,
+        "discount_type": quote.extra["discount_type"],
+        "discount_value": float(quote.extra["discount_value"]),
+        "discount_amount": float(quote.coupon_discount),
+        "subtotal": float(quote.subtotal),
+        "total": float(quote.total),
+        "quote_id": quote.quote_id,
+        "message": f"已套用優惠券 {quote.coupon_code}",
     })
@@ -5,20 +5,32 @@ GET /content/announcements
 GET /content/featured-sections
 """
 
+import time
 from datetime import datetime
 
 from fastapi import APIRouter, Depends
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import get_settings
 from app.database import get_db
 from app.models.content import Announcement, Banner, FeaturedSection
 from app.schemas.common import SuccessResponse
+from app.utils.cache import cached_response
+from app.utils.etag import etag_response
 
+settings = get_settings()
 router = APIRouter(prefix="/content", tags=["內容"])
 
 
+async def _content_window(**_) -> str:
+    # Banners / announcements appear and expire on a schedule, not only on writes
+    return str(int(time.time() // settings.CACHE_CONTENT_TTL))
+
+
 @router.get("/banners", response_model=SuccessResponse)
+@etag_response("content:banners", tags=["content:banners"], stamp=_content_window)
+@cached_response("content:banners", tags=["content:banners"], ttl=settings.CACHE_CONTENT_TTL)
 async def get_banners(
     db: AsyncSession = Depends(get_db),
 ):
@@ -50,6 +62,8 @@ async def get_banners(
 
 
 @router.get("/announcements", response_model=SuccessResponse)
+@etag_response("content:announcements", tags=["content:announcements"], stamp=_content_window)
+@cached_response("content:announcements", tags=["content:announcements"], ttl=settings.CACHE_CONTENT_TTL)
 async def get_announcements(
     db: AsyncSession = Depends(get_db),
 ):
@@ -79,6 +93,8 @@ async def get_announcements(
 
 
 @router.get("/featured-sections", response_model=SuccessResponse)
+@etag_response("content:featured-sections", tags=["content:featured-sections"], stamp=_content_window)
+@cached_response("content:featured-sections", tags=["content:featured-sections"], ttl=settings.CACHE_CONTENT_TTL)
 async def get_featured_sections(
     db: AsyncSession = Depends(get_db),
 ):
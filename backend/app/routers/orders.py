@@ -3,28 +3,40 @@ Orders router — 訂單 API
 POST /orders
 GET  /orders
 GET  /orders/:id
+GET  /orders/:id/events
 POST /orders/:id/cancel
 POST /orders/:id/return
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from starlette.background import BackgroundTask
 
 from app.database import get_db
 from app.dependencies import get_current_user
-from app.models.cart import CartItem
-from app.models.coupon import Coupon, CouponUsage
+from app.models.coupon import CouponUsage
 from app.models.order import Order, OrderItem, OrderStatusLog
-from app.models.product import Product
 from app.models.returns import ReturnRequest
-from app.models.shipping import ShippingMethod
 from app.models.points import PointsTransaction
 from app.schemas.common import SuccessResponse
 from app.schemas.order import OrderCreate, ReturnCreate
-from app.utils.helpers import generate_order_number
+from app.tasks import add_event, publish_events
+from app.tasks.orders import ORDER_CREATED, order_created_payload
+from app.utils.cache import invalidate_cache_tags
+from app.utils.cart_store import get_cart_store
+from app.utils.inventory import cancel_orders, place_hold, reserve_stock, stock_cache_tags
+from app.utils.order_events import order_state, stream_order_events, subscribe_order
+from app.utils.order_numbers import next_order_number
 from app.utils.pagination import paginate
+from app.utils.coupons import find_coupon, reserve_coupon
+from app.utils.pricing import quote_cart
+from app.utils.product_cards import load_cards
+from app.utils.principal import invalidate_principal, load_user
 
 router = APIRouter(prefix="/orders", tags=["訂單"])
 
@@ -32,121 +44,93 @@ router = APIRouter(prefix="/orders", tags=["訂單"])
 @router.post("", response_model=SuccessResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     data: OrderCreate,
+    background_tasks: BackgroundTasks,
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """建立訂單"""
-    # Get cart items
-    cart_result = await db.execute(
-        select(CartItem)
-        .where(CartItem.user_id == current_user.id)
-        .options(
-            selectinload(CartItem.product).selectinload(Product.images),
-        )
-    )
-    cart_items = cart_result.scalars().all()
+    # Get cart
+    store = get_cart_store()
+    cart = await store.load(db, current_user.id)
 
-    if not cart_items:
+    if not cart.lines:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="購物車是空的")
+    cards = await load_cards(db, (line.product_id for line in cart.lines))
+
+    # Same quote as GET /cart and POST /cart/coupon (memoized, Decimal)
+    quote = await quote_cart(
+        db,
+        cart,
+        cards=cards,
+        coupon_code=data.coupon_code,
+        shipping_method=data.shipping_method,
+        points=data.points_used,
+        credits=data.credits_used,
+    )
+    if data.quote_id and data.quote_id != quote.quote_id:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="購物車內容或價格已變更，請重新確認")
+    if quote.unavailable:
+        names = "、".join(
+            cards[line.product_id]["name"] if line.product_id in cards else "未知"
+            for line in cart.lines if line.item_id in quote.unavailable
+        )
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"商品 {names} 已下架")
+
+    # Reserve stock for every line in one conditional UPDATE (no oversell)
+    failed = await reserve_stock(db, [(line.product_id, line.quantity) for line in quote.lines])
+    if failed:
+        names = "、".join(dict.fromkeys(cards[i]["name"] for i in failed))
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"商品 {names} 庫存不足",
+        )
 
-    # Calculate subtotal and validate stock
-    subtotal = 0
-    order_items = []
-    for ci in cart_items:
-        product = ci.product
-        if not product or not product.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"商品 {product.name if product else '未知'} 已下架",
-            )
-        if product.stock < ci.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"商品 {product.name} 庫存不足",
-            )
-        unit_price = float(product.sale_price or product.price)
-        line_total = unit_price * ci.quantity
-        subtotal += line_total
-        order_items.append({
-            "product": product,
-            "quantity": ci.quantity,
-            "variant_id": ci.variant_id,
-            "unit_price": unit_price,
-            "total_price": line_total,
-        })
+    # Coupon: the quote may be cached, one use is reserved atomically (total + per user)
+    coupon = None
+    if quote.coupon_code:
+        coupon, _ = await find_coupon(db, quote.coupon_code)
+        if coupon is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="優惠券已失效或過期")
+        await reserve_coupon(db, coupon, current_user.id)
 
-    # Coupon discount
-    discount = 0
-    coupon_code = None
-    if data.coupon_code:
-        result = await db.execute(
-            select(Coupon).where(Coupon.code == data.coupon_code.upper())
-        )
-        coupon = result.scalar_one_or_none()
-        if coupon and coupon.is_valid:
-            coupon_code = coupon.code
-            if coupon.discount_type == "percentage":
-                discount = subtotal * (float(coupon.discount_value) / 100)
-                if coupon.max_discount_amount:
-                    discount = min(discount, float(coupon.max_discount_amount))
-            else:
-                discount = float(coupon.discount_value)
-            coupon.used_count += 1
-            db.add(CouponUsage(coupon_id=coupon.id, user_id=current_user.id))
+    # Balances are checked against the locked row, not the cached principal
+    user = None
+    if quote.points_used > 0 or quote.credits_used > 0:
+        user = await load_user(db, current_user, for_update=True)
 
     # Points
-    points_used = 0
-    points_discount = 0
-    if data.points_used and data.points_used > 0:
-        if current_user.points < data.points_used:
+    if quote.points_used > 0:
+        if user.points < quote.points_used:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="點數不足")
-        points_used = data.points_used
-        points_discount = points_used  # 1 point = NT$1
-        current_user.points -= points_used
+        user.points -= quote.points_used
         db.add(PointsTransaction(
             user_id=current_user.id,
             type="redeem",
-            amount=-points_used,
+            amount=-quote.points_used,
+            balance_after=user.points,
             description="訂單折抵",
         ))
 
     # Credits
-    credits_used = 0
-    if data.credits_used and data.credits_used > 0:
-        if current_user.credits < data.credits_used:
+    if quote.credits_used > 0:
+        if user.credits < quote.credits_used:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="購物金不足")
-        credits_used = data.credits_used
-        current_user.credits -= credits_used
-
-    # Shipping
-    shipping_fee = 0
-    if data.shipping_method:
-        sm_result = await db.execute(
-            select(ShippingMethod).where(ShippingMethod.code == data.shipping_method)
-        )
-        shipping_method = sm_result.scalar_one_or_none()
-        if shipping_method:
-            shipping_fee = float(shipping_method.fee)
-            if shipping_method.free_threshold and subtotal >= float(shipping_method.free_threshold):
-                shipping_fee = 0
-
-    total = subtotal - discount - points_discount - credits_used + shipping_fee
-    if total < 0:
-        total = 0
+        user.credits -= quote.credits_used
 
     # Create order
     order = Order(
         user_id=current_user.id,
-        order_number=generate_order_number(),
+        order_number=await next_order_number(db),
         status="pending",
-        subtotal=subtotal,
-        discount=discount,
-        shipping_fee=shipping_fee,
-        total=round(total, 2),
-        points_used=points_used,
-        credits_used=credits_used,
-        coupon_code=coupon_code,
+        subtotal=quote.subtotal,
+        discount=quote.coupon_discount,
+        shipping_fee=quote.shipping_fee,
+        total=quote.total,
+        points_used=quote.points_used,
+        credits_used=quote.credits_used,
+        coupon_code=quote.coupon_code,
         payment_method=data.payment_method,
+        shipping_method=data.shipping_method,
         shipping_address={
             "recipient_name": data.shipping_address.recipient_name,
             "phone": data.shipping_address.phone,
@@ -160,21 +144,30 @@ async def create_order(
     db.add(order)
     await db.flush()
 
-    # Create order items + update stock
-    for oi in order_items:
-        product = oi["product"]
+    if coupon is not None:
+        db.add(CouponUsage(
+            coupon_id=coupon.id,
+            user_id=current_user.id,
+            order_id=order.id,
+            discount_amount=quote.coupon_discount,
+        ))
+
+    # Online payments must complete before the hold expires
+    payment_expires_at = place_hold(db, order)
+
+    # Create order items
+    for line in quote.lines:
+        card = cards[line.product_id]
         db.add(OrderItem(
             order_id=order.id,
-            product_id=product.id,
-            variant_id=oi["variant_id"],
-            product_name=product.name,
-            product_image=product.primary_image,
-            unit_price=oi["unit_price"],
-            quantity=oi["quantity"],
-            subtotal=oi["total_price"],
+            product_id=line.product_id,
+            variant_id=line.variant_id,
+            product_name=card["name"],
+            product_image=card["primary_image"],
+            unit_price=line.unit_price,
+            quantity=line.quantity,
+            subtotal=line.line_total,
         ))
-        product.stock -= oi["quantity"]
-        product.sold_count += oi["quantity"]
 
     # Status log
     db.add(OrderStatusLog(
@@ -184,12 +177,30 @@ async def create_order(
         note="訂單已建立",
     ))
 
-    # Clear cart
-    for ci in cart_items:
-        await db.delete(ci)
+    # Only the cart that was priced: bump its version (compare-and-set) before the commit,
+    # so a change since it was loaded — or a second checkout of the same cart — gets 409
+    if not await store.apply(db, current_user.id, cart.version, {}):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="購物車內容已變更，請重新確認")
+
+    # Clear cart (Redis / memory carts once the order is committed)
+    clear_cart = await store.consume(db, current_user.id, cart.lines)
+
+    # Email, points earning and trending run on workers once the order is committed
+    lines = [(line.product_id, line.quantity) for line in quote.lines]
+    event = await add_event(db, ORDER_CREATED, order.id, order_created_payload(order, lines))
+    background_tasks.add_task(clear_cart)
+    background_tasks.add_task(publish_events, event.id)
+    background_tasks.add_task(invalidate_cache_tags, *stock_cache_tags(lines))
+    if user is not None:
+        background_tasks.add_task(invalidate_principal, user.id)
 
     return SuccessResponse(
-        data={"order_id": order.id, "order_number": order.order_number, "total": float(order.total)},
+        data={
+            "order_id": order.id,
+            "order_number": order.order_number,
+            "total": float(order.total),
+            "payment_expires_at": payment_expires_at.isoformat() if payment_expires_at else None,
+        },
         message="訂單已建立",
     )
 
@@ -199,19 +210,16 @@ async def list_orders(
     status_filter: str = Query(default=None, alias="status"),
     page: int = Query(default=1, ge=1),
     per_page: int = Query(default=10, ge=1, le=50),
+    cursor: Optional[str] = None,
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """取得我的訂單列表"""
-    query = (
-        select(Order)
-        .where(Order.user_id == current_user.id)
-        .order_by(Order.created_at.desc())
-    )
+    query = select(Order).where(Order.user_id == current_user.id)
     if status_filter:
         query = query.where(Order.status == status_filter)
 
-    items, meta = await paginate(db, query, page, per_page)
+    items, meta = await paginate(db, query, page, per_page, cursor=cursor, sort_column=Order.created_at)
 
     data = []
     for order in items:
@@ -289,54 +297,64 @@ async def get_order(
     })
 
 
+@router.get("/{order_id}/events")
+async def order_events(
+    order_id: int,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    訂單狀態事件串流（SSE）
+
+    Sends the current status / payment status, then every change as it is
+    committed (app.utils.order_events) — replaces polling GET /orders/:id
+    and GET /payments/:id/status on the payment page.
+    """
+    # Subscribed before the state is read, so a change in between is not lost
+    subscription = subscribe_order(order_id)
+    try:
+        order = await db.scalar(select(Order).where(Order.id == order_id, Order.user_id == current_user.id))
+        if not order:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="訂單不存在")
+        state = order_state(order)
+    except Exception:
+        subscription.close()
+        raise
+    await db.close()  # the connection goes back to the pool; the stream never touches the database
+
+    return StreamingResponse(
+        stream_order_events(subscription, state),
+        media_type="text/event-stream",
+        # identity: keeps GZipMiddleware from buffering the events
+        headers={"Cache-Control": "no-cache", "Content-Encoding": "identity", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(subscription.close),  # the stream may never start (client gone)
+    )
+
+
 @router.post("/{order_id}/cancel", response_model=SuccessResponse)
 async def cancel_order(
     order_id: int,
+    background_tasks: BackgroundTasks,
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """取消訂單"""
+    # Locked: the hold sweeper and the payment callback may be changing it
     result = await db.execute(
         select(Order)
         .where(Order.id == order_id, Order.user_id == current_user.id)
         .options(selectinload(Order.items))
+        .with_for_update()
     )
     order = result.scalar_one_or_none()
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="訂單不存在")
 
-    if order.status not in ("pending", "confirmed"):
+    if order.status not in ("pending", "paid"):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="此訂單無法取消")
 
-    old_status = order.status
-    order.status = "cancelled"
-
-    # Restore stock
-    for oi in order.items:
-        prod_result = await db.execute(select(Product).where(Product.id == oi.product_id))
-        product = prod_result.scalar_one_or_none()
-        if product:
-            product.stock += oi.quantity
-            product.sold_count -= oi.quantity
-
-    # Restore points / credits
-    if order.points_used > 0:
-        current_user.points += order.points_used
-        db.add(PointsTransaction(
-            user_id=current_user.id,
-            type="adjust",
-            amount=order.points_used,
-            description=f"訂單取消退還 ({order.order_number})",
-        ))
-    if order.credits_used > 0:
-        current_user.credits += float(order.credits_used)
-
-    db.add(OrderStatusLog(
-        order_id=order.id,
-        from_status=old_status,
-        to_status="cancelled",
-        note="會員取消訂單",
-    ))
+    # Stock, hold, points / credits; trending and caches after the commit
+    background_tasks.add_task(await cancel_orders(db, [order], note="會員取消訂單"))
 
     return SuccessResponse(data={"message": "訂單已取消"})
 
@@ -5,27 +5,41 @@ POST /payments/callback
 GET  /payments/:id/status
 """
 
+import hashlib
 import uuid
+from datetime import datetime, timezone
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+import structlog
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Request, status
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.dependencies import get_current_user
-from app.models.order import Order, OrderStatusLog
-from app.models.payment import Payment
+from app.models.order import Order
+from app.models.payment import Payment, PaymentCallback
 from app.schemas.common import SuccessResponse
 from app.schemas.order import PaymentCreateRequest
+from app.tasks import add_event, publish_events
+from app.tasks.payments import PAYMENT_CALLBACK_RECEIVED
+from app.utils.ecpay import get_ecpay_signer
+
+logger = structlog.get_logger()
 
 router = APIRouter(prefix="/payments", tags=["付款"])
 
+GATEWAY = "ecpay"
+
 
 @router.post("/create", response_model=SuccessResponse, status_code=status.HTTP_201_CREATED)
 async def create_payment(
     data: PaymentCreateRequest,
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    idempotency_key_header: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
     """建立付款記錄"""
     # Verify order
@@ -39,11 +53,24 @@ async def create_payment(
     if order.payment_status == "paid":
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="訂單已付款")
 
+    # Client key (header / body) is persisted, so duplicates are caught even
+    # after the idempotency middleware's retention window
+    client_key = idempotency_key_header or data.idempotency_key
+    if client_key:
+        idempotency_key = hashlib.sha256(f"{current_user.id}:{client_key}".encode()).hexdigest()
+        existing = await db.execute(select(Payment).where(Payment.idempotency_key == idempotency_key))
+        payment = existing.scalar_one_or_none()
+        if payment:
+            if payment.order_id != order.id:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Idempotency-Key 已用於其他付款")
+            return SuccessResponse(data=_payment_data(payment, order), message="付款建立成功")
+    else:
+        idempotency_key = str(uuid.uuid4())
+
     # Create payment record
-    idempotency_key = str(uuid.uuid4())
     payment = Payment(
         order_id=order.id,
-        method=data.method,
+        payment_method=data.payment_method,
         amount=float(order.total),
         currency="TWD",
         status="pending",
@@ -52,76 +79,67 @@ async def create_payment(
     db.add(payment)
     await db.flush()
 
+    return SuccessResponse(data=_payment_data(payment, order), message="付款建立成功")
+
+
+def _payment_data(payment: Payment, order: Order) -> dict:
     # Build payment form data for ECPay / other gateways
     # In production, this would integrate with a real payment gateway
-    payment_data = {
+    return {
         "payment_id": payment.id,
         "order_number": order.order_number,
-        "amount": float(order.total),
-        "method": data.method,
-        "idempotency_key": idempotency_key,
+        "amount": float(payment.amount),
+        "method": payment.payment_method,
+        "idempotency_key": payment.idempotency_key,
         # ECPay specific fields would be generated here
         "gateway_url": "https://payment-stage.ecpay.com.tw/Cashier/AioCheckOut/V5",
     }
 
-    return SuccessResponse(data=payment_data, message="付款建立成功")
+
+def _store_callback(dialect_name: str, data: dict):
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING id（重送的通知回傳 None）"""
+    stmt = (pg_insert if dialect_name == "postgresql" else sqlite_insert)(PaymentCallback).values(
+        gateway=GATEWAY,
+        trade_no=data["TradeNo"],
+        rtn_code=data.get("RtnCode", ""),
+        merchant_trade_no=data["MerchantTradeNo"],
+        payload=data,
+        received_at=datetime.now(timezone.utc),
+    )
+    return stmt.on_conflict_do_nothing(
+        index_elements=["gateway", "trade_no", "rtn_code"]
+    ).returning(PaymentCallback.id)
 
 
 @router.post("/callback", response_model=SuccessResponse)
 async def payment_callback(
     request: Request,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
 ):
-    """付款回調（支付閘道通知）"""
-    # Parse callback data - ECPay sends form data
-    form_data = await request.form()
-    data = dict(form_data)
-
-    # In production: verify MAC value from ECPay
-    # mac_value = data.get("CheckMacValue")
-    # verify_ecpay_mac(data, mac_value)
-
-    merchant_trade_no = data.get("MerchantTradeNo", "")
-    rtn_code = data.get("RtnCode", "")
-    trade_no = data.get("TradeNo", "")
-
-    # Find order by merchant trade number
-    result = await db.execute(
-        select(Order).where(Order.order_number == merchant_trade_no)
-    )
-    order = result.scalar_one_or_none()
-    if not order:
-        return SuccessResponse(data={"message": "0|OrderNotFound"})
-
-    # Find payment
-    payment_result = await db.execute(
-        select(Payment).where(Payment.order_id == order.id).order_by(Payment.created_at.desc())
-    )
-    payment = payment_result.scalar_one_or_none()
-
-    if rtn_code == "1":
-        # Payment successful
-        if payment:
-            payment.status = "completed"
-            payment.transaction_id = trade_no
-            payment.gateway_response = data
-
-        order.payment_status = "paid"
-        old_status = order.status
-        order.status = "confirmed"
-        db.add(OrderStatusLog(
-            order_id=order.id,
-            from_status=old_status,
-            to_status="confirmed",
-            note=f"付款成功 (交易編號: {trade_no})",
-        ))
-    else:
-        # Payment failed
-        if payment:
-            payment.status = "failed"
-            payment.gateway_response = data
-
-        order.payment_status = "failed"
+    """
+    付款回調（支付閘道通知）
+
+    Verifies CheckMacValue, stores the notification in the payment_callbacks
+    inbox and acks; app.tasks.payments applies it to the order. A redelivered
+    notification is acked without being stored again.
+    """
+    # ECPay sends form data
+    data = dict(await request.form())
+
+    signer = get_ecpay_signer()
+    if signer is not None and not signer.verify(data):
+        logger.warning("payment_callback_bad_mac", merchant_trade_no=data.get("MerchantTradeNo"))
+        return SuccessResponse(data={"message": "0|CheckMacValue Error"})
+    if not data.get("MerchantTradeNo") or not data.get("TradeNo"):
+        return SuccessResponse(data={"message": "0|InvalidNotification"})
+
+    callback_id = await db.scalar(_store_callback(db.get_bind().dialect.name, data))
+    if callback_id is not None:
+        event = await add_event(
+            db, PAYMENT_CALLBACK_RECEIVED, callback_id, {"merchant_trade_no": data["MerchantTradeNo"]}
+        )
+        background_tasks.add_task(publish_events, event.id)
 
     return SuccessResponse(data={"message": "1|OK"})
 
@@ -145,7 +163,7 @@ async def get_payment_status(
     return SuccessResponse(data={
         "id": payment.id,
         "order_id": payment.order_id,
-        "method": payment.method,
+        "method": payment.payment_method,
         "amount": float(payment.amount),
         "status": payment.status,
         "transaction_id": payment.transaction_id,
@@ -6,6 +6,8 @@ GET  /credits
 GET  /credits/history
 """
 
+from typing import Optional
+
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -33,16 +35,13 @@ async def get_points(
 async def points_history(
     page: int = Query(default=1, ge=1),
     per_page: int = Query(default=20, ge=1, le=50),
+    cursor: Optional[str] = None,
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """取得點數歷史紀錄"""
-    query = (
-        select(PointsTransaction)
-        .where(PointsTransaction.user_id == current_user.id)
-        .order_by(PointsTransaction.created_at.desc())
-    )
-    items, meta = await paginate(db, query, page, per_page)
+    query = select(PointsTransaction).where(PointsTransaction.user_id == current_user.id)
+    items, meta = await paginate(db, query, page, per_page, cursor=cursor, sort_column=PointsTransaction.created_at)
 
     data = [
         {
@@ -72,16 +71,13 @@ async def get_credits(
 async def credits_history(
     page: int = Query(default=1, ge=1),
     per_page: int = Query(default=20, ge=1, le=50),
+    cursor: Optional[str] = None,
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """取得購物金歷史紀錄"""
-    query = (
-        select(CreditsTransaction)
-        .where(CreditsTransaction.user_id == current_user.id)
-        .order_by(CreditsTransaction.created_at.desc())
-    )
-    items, meta = await paginate(db, query, page, per_page)
+    query = select(CreditsTransaction).where(CreditsTransaction.user_id == current_user.id)
+    items, meta = await paginate(db, query, page, per_page, cursor=cursor, sort_column=CreditsTransaction.created_at)
 
     data = [
         {
@@ -8,13 +8,15 @@ GET  /products/:id/reviews
 POST /products/:id/reviews
 """
 
+import time
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func, or_, select
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.config import get_settings
 from app.database import get_db
 from app.dependencies import get_current_user, get_current_user_optional
 from app.models.product import Product, ProductReview
@@ -27,12 +29,31 @@ from app.schemas.product import (
     ReviewCreate,
     ReviewResponse,
 )
+from app.utils.cache import cached_response, invalidate_cache_tags
+from app.utils.etag import etag_response, time_window
 from app.utils.pagination import paginate
+from app.utils.product_cards import product_card_query, serialize_card
+from app.utils.rate_limit import rate_limit
+from app.utils.search import search_products_query
+from app.utils.trending import trending_product_ids
+from app.utils.view_counter import record_view
 
+settings = get_settings()
 router = APIRouter(prefix="/products", tags=["商品"])
 
 
+def _product_tags(product_id: int, **_) -> list[str]:
+    return [f"product:{product_id}"]
+
+
+async def _trending_window(**_) -> str:
+    # Scores move with every order, not only on catalog writes
+    return str(int(time.time() // settings.TRENDING_CACHE_TTL))
+
+
 @router.get("", response_model=SuccessResponse)
+@etag_response("products:list", tags=["products"], stamp=time_window(settings.CACHE_DEFAULT_TTL))
+@cached_response("products:list", tags=["products"])
 async def list_products(
     category_id: Optional[int] = None,
     brand_id: Optional[int] = None,
@@ -45,10 +66,12 @@ async def list_products(
     sort_order: str = Query(default="desc", regex="^(asc|desc)$"),
     page: int = Query(default=1, ge=1),
     per_page: int = Query(default=20, ge=1, le=50),
+    cursor: Optional[str] = Query(default=None, description="Keyset 分頁游標（取代 page）"),
     db: AsyncSession = Depends(get_db),
 ):
     """取得商品列表（分頁、篩選、排序）"""
-    query = select(Product).where(Product.is_active == True)
+    sort_column = getattr(Product, sort_by, Product.created_at)
+    query = product_card_query(Product.created_at).where(Product.is_active == True)
 
     # Filters
     if category_id:
@@ -64,123 +87,56 @@ async def list_products(
     if is_featured is not None:
         query = query.where(Product.is_featured == is_featured)
 
-    # Sort
-    sort_column = getattr(Product, sort_by, Product.created_at)
-    if sort_order == "desc":
-        query = query.order_by(sort_column.desc())
-    else:
-        query = query.order_by(sort_column.asc())
-
-    # Eager load relationships
-    query = query.options(
-        selectinload(Product.brand),
-        selectinload(Product.category),
-        selectinload(Product.images),
+    # Sort (applied by paginate together with the id tie-breaker)
+    items, meta = await paginate(
+        db, query, page, per_page,
+        cursor=cursor, sort_column=sort_column, descending=sort_order == "desc",
     )
 
-    items, meta = await paginate(db, query, page, per_page)
-
-    data = []
-    for item in items:
-        data.append({
-            "id": item.id,
-            "name": item.name,
-            "slug": item.slug,
-            "price": float(item.price),
-            "sale_price": float(item.sale_price) if item.sale_price else None,
-            "brand_name": item.brand.name if item.brand else None,
-            "category_name": item.category.name if item.category else None,
-            "primary_image": item.primary_image,
-            "avg_rating": item.avg_rating,
-            "review_count": item.review_count,
-            "is_new": item.is_new,
-            "is_featured": item.is_featured,
-            "stock": item.stock,
-        })
-
-    return SuccessResponse(data=data, meta=meta)
+    return SuccessResponse(data=[serialize_card(row) for row in items], meta=meta)
 
 
-@router.get("/search", response_model=SuccessResponse)
+@router.get(
+    "/search",
+    response_model=SuccessResponse,
+    dependencies=[Depends(rate_limit("RATE_LIMIT_SEARCH", per="user"))],
+)
+@etag_response("products:search", tags=["products"], stamp=time_window(settings.CACHE_DEFAULT_TTL))
 async def search_products(
     q: str = Query(min_length=1, max_length=100),
     page: int = Query(default=1, ge=1),
     per_page: int = Query(default=20, ge=1, le=50),
     db: AsyncSession = Depends(get_db),
 ):
-    """搜尋商品"""
-    search_term = f"%{q}%"
-    query = (
-        select(Product)
-        .where(
-            Product.is_active == True,
-            or_(
-                Product.name.ilike(search_term),
-                Product.description.ilike(search_term),
-                Product.tags.contains([q]),
-            ),
-        )
-        .options(
-            selectinload(Product.brand),
-            selectinload(Product.images),
-        )
-        .order_by(Product.sold_count.desc())
-    )
-
+    """搜尋商品（全文檢索，依相關度 + 銷量排序）"""
+    query = search_products_query(q, db.get_bind().dialect.name, product_card_query())
     items, meta = await paginate(db, query, page, per_page)
 
-    data = []
-    for item in items:
-        data.append({
-            "id": item.id,
-            "name": item.name,
-            "slug": item.slug,
-            "price": float(item.price),
-            "sale_price": float(item.sale_price) if item.sale_price else None,
-            "brand_name": item.brand.name if item.brand else None,
-            "primary_image": item.primary_image,
-            "avg_rating": item.avg_rating,
-            "review_count": item.review_count,
-            "is_new": item.is_new,
-            "stock": item.stock,
-        })
-
-    return SuccessResponse(data=data, meta=meta)
+    return SuccessResponse(data=[serialize_card(row) for row in items], meta=meta)
 
 
 @router.get("/trending", response_model=SuccessResponse)
+@etag_response("products:trending", tags=["products"], stamp=_trending_window)
+@cached_response("products:trending", tags=["products"], ttl=settings.TRENDING_CACHE_TTL)
 async def trending_products(
     limit: int = Query(default=10, ge=1, le=50),
     db: AsyncSession = Depends(get_db),
 ):
-    """取得熱門商品"""
-    result = await db.execute(
-        select(Product)
-        .where(Product.is_active == True)
-        .options(selectinload(Product.brand), selectinload(Product.images))
-        .order_by(Product.sold_count.desc())
-        .limit(limit)
-    )
-    items = result.scalars().all()
+    """取得熱門商品（近期銷量時間衰減排序）"""
+    ids = await trending_product_ids(db, limit)
+    result = await db.execute(product_card_query().where(Product.id.in_(ids)))
+    rows = {row.id: row for row in result.all()}
 
-    data = []
-    for item in items:
-        data.append({
-            "id": item.id,
-            "name": item.name,
-            "slug": item.slug,
-            "price": float(item.price),
-            "sale_price": float(item.sale_price) if item.sale_price else None,
-            "brand_name": item.brand.name if item.brand else None,
-            "primary_image": item.primary_image,
-            "avg_rating": item.avg_rating,
-            "sold_count": item.sold_count,
-        })
-
-    return SuccessResponse(data=data)
+    return SuccessResponse(data=[serialize_card(rows[i]) for i in ids if i in rows])
 
 
 @router.get("/{product_id}", response_model=SuccessResponse)
+@etag_response(
+    "products:detail",
+    tags=_product_tags,
+    # view_count is not part of the validator; a revalidated view still counts
+    on_not_modified=lambda product_id, **_: record_view(product_id),
+)
 async def get_product(
     product_id: int,
     db: AsyncSession = Depends(get_db),
@@ -201,8 +157,8 @@ async def get_product(
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="商品不存在")
 
-    # Increment view count
-    product.view_count += 1
+    # Buffered (write-behind) — the DB row is updated by the periodic flush
+    pending_views = await record_view(product.id)
 
     data = ProductDetailResponse(
         id=product.id,
@@ -232,7 +188,7 @@ async def get_product(
         is_active=product.is_active,
         avg_rating=product.avg_rating,
         review_count=product.review_count,
-        view_count=product.view_count,
+        view_count=product.view_count + pending_views,
         sold_count=product.sold_count,
         images=[{"id": img.id, "url": img.url, "alt_text": img.alt_text, "sort_order": img.sort_order} for img in product.images],
         variants=[{"id": v.id, "name": v.name, "sku": v.sku, "price_adjustment": float(v.price_adjustment), "stock": v.stock, "is_active": v.is_active} for v in product.variants],
@@ -243,6 +199,7 @@ async def get_product(
 
 
 @router.get("/{product_id}/reviews", response_model=SuccessResponse)
+@etag_response("products:reviews", tags=_product_tags)
 async def list_reviews(
     product_id: int,
     page: int = Query(default=1, ge=1),
@@ -277,6 +234,7 @@ async def list_reviews(
 async def create_review(
     product_id: int,
     data: ReviewCreate,
+    background_tasks: BackgroundTasks,
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
@@ -318,6 +276,7 @@ async def create_review(
     product.avg_rating = float(avg) if avg else 0
     product.review_count = count
 
+    background_tasks.add_task(invalidate_cache_tags, "products", f"product:{product_id}")
     return SuccessResponse(
         data=ReviewResponse.model_validate(review).model_dump(),
         message="評價已送出",
@@ -0,0 +1,24 @@
+"""
+Shipping router — 運送方式 API
+GET /shipping-methods
+"""
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.schemas.common import SuccessResponse
+from app.utils.checkout_config import SHIPPING_METHODS_TAG, get_checkout_config
+from app.utils.etag import etag_response
+
+router = APIRouter(prefix="/shipping-methods", tags=["運送方式"])
+
+
+@router.get("", response_model=SuccessResponse)
+@etag_response("shipping-methods", tags=[SHIPPING_METHODS_TAG])
+async def list_shipping_methods(
+    db: AsyncSession = Depends(get_db),
+):
+    """取得可用的運送方式與免運門檻（結帳設定快照，不查資料庫）"""
+    config = await get_checkout_config(db)
+    return SuccessResponse(data=config.payload)
@@ -11,13 +11,13 @@ POST /users/cards
 DELETE /users/cards/:id
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.dependencies import get_current_user
-from app.models.user import User, UserAddress, UserCard
+from app.models.user import UserAddress, UserCard
 from app.schemas.user import (
     AddressCreate,
     AddressResponse,
@@ -29,7 +29,8 @@ from app.schemas.user import (
     UserResponse,
 )
 from app.schemas.common import SuccessResponse
-from app.utils.security import hash_password, verify_password
+from app.utils.principal import Principal, invalidate_principal, load_user
+from app.utils.security import hash_password_async, verify_password_async
 
 router = APIRouter(prefix="/users", tags=["使用者"])
 
@@ -39,16 +40,19 @@ router = APIRouter(prefix="/users", tags=["使用者"])
 @router.put("/profile", response_model=SuccessResponse)
 async def update_profile(
     data: UserProfileUpdate,
-    current_user: User = Depends(get_current_user),
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """更新個人資料"""
+    user = await load_user(db, current_user)
     update_data = data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
-        setattr(current_user, key, value)
+        setattr(user, key, value)
 
+    background_tasks.add_task(invalidate_principal, user.id)
     return SuccessResponse(
-        data=UserResponse.model_validate(current_user).model_dump(),
+        data=UserResponse.model_validate(user).model_dump(),
         message="個人資料更新成功",
     )
 
@@ -56,17 +60,20 @@ async def update_profile(
 @router.put("/password", response_model=SuccessResponse)
 async def change_password(
     data: ChangePasswordRequest,
-    current_user: User = Depends(get_current_user),
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """修改密碼"""
-    if not verify_password(data.current_password, current_user.password_hash):
+    user = await load_user(db, current_user)
+    if not await verify_password_async(data.current_password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="目前密碼錯誤",
         )
 
-    current_user.password_hash = hash_password(data.new_password)
+    user.password_hash = await hash_password_async(data.new_password)
+    background_tasks.add_task(invalidate_principal, user.id)
 
     return SuccessResponse(message="密碼修改成功")
 
@@ -75,7 +82,7 @@ async def change_password(
 
 @router.get("/addresses", response_model=SuccessResponse)
 async def list_addresses(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """取得地址清單"""
@@ -94,7 +101,7 @@ async def list_addresses(
 @router.post("/addresses", response_model=SuccessResponse, status_code=status.HTTP_201_CREATED)
 async def create_address(
     data: AddressCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """新增地址"""
@@ -126,7 +133,7 @@ async def create_address(
 async def update_address(
     address_id: int,
     data: AddressUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """更新地址"""
@@ -166,7 +173,7 @@ async def update_address(
 @router.delete("/addresses/{address_id}", response_model=SuccessResponse)
 async def delete_address(
     address_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """刪除地址"""
@@ -190,7 +197,7 @@ async def delete_address(
 
 @router.get("/cards", response_model=SuccessResponse)
 async def list_cards(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """取得儲存的信用卡"""
@@ -209,7 +216,7 @@ async def list_cards(
 @router.post("/cards", response_model=SuccessResponse, status_code=status.HTTP_201_CREATED)
 async def add_card(
     data: CardCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """新增信用卡"""
@@ -239,7 +246,7 @@ async def add_card(
 @router.delete("/cards/{card_id}", response_model=SuccessResponse)
 async def delete_card(
     card_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """刪除信用卡"""
@@ -5,10 +5,11 @@ POST   /wishlist/:product_id
 DELETE /wishlist/:product_id
 """
 
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from app.database import get_db
 from app.dependencies import get_current_user
@@ -16,6 +17,7 @@ from app.models.product import Product
 from app.models.wishlist import Wishlist
 from app.schemas.common import SuccessResponse
 from app.utils.pagination import paginate
+from app.utils.product_cards import card_columns, with_card_joins
 
 router = APIRouter(prefix="/wishlist", tags=["收藏"])
 
@@ -24,40 +26,36 @@ router = APIRouter(prefix="/wishlist", tags=["收藏"])
 async def get_wishlist(
     page: int = Query(default=1, ge=1),
     per_page: int = Query(default=20, ge=1, le=50),
+    cursor: Optional[str] = None,
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """取得收藏清單"""
-    query = (
-        select(Wishlist)
+    query = with_card_joins(
+        select(Wishlist.id, Wishlist.created_at, *card_columns(id_label="product_id"))
+        .select_from(Wishlist)
+        .join(Product, Product.id == Wishlist.product_id)
         .where(Wishlist.user_id == current_user.id)
-        .options(
-            selectinload(Wishlist.product).selectinload(Product.images),
-            selectinload(Wishlist.product).selectinload(Product.brand),
-        )
-        .order_by(Wishlist.created_at.desc())
     )
 
-    items, meta = await paginate(db, query, page, per_page)
-
-    data = []
-    for w in items:
-        product = w.product
-        if not product:
-            continue
-        data.append({
-            "id": w.id,
-            "product_id": product.id,
-            "name": product.name,
-            "slug": product.slug,
-            "price": float(product.price),
-            "sale_price": float(product.sale_price) if product.sale_price else None,
-            "brand_name": product.brand.name if product.brand else None,
-            "primary_image": product.primary_image,
-            "is_active": product.is_active,
-            "stock": product.stock,
-            "added_at": w.created_at.isoformat(),
-        })
+    items, meta = await paginate(db, query, page, per_page, cursor=cursor, sort_column=Wishlist.created_at)
+
+    data = [
+        {
+            "id": row.id,
+            "product_id": row.product_id,
+            "name": row.name,
+            "slug": row.slug,
+            "price": float(row.price),
+            "sale_price": float(row.sale_price) if row.sale_price else None,
+            "brand_name": row.brand_name,
+            "primary_image": row.primary_image,
+            "is_active": row.is_active,
+            "stock": row.stock,
+            "added_at": row.created_at.isoformat(),
+        }
+        for row in items
+    ]
 
     return SuccessResponse(data=data, meta=meta)
 
@@ -12,8 +12,11 @@ T = TypeVar("T")
 class PaginationMeta(BaseModel):
     page: int = 1
     per_page: int = 20
-    total: int = 0
-    total_pages: int = 0
+    total: Optional[int] = 0  # None in cursor mode (not counted)
+    total_pages: Optional[int] = 0
+    total_exact: bool = True  # False when total comes from a planner estimate
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 
 class SuccessResponse(BaseModel):
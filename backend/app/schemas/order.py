@@ -20,6 +20,17 @@ class CartItemUpdate(BaseModel):
     quantity: int = Field(ge=1, le=99)
 
 
+class CartBatchOperation(BaseModel):
+    op: str = Field(default="add", pattern="^(add|set|remove)$")  # add: += quantity, set: = quantity
+    product_id: int
+    variant_id: Optional[int] = None
+    quantity: int = Field(default=1, ge=0, le=99)
+
+
+class CartBatchRequest(BaseModel):
+    operations: List[CartBatchOperation] = Field(min_length=1, max_length=100)
+
+
 class CartItemResponse(BaseModel):
     id: int
     product_id: int
@@ -82,6 +93,7 @@ class OrderCreate(BaseModel):
     points_used: int = Field(default=0, ge=0)
     credits_used: int = Field(default=0, ge=0)
     customer_notes: Optional[str] = None
+    quote_id: Optional[str] = None  # quote shown to the customer; 409 if the price has changed since
 
 
 class OrderListResponse(BaseModel):
@@ -21,6 +21,7 @@ from app.models.product import Product, ProductImage
 from app.models.shipping import ShippingMethod
 from app.models.user import User
 from app.utils.helpers import generate_slug
+from app.utils.search import reindex_products
 from app.utils.security import hash_password
 
 
@@ -491,6 +492,7 @@ async def main():
             await seed_categories(db)
             await seed_brands(db)
             await seed_products(db)
+            await reindex_products(db)
             await seed_shipping_methods(db)
             await seed_content(db)
             await db.commit()
@@ -0,0 +1,31 @@
+"""
+Background tasks — transactional outbox + Celery workers
+
+Requests write events with ``add_event`` and schedule ``publish_events``
+after the commit; handlers live next to their domain (``orders``,
+``payments``) and are registered on import.
+"""
+
+from app.tasks.outbox import (
+    add_event,
+    configure_outbox,
+    get_task_queue,
+    publish_events,
+    relay_outbox,
+    run_handler,
+    start_outbox_relay,
+    stop_outbox_relay,
+)
+from app.tasks import orders  # noqa: F401  (registers order event handlers)
+from app.tasks import payments  # noqa: F401  (registers payment callback handlers)
+
+__all__ = [
+    "add_event",
+    "configure_outbox",
+    "get_task_queue",
+    "publish_events",
+    "relay_outbox",
+    "run_handler",
+    "start_outbox_relay",
+    "stop_outbox_relay",
+]
@@ -0,0 +1,70 @@
+"""
+Celery application — worker entry point for outbox handlers
+
+    celery -A app.tasks.celery_app worker -Q orders,email,analytics
+
+Queues:
+  - orders    : points, payment callbacks and other balance / state changes (fast, must not queue behind SMTP)
+  - email     : outgoing mail
+  - analytics : trending / reporting counters
+
+Every handler runs as ``process_event(handler, event_id)`` on its own queue
+and is retried with exponential backoff up to TASK_MAX_RETRIES; messages are
+acked only after the task finishes, so a killed worker's task is redelivered.
+Handlers are async: each worker process keeps one event loop so the async
+engine's pooled connections stay on the loop that opened them.
+"""
+
+import asyncio
+
+from celery import Celery
+from celery.signals import worker_process_init
+from kombu import Queue
+
+from app.config import get_settings
+from app.database import async_session, engine
+from app.tasks.outbox import run_handler
+
+settings = get_settings()
+
+QUEUES = ("orders", "email", "analytics")
+
+celery_app = Celery("popularfoodshop", broker=settings.CELERY_BROKER_URL or settings.REDIS_URL)
+celery_app.conf.update(
+    task_queues=[Queue(name) for name in QUEUES],
+    task_default_queue="orders",
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    task_ignore_result=True,
+    task_serializer="json",
+    accept_content=["json"],
+    timezone="Asia/Taipei",
+    broker_connection_retry_on_startup=True,
+)
+
+_loop = None
+
+
+def run_async(coro):
+    """在 worker 的常駐 event loop 上執行 coroutine"""
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
+
+@worker_process_init.connect
+def _reset_engine(**kwargs):
+    # Forked children must not reuse the parent's pooled connections
+    engine.sync_engine.dispose(close=False)
+
+
+@celery_app.task(name="outbox.process_event", bind=True, max_retries=settings.TASK_MAX_RETRIES)
+def process_event(self, handler: str, event_id: int):
+    """執行 outbox handler；失敗時以指數退避重試"""
+    try:
+        run_async(run_handler(handler, event_id, async_session))
+    except Exception as exc:
+        countdown = min(2 ** self.request.retries * 5, settings.TASK_RETRY_BACKOFF_MAX)
+        raise self.retry(exc=exc, countdown=countdown)
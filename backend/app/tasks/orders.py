@@ -0,0 +1,132 @@
+"""
+Order event handlers — follow-up work for ``order_created`` / ``order_paid``
+
+Each runs as its own task (see app.tasks.outbox), so a slow or failing SMTP
+server only delays / retries the email, never the points or analytics.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.config import get_settings
+from app.models.order import Order
+from app.models.outbox import OutboxEvent
+from app.models.points import PointsTransaction
+from app.models.user import User
+from app.tasks.outbox import on_event
+from app.utils.email import send_email
+from app.utils.principal import invalidate_principal
+from app.utils.trending import record_sales
+
+settings = get_settings()
+
+ORDER_CREATED = "order_created"
+ORDER_PAID = "order_paid"  # payment callback confirmed it, or an admin marked it paid
+
+
+def order_created_payload(order: Order, lines) -> dict:
+    """order_created 事件內容（analytics 不必再讀訂單）"""
+    return {
+        "order_number": order.order_number,
+        "user_id": order.user_id,
+        "lines": [[product_id, qty] for product_id, qty in lines],
+        "created_at": order.created_at.isoformat(),
+    }
+
+
+def order_paid_payload(order: Order) -> dict:
+    """order_paid 事件內容"""
+    return {"order_number": order.order_number, "user_id": order.user_id}
+
+
+def earned_points(order: Order) -> int:
+    """訂單可累積的回饋點數（實付金額 × POINTS_RATE，無條件捨去）"""
+    return int(float(order.total) * settings.POINTS_RATE)
+
+
+@on_event(ORDER_CREATED, queue="email")
+async def send_order_confirmation(db: AsyncSession, event: OutboxEvent):
+    """寄送訂單確認信"""
+    result = await db.execute(
+        select(Order)
+        .where(Order.id == event.aggregate_id)
+        .options(selectinload(Order.items), selectinload(Order.user))
+    )
+    order = result.scalar_one_or_none()
+    if order is None or order.user is None:
+        return None
+
+    lines = "\n".join(
+        f"- {item.product_name} × {item.quantity}　NT${float(item.subtotal):,.0f}" for item in order.items
+    )
+    await send_email(
+        order.user.email,
+        f"[{settings.APP_NAME}] 訂單確認 {order.order_number}",
+        f"{order.user.first_name or ''} 您好，\n\n"
+        f"我們已收到您的訂單 {order.order_number}：\n\n{lines}\n\n"
+        f"訂單金額：NT${float(order.total):,.0f}\n",
+    )
+    return None
+
+
+@on_event(ORDER_PAID, queue="orders")
+async def earn_order_points(db: AsyncSession, event: OutboxEvent):
+    """
+    付款後依實付金額累積回饋點數（訂單已取消則略過；取消時由 cancel_orders 扣回）
+
+    Earned on payment, not on checkout, so unpaid orders cannot hand out
+    points that are spent before the hold expires.
+    """
+    # Locked like every cancellation path, so earning and clawback cannot interleave
+    order = await db.scalar(select(Order).where(Order.id == event.aggregate_id).with_for_update())
+    if order is None or order.status == "cancelled":
+        return None
+    already = await db.scalar(select(PointsTransaction.id).where(
+        PointsTransaction.reference_type == "order",
+        PointsTransaction.reference_id == order.id,
+        PointsTransaction.type == "earn",
+    ).limit(1))
+    if already is not None:
+        return None
+    points = earned_points(order)
+    if points <= 0:
+        return None
+
+    result = await db.execute(
+        update(User)
+        .where(User.id == order.user_id)
+        .values(points=User.points + points)
+        .returning(User.points)
+        .execution_options(synchronize_session=False)
+    )
+    db.add(PointsTransaction(
+        user_id=order.user_id,
+        type="earn",
+        amount=points,
+        balance_after=result.scalar_one(),
+        reference_type="order",
+        reference_id=order.id,
+        description=f"訂單回饋 ({order.order_number})",
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.POINTS_EXPIRY_DAYS),
+    ))
+
+    async def after_commit():
+        await invalidate_principal(order.user_id)
+
+    return after_commit
+
+
+@on_event(ORDER_CREATED, queue="analytics")
+async def record_order_sales(db: AsyncSession, event: OutboxEvent):
+    """更新熱銷排行分數"""
+    lines = [(product_id, qty) for product_id, qty in event.payload["lines"]]
+    sold_at = datetime.fromisoformat(event.payload["created_at"])
+
+    async def after_commit():
+        # Not transactional: at most once, a cold store is rebuilt from orders anyway
+        await record_sales(lines, sold_at)
+
+    return after_commit
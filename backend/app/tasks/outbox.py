@@ -0,0 +1,234 @@
+"""
+Transactional outbox — domain events handed to background workers
+
+A request that needs slow follow-up work (email, points, analytics) only
+writes an ``outbox_events`` row with ``add_event``, in the same transaction
+as the change itself: the event exists if and only if the change committed.
+
+Publishing: after the commit the request schedules ``publish_events``; the
+relay loop (``start_outbox_relay``) picks up anything that was missed (crash
+between commit and publish, broker down). Both claim unpublished rows with
+FOR UPDATE SKIP LOCKED, send one task per registered handler, then set
+``published_at``. Tasks are sent before that commit, so a crash in between
+re-sends them — delivery is at-least-once.
+
+Handlers (``on_event``) run through ``run_handler``: the handler's database
+work and an ``outbox_receipts`` row for (event, handler) commit together, so
+a redelivered or retried task finds the receipt and does nothing. A handler
+may return a coroutine function for non-transactional work (caches, trending)
+that runs once after that commit.
+
+Queues (TASK_BACKEND):
+  - CeleryTaskQueue : apply_async to the handler's named queue (app.tasks.celery_app)
+  - MemoryTaskQueue : runs handlers in-process once the publish commits (tests / dev)
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import async_session
+from app.models.outbox import OutboxEvent, OutboxReceipt
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+AfterCommit = Optional[Callable[[], Awaitable[None]]]
+Job = Tuple[str, str, int]  # (queue, handler name, event id)
+
+
+@dataclass(frozen=True)
+class EventHandler:
+    name: str
+    event_type: str
+    queue: str
+    func: Callable[[AsyncSession, OutboxEvent], Awaitable[AfterCommit]]
+
+
+_handlers: Dict[str, EventHandler] = {}
+
+
+def on_event(event_type: str, queue: str, name: Optional[str] = None):
+    """註冊事件處理函式（每個 handler 各自一個 task，可獨立重試）"""
+    def decorator(func):
+        handler = EventHandler(name or func.__name__, event_type, queue, func)
+        if handler.name in _handlers:
+            raise ValueError(f"duplicate outbox handler: {handler.name}")
+        _handlers[handler.name] = handler
+        return func
+    return decorator
+
+
+def handlers_for(event_type: str) -> List[EventHandler]:
+    return [h for h in _handlers.values() if h.event_type == event_type]
+
+
+# ── Writing ─────────────────────────────────────────────────
+async def add_event(db: AsyncSession, event_type: str, aggregate_id: int, payload: dict) -> OutboxEvent:
+    """在目前交易中寫入事件（交易提交後才會被發佈）"""
+    event = OutboxEvent(event_type=event_type, aggregate_id=aggregate_id, payload=payload)
+    db.add(event)
+    await db.flush()
+    return event
+
+
+# ── Queues ──────────────────────────────────────────────────
+class MemoryTaskQueue:
+    """Runs handlers in this process, after the publishing transaction commits"""
+
+    def __init__(self):
+        self._pending: List[Job] = []
+
+    def send(self, jobs: Sequence[Job]):
+        self._pending.extend(jobs)
+
+    async def join(self):
+        while self._pending:
+            _, name, event_id = self._pending.pop(0)
+            try:
+                await run_handler(name, event_id, _session_factory)
+            except Exception as exc:
+                # No broker to retry with; the event stays without a receipt
+                logger.error("outbox_handler_failed", handler=name, event_id=event_id, error=str(exc))
+
+
+class CeleryTaskQueue:
+    """One Celery task per (handler, event), routed to the handler's queue"""
+
+    def send(self, jobs: Sequence[Job]):
+        from app.tasks.celery_app import process_event
+
+        for queue, name, event_id in jobs:
+            process_event.apply_async(args=[name, event_id], queue=queue)
+
+    async def join(self):
+        pass
+
+
+_queue = None
+_session_factory = async_session
+
+
+def configure_outbox(session_factory):
+    """替換發佈 / in-process handler 使用的 session factory（測試用）"""
+    global _session_factory
+    _session_factory = session_factory
+
+
+def get_task_queue():
+    """取得目前設定的 task queue（singleton）"""
+    global _queue
+    if _queue is None:
+        if settings.TASK_BACKEND == "memory":
+            _queue = MemoryTaskQueue()
+        else:
+            _queue = CeleryTaskQueue()
+    return _queue
+
+
+# ── Publishing ──────────────────────────────────────────────
+async def _publish(db: AsyncSession, query) -> int:
+    result = await db.execute(
+        query.where(OutboxEvent.published_at.is_(None))
+        .order_by(OutboxEvent.id)
+        .with_for_update(skip_locked=True)
+    )
+    events = result.scalars().all()
+    if not events:
+        return 0
+
+    queue = get_task_queue()
+    # Sent before the commit: a crash in between re-sends, receipts absorb the duplicates
+    queue.send([(h.queue, h.name, event.id) for event in events for h in handlers_for(event.event_type)])
+    now = datetime.now(timezone.utc)
+    for event in events:
+        event.published_at = now
+    await db.commit()
+    await queue.join()
+    return len(events)
+
+
+async def publish_events(*event_ids: int):
+    """交易提交後發佈指定事件（BackgroundTasks 呼叫；失敗時由 relay 補發）"""
+    try:
+        async with _session_factory() as db:
+            await _publish(db, select(OutboxEvent).where(OutboxEvent.id.in_(event_ids)))
+    except Exception as exc:
+        logger.warning("outbox_publish_failed", events=list(event_ids), error=str(exc))
+
+
+async def relay_outbox(db: AsyncSession) -> int:
+    """發佈尚未發佈的事件（一批），回傳發佈數"""
+    return await _publish(db, select(OutboxEvent).limit(settings.OUTBOX_RELAY_BATCH))
+
+
+# ── Handling ────────────────────────────────────────────────
+async def run_handler(name: str, event_id: int, session_factory) -> bool:
+    """
+    執行單一 handler，回傳是否實際執行（已有收據則略過）
+
+    Raises whatever the handler raises — the caller (Celery task) retries.
+    """
+    handler = _handlers[name]
+    async with session_factory() as db:
+        if await db.get(OutboxReceipt, (event_id, name)) is not None:
+            return False
+        event = await db.get(OutboxEvent, event_id)
+        if event is None:
+            logger.warning("outbox_event_missing", handler=name, event_id=event_id)
+            return False
+
+        after_commit = await handler.func(db, event)
+        db.add(OutboxReceipt(event_id=event_id, handler=name))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # A concurrent delivery of the same task committed first
+            await db.rollback()
+            return False
+
+    if after_commit is not None:
+        await after_commit()
+    return True
+
+
+# ── Background relay ────────────────────────────────────────
+_relay: Optional[asyncio.Task] = None
+
+
+async def _relay_loop(session_factory):
+    while True:
+        try:
+            while True:
+                async with session_factory() as db:
+                    if await relay_outbox(db) < settings.OUTBOX_RELAY_BATCH:
+                        break
+        except Exception as exc:
+            logger.error("outbox_relay_failed", error=str(exc))
+        await asyncio.sleep(settings.OUTBOX_RELAY_INTERVAL)
+
+
+def start_outbox_relay(session_factory):
+    """啟動 outbox 補發任務（app lifespan 呼叫）"""
+    global _relay
+    if _relay is None:
+        _relay = asyncio.create_task(_relay_loop(session_factory))
+
+
+async def stop_outbox_relay():
+    """停止 outbox 補發任務"""
+    global _relay
+    if _relay is not None:
+        _relay.cancel()
+        try:
+            await _relay
+        except asyncio.CancelledError:
+            pass
+        _relay = None
@@ -0,0 +1,39 @@
+"""
+Replay the payment callback inbox
+
+    python -m app.tasks.payment_replay                     # every unprocessed callback
+    python -m app.tasks.payment_replay --order PF20261018-0001 --all
+    python -m app.tasks.payment_replay --id 41 --id 42 --all
+
+``--all`` also re-applies callbacks that were already processed (state
+transitions are idempotent). Events go through the outbox like the callback
+endpoint's, so they run on the configured task queue.
+"""
+
+import argparse
+import asyncio
+
+from app.database import async_session
+from app.tasks import publish_events
+from app.tasks.payments import replay_payment_callbacks
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-queue payment callbacks from the inbox")
+    parser.add_argument("--id", dest="ids", type=int, action="append", default=[], help="payment_callbacks.id")
+    parser.add_argument("--order", help="order number (MerchantTradeNo)")
+    parser.add_argument("--all", action="store_true", help="include callbacks that were already processed")
+    args = parser.parse_args(argv)
+
+    async with async_session() as db:
+        event_ids = await replay_payment_callbacks(
+            db, callback_ids=args.ids, order_number=args.order, include_processed=args.all
+        )
+        await db.commit()
+    if event_ids:
+        await publish_events(*event_ids)
+    print(f"Queued {len(event_ids)} order(s) for payment callback replay")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
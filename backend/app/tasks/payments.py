@@ -0,0 +1,214 @@
+"""
+Payment callback handlers — applying the payment_callbacks inbox
+
+``POST /payments/callback`` only verifies and stores the notification and
+writes a ``payment_callback_received`` event; the order / payment state
+changes happen here, off the gateway's request:
+
+  - the order row is locked and *every* unprocessed callback for it is
+    applied in arrival order (inbox id), so two notifications for one order
+    never race and a later one is never applied first
+  - transitions are idempotent: every paid order has a completed Payment
+    carrying the gateway's TradeNo, so a success repeating it is a no-op and
+    a different one is flagged for refund; a failure never undoes a payment;
+    "code issued" notices (ATM / CVS) only record the payment info
+  - each callback records ``processed_at`` / ``outcome`` in the same
+    transaction; the order's new state is published to its SSE streams
+    (app.utils.order_events) after the commit, and a payment writes an
+    ``order_paid`` event (points, app.tasks.orders)
+
+``replay_payment_callbacks`` re-queues inbox rows (python -m app.tasks.payment_replay).
+"""
+
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
+
+import structlog
+from sqlalchemy import case, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order, OrderStatusLog
+from app.models.outbox import OutboxEvent
+from app.models.payment import Payment, PaymentCallback
+from app.tasks.orders import ORDER_PAID, order_paid_payload
+from app.tasks.outbox import add_event, on_event, publish_events
+from app.utils.inventory import release_hold
+from app.utils.order_events import order_state, publish_order_events
+
+logger = structlog.get_logger()
+
+PAYMENT_CALLBACK_RECEIVED = "payment_callback_received"
+
+# Informational notices, not results: 2 = ATM account issued, 10100073 = CVS / barcode code issued
+ISSUED_RTN_CODES = frozenset({"2", "10100073"})
+
+
+async def _payment_for(db: AsyncSession, order_id: int, trade_no: str) -> Optional[Payment]:
+    """付款紀錄：同交易編號優先，否則最新一筆（一張訂單可能有多筆）"""
+    result = await db.execute(
+        select(Payment)
+        .where(Payment.order_id == order_id)
+        .order_by(case((Payment.transaction_id == trade_no, 0), else_=1), Payment.created_at.desc(), Payment.id.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+
+async def _apply(db: AsyncSession, order: Order, callback: PaymentCallback, now: datetime) -> str:
+    """套用一筆通知，回傳 outcome"""
+    trade_no = callback.trade_no
+    payment = await _payment_for(db, order.id, trade_no)
+
+    if callback.rtn_code in ISSUED_RTN_CODES:
+        if order.payment_status == "paid":
+            return "ignored"
+        # Payment info (ATM account / CVS code) for the customer; still unpaid
+        if payment is None:
+            payment = Payment(order_id=order.id, payment_method=order.payment_method or "unknown", amount=order.total)
+            db.add(payment)
+        if payment.status != "completed":
+            payment.transaction_id = trade_no
+            payment.gateway_response = callback.payload
+        return "issued"
+
+    if callback.rtn_code != "1":
+        if order.payment_status == "paid":
+            return "ignored"  # a late failure never undoes a payment
+        if payment and payment.status != "completed":
+            payment.status = "failed"
+            payment.gateway_response = callback.payload
+        order.payment_status = "failed"
+        return "failed"
+
+    if order.payment_status == "paid":
+        if payment and payment.transaction_id == trade_no:
+            return "duplicate"
+        # A second, different transaction for the same order
+        logger.warning("duplicate_payment", order_id=order.id, trade_no=trade_no)
+        db.add(OrderStatusLog(
+            order_id=order.id,
+            from_status=order.status,
+            to_status=order.status,
+            note=f"訂單已付款，再次收到付款，需人工退款 (交易編號: {trade_no})",
+        ))
+        return "refund_required"
+
+    if payment is None:
+        # Paid without POST /payments/create: record it, duplicates are matched on transaction_id
+        payment = Payment(order_id=order.id, payment_method=order.payment_method or "unknown", amount=order.total)
+        db.add(payment)
+    payment.status = "completed"
+    payment.transaction_id = trade_no
+    payment.gateway_response = callback.payload
+    payment.paid_at = now
+
+    order.payment_status = "paid"
+    await release_hold(db, order.id)
+    if order.status == "cancelled":
+        # Paid after the hold expired — stock is gone, needs a manual refund
+        logger.warning("payment_after_cancellation", order_id=order.id, trade_no=trade_no)
+        db.add(OrderStatusLog(
+            order_id=order.id,
+            from_status=order.status,
+            to_status=order.status,
+            note=f"訂單取消後收到付款，需人工退款 (交易編號: {trade_no})",
+        ))
+        return "refund_required"
+
+    old_status = order.status
+    order.status = "paid"
+    db.add(OrderStatusLog(
+        order_id=order.id,
+        from_status=old_status,
+        to_status="paid",
+        note=f"付款成功 (交易編號: {trade_no})",
+    ))
+    return "paid"
+
+
+async def process_payment_callbacks(
+    db: AsyncSession, merchant_trade_no: str
+) -> Tuple[Optional[Order], List[int]]:
+    """
+    依序套用該訂單所有未處理的付款通知（不 commit）
+
+    Returns the order when any callback was applied, and the ``order_paid``
+    events written (publish them after the commit).
+    """
+    # Same lock as the hold sweeper and cancellations
+    order = await db.scalar(
+        select(Order).where(Order.order_number == merchant_trade_no).with_for_update()
+    )
+    result = await db.execute(
+        select(PaymentCallback)
+        .where(PaymentCallback.merchant_trade_no == merchant_trade_no, PaymentCallback.processed_at.is_(None))
+        .order_by(PaymentCallback.id)
+        .with_for_update()
+    )
+    callbacks = result.scalars().all()
+
+    now = datetime.now(timezone.utc)
+    events = []
+    for callback in callbacks:
+        if order is None:
+            logger.warning("payment_callback_order_not_found", callback_id=callback.id, order_number=merchant_trade_no)
+            callback.outcome = "order_not_found"
+        else:
+            callback.outcome = await _apply(db, order, callback, now)
+            if callback.outcome == "paid":
+                events.append(await add_event(db, ORDER_PAID, order.id, order_paid_payload(order)))
+        callback.processed_at = now
+    return (order if callbacks else None), [event.id for event in events]
+
+
+@on_event(PAYMENT_CALLBACK_RECEIVED, queue="orders")
+async def apply_payment_callbacks(db: AsyncSession, event: OutboxEvent):
+    """套用付款通知（aggregate_id = payment_callbacks.id）"""
+    order, event_ids = await process_payment_callbacks(db, event.payload["merchant_trade_no"])
+    if order is None:
+        return None
+    state = order_state(order)
+
+    async def after_commit():
+        await publish_order_events(state)
+        if event_ids:
+            await publish_events(*event_ids)
+
+    return after_commit
+
+
+async def replay_payment_callbacks(
+    db: AsyncSession,
+    *,
+    callback_ids: Sequence[int] = (),
+    order_number: Optional[str] = None,
+    include_processed: bool = False,
+) -> List[int]:
+    """
+    重新排入付款通知，回傳寫入的事件 id（呼叫端 commit 後 publish_events）
+
+    Picks the unprocessed callbacks (all of them, or the given ids / order);
+    ``include_processed`` also clears processed_at on already applied ones so
+    they are applied again — safe, since every transition is idempotent.
+    One event per order: its handler applies all of that order's callbacks.
+    """
+    query = select(PaymentCallback).order_by(PaymentCallback.id)
+    if callback_ids:
+        query = query.where(PaymentCallback.id.in_(callback_ids))
+    if order_number:
+        query = query.where(PaymentCallback.merchant_trade_no == order_number)
+    if not include_processed:
+        query = query.where(PaymentCallback.processed_at.is_(None))
+    callbacks = (await db.execute(query)).scalars().all()
+
+    first_by_order = {}
+    for callback in callbacks:
+        callback.processed_at = None
+        callback.outcome = None
+        first_by_order.setdefault(callback.merchant_trade_no, callback.id)
+
+    event_ids = []
+    for merchant_trade_no, callback_id in first_by_order.items():
+        event = await add_event(db, PAYMENT_CALLBACK_RECEIVED, callback_id, {"merchant_trade_no": merchant_trade_no})
+        event_ids.append(event.id)
+    return event_ids
@@ -5,6 +5,7 @@ Uses different secret key and shorter expiry for enhanced security
 
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+from uuid import uuid4
 
 from jose import JWTError, jwt
 
@@ -29,7 +30,8 @@ def create_admin_access_token(
         "sub": str(user_id),
         "role": role,
         "type": "admin_access",
-        "iat": now,
+        "iat": now.timestamp(),  # sub-second: compared with revocation cutoffs
+        "jti": uuid4().hex,
         "exp": expire,
     }
 
@@ -50,7 +52,8 @@ def create_admin_refresh_token(
     payload = {
         "sub": str(user_id),
         "type": "admin_refresh",
-        "iat": now,
+        "iat": now.timestamp(),
+        "jti": uuid4().hex,
         "exp": expire,
     }
 
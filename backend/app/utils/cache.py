@@ -0,0 +1,268 @@
+"""
+Response cache — read-through cache for public catalog endpoints
+
+Entries are keyed on route namespace + normalized query params and carry
+tags (e.g. ``product:12``, ``brand:3``, ``content:banners``) so admin writes
+can purge exactly the entries they affect.
+
+Every tag also has a version number that is bumped on invalidation; ETags
+(app.utils.etag) are derived from these versions. Versions start from a
+millisecond timestamp so a restarted / flushed backend never reissues an
+old value. ``get_versions`` returns None while they cannot be read (Redis
+down); callers then skip whatever they key on them (ETags, quote memo,
+snapshots) instead of failing the request.
+
+Backends:
+  - RedisCacheBackend  : shared across workers (CACHE_BACKEND=redis); needs
+                         Redis >= 7.0 (EXPIRE NX / GT on the tag sets)
+  - MemoryCacheBackend : in-process fallback for single worker / tests
+"""
+
+import functools
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import structlog
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.utils.redis_client import get_redis, redis_key
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+TagsArg = Union[Iterable[str], Callable[..., Iterable[str]]]
+
+
+class MemoryCacheBackend:
+    """In-process cache with TTL and tag index"""
+
+    def __init__(self):
+        self._store: Dict[str, Tuple[float, Any]] = {}
+        self._tags: Dict[str, Set[str]] = {}
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._store.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._store.pop(key, None)
+            return None
+        return value
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: Any, ttl: int, tags: Iterable[str] = ()):
+        self._store[key] = (time.monotonic() + ttl, value)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        removed = 0
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                if self._store.pop(key, None) is not None:
+                    removed += 1
+        return removed
+
+    async def get_versions(self, *tags: str) -> Optional[List[int]]:
+        return [self._versions.setdefault(tag, _version_seed()) for tag in tags]
+
+    async def bump_versions(self, *tags: str):
+        for tag in tags:
+            self._versions[tag] = self._versions.get(tag, _version_seed()) + 1
+
+    async def clear(self):
+        self._store.clear()
+        self._tags.clear()
+        self._versions.clear()
+
+
+# KEYS = tag sets; deletes every key in them, then the sets — atomic, so an
+# entry registered while a tag is being purged is either purged too or
+# registered in a fresh set, never left behind untracked. Returns the count.
+_INVALIDATE_LUA = """
+local removed = 0
+for _, tag_key in ipairs(KEYS) do
+  local keys = redis.call('SMEMBERS', tag_key)
+  for i = 1, #keys, 1000 do
+    removed = removed + redis.call('DEL', unpack(keys, i, math.min(i + 999, #keys)))
+  end
+  redis.call('DEL', tag_key)
+end
+return removed
+"""
+
+
+class RedisCacheBackend:
+    """Redis cache — values are JSON strings, tags are Redis sets of keys"""
+
+    def __init__(self, namespace: str = "cache"):
+        self.namespace = namespace
+        self._invalidate = None
+
+    def _key(self, key: str) -> str:
+        return redis_key(self.namespace, key)
+
+    def _tag_key(self, tag: str) -> str:
+        return redis_key(self.namespace, "tag", tag)
+
+    def _version_key(self, tag: str) -> str:
+        return redis_key(self.namespace, "ver", tag)
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = await get_redis().get(self._key(key))
+        except RedisError as exc:
+            logger.warning("cache_get_failed", key=key, error=str(exc))
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        try:
+            raws = await get_redis().mget([self._key(key) for key in keys])
+        except RedisError as exc:
+            logger.warning("cache_get_failed", keys=len(keys), error=str(exc))
+            return [None] * len(keys)
+        return [json.loads(raw) if raw is not None else None for raw in raws]
+
+    async def set(self, key: str, value: Any, ttl: int, tags: Iterable[str] = ()):
+        full_key = self._key(key)
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                pipe.set(full_key, json.dumps(value, ensure_ascii=False), ex=ttl)
+                for tag in tags:
+                    tag_key = self._tag_key(tag)
+                    pipe.sadd(tag_key, full_key)
+                    # Only ever extend the tag set: it must outlive every entry
+                    # registered under it, or those entries become unpurgeable.
+                    # NX covers the freshly created set, GT the existing one
+                    # (both need Redis >= 7.0).
+                    pipe.expire(tag_key, ttl, nx=True)
+                    pipe.expire(tag_key, ttl, gt=True)
+                await pipe.execute()
+        except RedisError as exc:
+            logger.warning("cache_set_failed", key=key, error=str(exc))
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        if not tags:
+            return 0
+        if self._invalidate is None:
+            self._invalidate = get_redis().register_script(_INVALIDATE_LUA)
+        try:
+            return await self._invalidate(keys=[self._tag_key(tag) for tag in tags])
+        except RedisError as exc:
+            logger.warning("cache_invalidate_failed", tags=tags, error=str(exc))
+            return 0
+
+    async def get_versions(self, *tags: str) -> Optional[List[int]]:
+        client = get_redis()
+        keys = [self._version_key(tag) for tag in tags]
+        try:
+            versions = await client.mget(keys)
+            missing = [key for key, value in zip(keys, versions) if value is None]
+            if missing:
+                async with client.pipeline(transaction=False) as pipe:
+                    for key in missing:
+                        pipe.set(key, _version_seed(), nx=True)
+                    await pipe.execute()
+                versions = await client.mget(keys)
+        except RedisError as exc:
+            logger.warning("cache_versions_failed", tags=tags, error=str(exc))
+            return None
+        return [int(v) for v in versions]
+
+    async def bump_versions(self, *tags: str):
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                for tag in tags:
+                    pipe.set(self._version_key(tag), _version_seed(), nx=True)
+                    pipe.incr(self._version_key(tag))
+                await pipe.execute()
+        except RedisError as exc:
+            logger.warning("cache_version_bump_failed", tags=tags, error=str(exc))
+
+    async def clear(self):
+        client = get_redis()
+        async for key in client.scan_iter(match=self._key("*")):
+            await client.delete(key)
+
+
+def _version_seed() -> int:
+    return int(time.time() * 1000)
+
+
+_cache = None
+
+
+def get_cache():
+    """取得目前設定的 cache backend（singleton）"""
+    global _cache
+    if _cache is None:
+        if settings.CACHE_BACKEND == "memory":
+            _cache = MemoryCacheBackend()
+        else:
+            _cache = RedisCacheBackend()
+    return _cache
+
+
+def make_cache_key(namespace: str, **params) -> str:
+    """Normalize params into a stable key: sorted, None dropped"""
+    parts = [f"{k}={params[k]}" for k in sorted(params) if params[k] is not None]
+    return f"{namespace}?{'&'.join(parts)}"
+
+
+def key_params(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Scalar endpoint params (query / path); drops injected objects like the DB session"""
+    return {
+        k: v for k, v in kwargs.items()
+        if v is None or isinstance(v, (str, int, float, bool))
+    }
+
+
+def cached_response(namespace: str, tags: TagsArg = (), ttl: Optional[int] = None):
+    """
+    Read-through cache decorator for GET endpoints.
+
+    Must be placed *under* the ``@router.get`` decorator. Scalar endpoint
+    params (query / path) form the key; injected objects such as the DB
+    session are ignored. ``tags`` may be a static list or a callable
+    ``tags(payload, **params)`` returning tags for the rendered payload.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            params = key_params(kwargs)
+            key = make_cache_key(namespace, **params)
+            cache = get_cache()
+
+            hit = await cache.get(key)
+            if hit is not None:
+                return JSONResponse(content=hit)
+
+            response = await func(*args, **kwargs)
+            payload = jsonable_encoder(response)
+            entry_tags = tags(payload, **params) if callable(tags) else tags
+            await cache.set(key, payload, ttl or settings.CACHE_DEFAULT_TTL, entry_tags)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+async def invalidate_cache_tags(*tags: str):
+    """Purge every cached entry carrying any of the given tags and bump their versions"""
+    cache = get_cache()
+    removed = await cache.invalidate_tags(*tags)
+    await cache.bump_versions(*tags)
+    logger.info("cache_invalidated", tags=tags, removed=removed)
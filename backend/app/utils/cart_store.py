@@ -0,0 +1,655 @@
+"""
+Cart store — where each user's cart lines live (CART_BACKEND)
+
+Backends:
+  - RedisCartStore    : one hash per cart ("product:variant" → qty), a hash of
+                        line ids and a per-cart version counter, changed by
+                        Lua scripts so check-and-write is atomic
+  - MemoryCartStore   : the same model in-process (single worker / tests)
+  - DatabaseCartStore : cart_items rows, read and written in the request
+
+Redis / memory carts are written back to cart_items asynchronously: every
+change marks the user dirty, and the write-back loop
+(CART_WRITEBACK_INTERVAL) replaces each dirty user's rows with the current
+cart in one transaction. cart_items stays the durable copy (analytics,
+recovery): a cart missing from the store — expired after CART_TTL idle
+seconds, or lost with Redis — is hydrated from it on first access, keeping
+the row ids as line ids. Empty carts are not hydrated, they are read from
+cart_items until the first write.
+
+``apply`` writes a whole batch of line quantities at once, only if the cart
+is still at the version the batch was planned against (POST /cart/items:batch).
+With no quantities it only claims that version — checkout does this before
+its commit, so an order is never placed for a cart that changed after it
+was priced (the database store holds the row locks until the commit).
+
+Versions change on every write and are seeded from a millisecond timestamp,
+so a re-hydrated cart never repeats an old version (pricing memoizes quotes
+per cart version).
+"""
+
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import structlog
+from sqlalchemy import delete, func, insert, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.cart import CartItem
+from app.models.product import Product, ProductVariant
+from app.utils.redis_client import get_redis, redis_key
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+LineKey = Tuple[int, Optional[int]]  # (product_id, variant_id)
+
+
+@dataclass(frozen=True)
+class CartLine:
+    """One cart line (snapshot, no ORM state)"""
+
+    item_id: int
+    product_id: int
+    variant_id: Optional[int]
+    quantity: int
+
+
+@dataclass(frozen=True)
+class CartSnapshot:
+    user_id: int
+    version: str
+    lines: Tuple[CartLine, ...] = ()
+
+    def find(self, item_id: int) -> Optional[CartLine]:
+        return next((line for line in self.lines if line.item_id == item_id), None)
+
+
+async def _noop():
+    return None
+
+
+def _line_field(product_id: int, variant_id: Optional[int]) -> str:
+    return f"{product_id}:{variant_id or ''}"
+
+
+def _parse_field(raw: str) -> LineKey:
+    product_id, variant_id = raw.split(":")
+    return int(product_id), int(variant_id) if variant_id else None
+
+
+def _snapshot(user_id: int, version, lines: Iterable[CartLine]) -> CartSnapshot:
+    return CartSnapshot(user_id, str(version), tuple(sorted(lines, key=lambda line: line.item_id)))
+
+
+def _version_seed() -> int:
+    return int(time.time() * 1000)
+
+
+async def _stored_lines(db: AsyncSession, user_id: int, for_update: bool = False) -> List[CartLine]:
+    query = (
+        select(CartItem.id, CartItem.product_id, CartItem.variant_id, CartItem.quantity)
+        .where(CartItem.user_id == user_id)
+    )
+    if for_update:
+        query = query.with_for_update()
+    result = await db.execute(query)
+    return sorted((CartLine(*row) for row in result.all()), key=lambda line: line.item_id)
+
+
+def _digest(lines: Sequence[CartLine]) -> str:
+    raw = ";".join(f"{line.item_id}:{line.product_id}:{line.variant_id}:{line.quantity}" for line in lines)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _upsert_lines(dialect_name: str, user_id: int, quantities: Dict[LineKey, int]):
+    """INSERT ... ON CONFLICT (user_id, product_id, coalesce(variant_id, 0)) DO UPDATE SET quantity"""
+    now = datetime.now(timezone.utc)
+    stmt = (pg_insert if dialect_name == "postgresql" else sqlite_insert)(CartItem).values([
+        {
+            "user_id": user_id,
+            "product_id": product_id,
+            "variant_id": variant_id,
+            "quantity": quantity,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for (product_id, variant_id), quantity in quantities.items()
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=[CartItem.user_id, CartItem.product_id, func.coalesce(CartItem.variant_id, literal_column("0"))],
+        set_={"quantity": stmt.excluded.quantity, "updated_at": stmt.excluded.updated_at},
+    )
+
+
+# ── Database ────────────────────────────────────────────────
+class DatabaseCartStore:
+    """cart_items rows; the version is a digest of the rows"""
+
+    async def load(self, db: AsyncSession, user_id: int) -> CartSnapshot:
+        lines = await _stored_lines(db, user_id)
+        return CartSnapshot(user_id, _digest(lines), tuple(lines))
+
+    async def add(
+        self, db: AsyncSession, user_id: int, product_id: int, variant_id: Optional[int],
+        quantity: int, max_quantity: int,
+    ) -> Optional[CartLine]:
+        item = await db.scalar(select(CartItem).where(
+            CartItem.user_id == user_id,
+            CartItem.product_id == product_id,
+            CartItem.variant_id.is_(None) if variant_id is None else CartItem.variant_id == variant_id,
+        ))
+        total = (item.quantity if item else 0) + quantity
+        if total > max_quantity:
+            return None
+        if item is None:
+            item = CartItem(user_id=user_id, product_id=product_id, variant_id=variant_id, quantity=total)
+            db.add(item)
+        else:
+            item.quantity = total
+        await db.flush()
+        return CartLine(item.id, product_id, variant_id, total)
+
+    async def set_quantity(self, db: AsyncSession, user_id: int, item_id: int, quantity: int) -> Optional[CartLine]:
+        item = await db.scalar(select(CartItem).where(CartItem.id == item_id, CartItem.user_id == user_id))
+        if item is None:
+            return None
+        item.quantity = quantity
+        return CartLine(item.id, item.product_id, item.variant_id, quantity)
+
+    async def remove(self, db: AsyncSession, user_id: int, item_id: int) -> bool:
+        result = await db.execute(delete(CartItem).where(CartItem.id == item_id, CartItem.user_id == user_id))
+        return result.rowcount > 0
+
+    async def apply(self, db: AsyncSession, user_id: int, version: str, quantities: Dict[LineKey, int]) -> bool:
+        """Lock the rows, check the version, then one DELETE + one upsert"""
+        lines = await _stored_lines(db, user_id, for_update=True)
+        if _digest(lines) != version:
+            return False
+        removed = [
+            line.item_id for line in lines
+            if quantities.get((line.product_id, line.variant_id), 1) <= 0
+        ]
+        if removed:
+            await db.execute(delete(CartItem).where(CartItem.id.in_(removed)))
+        kept = {key: qty for key, qty in quantities.items() if qty > 0}
+        if kept:
+            await db.execute(_upsert_lines(db.get_bind().dialect.name, user_id, kept))
+        return True
+
+    async def consume(
+        self, db: AsyncSession, user_id: int, lines: Sequence[CartLine]
+    ) -> Callable[[], Awaitable[None]]:
+        """Checkout: drop the ordered lines in the order's transaction"""
+        ids = [line.item_id for line in lines]
+        if ids:
+            await db.execute(delete(CartItem).where(CartItem.id.in_(ids), CartItem.user_id == user_id))
+        return _noop
+
+    async def take_dirty(self, limit: int) -> List[int]:
+        return []
+
+    async def mark_dirty(self, *user_ids: int):
+        pass
+
+    async def peek(self, user_id: int) -> Optional[CartSnapshot]:
+        return None
+
+    async def clear(self):
+        pass
+
+
+# ── Memory ──────────────────────────────────────────────────
+@dataclass
+class _MemoryCart:
+    version: int
+    seq: int
+    quantities: Dict[LineKey, int] = field(default_factory=dict)
+    ids: Dict[LineKey, int] = field(default_factory=dict)
+
+
+class MemoryCartStore:
+    """In-process carts with the same semantics as RedisCartStore (no TTL)"""
+
+    def __init__(self):
+        self._carts: Dict[int, _MemoryCart] = {}
+        self._dirty: set = set()
+
+    async def _cart(self, db: AsyncSession, user_id: int) -> Optional[_MemoryCart]:
+        cart = self._carts.get(user_id)
+        if cart is None:
+            lines = await _stored_lines(db, user_id)
+            if not lines:
+                return None
+            cart = self._carts.setdefault(user_id, _MemoryCart(
+                version=_version_seed(),
+                seq=max(line.item_id for line in lines),
+                quantities={(line.product_id, line.variant_id): line.quantity for line in lines},
+                ids={(line.product_id, line.variant_id): line.item_id for line in lines},
+            ))
+        return cart
+
+    def _changed(self, user_id: int, cart: _MemoryCart):
+        cart.version += 1
+        self._dirty.add(user_id)
+
+    @staticmethod
+    def _view(user_id: int, cart: _MemoryCart) -> CartSnapshot:
+        return _snapshot(user_id, cart.version, (
+            CartLine(cart.ids[key], key[0], key[1], qty) for key, qty in cart.quantities.items()
+        ))
+
+    async def load(self, db: AsyncSession, user_id: int) -> CartSnapshot:
+        cart = await self._cart(db, user_id)
+        if cart is None:
+            return CartSnapshot(user_id, "empty")
+        return self._view(user_id, cart)
+
+    async def add(
+        self, db: AsyncSession, user_id: int, product_id: int, variant_id: Optional[int],
+        quantity: int, max_quantity: int,
+    ) -> Optional[CartLine]:
+        cart = await self._cart(db, user_id)
+        if cart is None:
+            cart = self._carts.setdefault(user_id, _MemoryCart(version=_version_seed(), seq=0))
+        key = (product_id, variant_id)
+        total = cart.quantities.get(key, 0) + quantity
+        if total > max_quantity:
+            return None
+        if key not in cart.ids:
+            cart.seq += 1
+            cart.ids[key] = cart.seq
+        cart.quantities[key] = total
+        self._changed(user_id, cart)
+        return CartLine(cart.ids[key], product_id, variant_id, total)
+
+    async def set_quantity(self, db: AsyncSession, user_id: int, item_id: int, quantity: int) -> Optional[CartLine]:
+        cart = await self._cart(db, user_id)
+        key = next((k for k, i in cart.ids.items() if i == item_id), None) if cart else None
+        if key is None:
+            return None
+        cart.quantities[key] = quantity
+        self._changed(user_id, cart)
+        return CartLine(item_id, key[0], key[1], quantity)
+
+    async def remove(self, db: AsyncSession, user_id: int, item_id: int) -> bool:
+        cart = await self._cart(db, user_id)
+        key = next((k for k, i in cart.ids.items() if i == item_id), None) if cart else None
+        if key is None:
+            return False
+        del cart.quantities[key], cart.ids[key]
+        self._changed(user_id, cart)
+        return True
+
+    async def apply(self, db: AsyncSession, user_id: int, version: str, quantities: Dict[LineKey, int]) -> bool:
+        cart = await self._cart(db, user_id)
+        if (str(cart.version) if cart else "empty") != version:
+            return False
+        if cart is None:
+            cart = self._carts.setdefault(user_id, _MemoryCart(version=_version_seed(), seq=0))
+        for key, quantity in quantities.items():
+            if quantity > 0:
+                if key not in cart.ids:
+                    cart.seq += 1
+                    cart.ids[key] = cart.seq
+                cart.quantities[key] = quantity
+            else:
+                cart.quantities.pop(key, None)
+                cart.ids.pop(key, None)
+        self._changed(user_id, cart)
+        return True
+
+    async def consume(
+        self, db: AsyncSession, user_id: int, lines: Sequence[CartLine]
+    ) -> Callable[[], Awaitable[None]]:
+        """Checkout: returns the after-commit step that takes the ordered quantities out"""
+        cart = await self._cart(db, user_id)
+
+        async def after_commit():
+            if cart is None:
+                return
+            for line in lines:
+                key = (line.product_id, line.variant_id)
+                left = cart.quantities.get(key, 0) - line.quantity
+                if left > 0:
+                    cart.quantities[key] = left
+                else:
+                    cart.quantities.pop(key, None)
+                    cart.ids.pop(key, None)
+            self._changed(user_id, cart)
+
+        return after_commit
+
+    async def take_dirty(self, limit: int) -> List[int]:
+        taken = sorted(self._dirty)[:limit]
+        self._dirty.difference_update(taken)
+        return taken
+
+    async def mark_dirty(self, *user_ids: int):
+        self._dirty.update(user_ids)
+
+    async def peek(self, user_id: int) -> Optional[CartSnapshot]:
+        cart = self._carts.get(user_id)
+        return self._view(user_id, cart) if cart is not None else None
+
+    async def clear(self):
+        self._carts.clear()
+        self._dirty.clear()
+
+
+# ── Redis ───────────────────────────────────────────────────
+# Every script: KEYS = lines hash, ids hash, version, dirty set;
+# ARGV[1] = TTL, ARGV[2] = user id. Writes bump the version, refresh the
+# TTL of the three cart keys and mark the user dirty.
+_TOUCH = """
+local function touch()
+  local version = redis.call('INCR', KEYS[3])
+  for i = 1, 3 do
+    if redis.call('EXISTS', KEYS[i]) == 1 then redis.call('EXPIRE', KEYS[i], ARGV[1]) end
+  end
+  redis.call('SADD', KEYS[4], ARGV[2])
+  return version
+end
+local function find(item_id)
+  local ids = redis.call('HGETALL', KEYS[2])
+  for i = 1, #ids, 2 do
+    if ids[i] ~= '_seq' and ids[i + 1] == item_id then return ids[i] end
+  end
+  return nil
+end
+"""
+
+# ARGV[3] = line field, ARGV[4] = delta, ARGV[5] = max qty, ARGV[6] = version seed
+# Returns {item id, qty} or {0, qty} when qty would exceed the max
+_ADD_LUA = _TOUCH + """
+local qty = tonumber(redis.call('HGET', KEYS[1], ARGV[3]) or '0') + tonumber(ARGV[4])
+if qty > tonumber(ARGV[5]) then return {0, qty} end
+redis.call('SET', KEYS[3], ARGV[6], 'NX')
+redis.call('HSET', KEYS[1], ARGV[3], qty)
+local id = redis.call('HGET', KEYS[2], ARGV[3])
+if not id then
+  id = redis.call('HINCRBY', KEYS[2], '_seq', 1)
+  redis.call('HSET', KEYS[2], ARGV[3], id)
+end
+touch()
+return {tonumber(id), qty}
+"""
+
+# ARGV[3] = item id, ARGV[4] = qty (0 removes the line); returns the line field or nil
+_SET_LUA = _TOUCH + """
+local line = find(ARGV[3])
+if not line then return nil end
+if tonumber(ARGV[4]) > 0 then
+  redis.call('HSET', KEYS[1], line, ARGV[4])
+else
+  redis.call('HDEL', KEYS[1], line)
+  redis.call('HDEL', KEYS[2], line)
+end
+touch()
+return line
+"""
+
+# ARGV[3] = expected version ("empty" = not resident), ARGV[4] = version seed,
+# then (line field, qty) pairs; qty 0 removes the line. Returns 0 on a version mismatch.
+_APPLY_LUA = _TOUCH + """
+if (redis.call('GET', KEYS[3]) or 'empty') ~= ARGV[3] then return 0 end
+redis.call('SET', KEYS[3], ARGV[4], 'NX')
+for i = 5, #ARGV, 2 do
+  if tonumber(ARGV[i + 1]) > 0 then
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    if redis.call('HEXISTS', KEYS[2], ARGV[i]) == 0 then
+      redis.call('HSET', KEYS[2], ARGV[i], redis.call('HINCRBY', KEYS[2], '_seq', 1))
+    end
+  else
+    redis.call('HDEL', KEYS[1], ARGV[i])
+    redis.call('HDEL', KEYS[2], ARGV[i])
+  end
+end
+touch()
+return 1
+"""
+
+# ARGV[3..] = (line field, qty) pairs to take out; no-op on an evicted cart
+_CONSUME_LUA = _TOUCH + """
+if redis.call('EXISTS', KEYS[3]) == 0 then return 0 end
+for i = 3, #ARGV, 2 do
+  local left = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0') - tonumber(ARGV[i + 1])
+  if left > 0 then
+    redis.call('HSET', KEYS[1], ARGV[i], left)
+  else
+    redis.call('HDEL', KEYS[1], ARGV[i])
+    redis.call('HDEL', KEYS[2], ARGV[i])
+  end
+end
+touch()
+return 1
+"""
+
+# ARGV[3] = version seed, ARGV[4] = seq, then (line field, item id, qty) triples
+# Loads a cold cart; no-op when another request hydrated it first.
+_HYDRATE_LUA = """
+if redis.call('EXISTS', KEYS[3]) == 1 then return 0 end
+redis.call('DEL', KEYS[1], KEYS[2])
+for i = 5, #ARGV, 3 do
+  redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 2])
+  redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+redis.call('HSET', KEYS[2], '_seq', ARGV[4])
+redis.call('SET', KEYS[3], ARGV[3])
+for i = 1, 3 do redis.call('EXPIRE', KEYS[i], ARGV[1]) end
+return 1
+"""
+
+
+class RedisCartStore:
+    """Shared carts — cart:{user} (qty), cart:{user}:ids, cart:{user}:version"""
+
+    def __init__(self):
+        self.dirty_key = redis_key("cart", "dirty")
+        self._scripts: Dict[str, object] = {}
+
+    def _keys(self, user_id: int) -> List[str]:
+        return [
+            redis_key("cart", user_id),
+            redis_key("cart", user_id, "ids"),
+            redis_key("cart", user_id, "version"),
+            self.dirty_key,
+        ]
+
+    async def _run(self, name: str, lua: str, user_id: int, *args):
+        script = self._scripts.get(name)
+        if script is None:
+            script = self._scripts[name] = get_redis().register_script(lua)
+        return await script(keys=self._keys(user_id), args=[settings.CART_TTL, user_id, *args])
+
+    async def _read(self, user_id: int) -> Optional[CartSnapshot]:
+        lines_key, ids_key, version_key, _ = self._keys(user_id)
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.hgetall(lines_key)
+            pipe.hgetall(ids_key)
+            pipe.get(version_key)
+            quantities, ids, version = await pipe.execute()
+        if version is None:
+            return None
+        return _snapshot(user_id, version, (
+            CartLine(int(ids[raw]), *_parse_field(raw), int(qty)) for raw, qty in quantities.items() if raw in ids
+        ))
+
+    async def _hydrate(self, db: AsyncSession, user_id: int) -> bool:
+        lines = await _stored_lines(db, user_id)
+        if not lines:
+            return False
+        args = [_version_seed(), max(line.item_id for line in lines)]
+        for line in lines:
+            args += [_line_field(line.product_id, line.variant_id), line.item_id, line.quantity]
+        await self._run("hydrate", _HYDRATE_LUA, user_id, *args)
+        return True
+
+    async def load(self, db: AsyncSession, user_id: int) -> CartSnapshot:
+        cart = await self._read(user_id)
+        if cart is None:
+            if not await self._hydrate(db, user_id):
+                return CartSnapshot(user_id, "empty")
+            cart = await self._read(user_id)
+        return cart or CartSnapshot(user_id, "empty")
+
+    async def add(
+        self, db: AsyncSession, user_id: int, product_id: int, variant_id: Optional[int],
+        quantity: int, max_quantity: int,
+    ) -> Optional[CartLine]:
+        if not await get_redis().exists(self._keys(user_id)[2]):
+            await self._hydrate(db, user_id)
+        item_id, total = await self._run(
+            "add", _ADD_LUA, user_id, _line_field(product_id, variant_id), quantity, max_quantity, _version_seed()
+        )
+        if not item_id:
+            return None
+        return CartLine(int(item_id), product_id, variant_id, int(total))
+
+    async def set_quantity(self, db: AsyncSession, user_id: int, item_id: int, quantity: int) -> Optional[CartLine]:
+        await self.load(db, user_id)
+        raw = await self._run("set", _SET_LUA, user_id, item_id, quantity)
+        if raw is None:
+            return None
+        return CartLine(item_id, *_parse_field(raw), quantity)
+
+    async def remove(self, db: AsyncSession, user_id: int, item_id: int) -> bool:
+        await self.load(db, user_id)
+        return await self._run("set", _SET_LUA, user_id, item_id, 0) is not None
+
+    async def apply(self, db: AsyncSession, user_id: int, version: str, quantities: Dict[LineKey, int]) -> bool:
+        args = [version, _version_seed()]
+        for (product_id, variant_id), quantity in quantities.items():
+            args += [_line_field(product_id, variant_id), quantity]
+        return bool(await self._run("apply", _APPLY_LUA, user_id, *args))
+
+    async def consume(
+        self, db: AsyncSession, user_id: int, lines: Sequence[CartLine]
+    ) -> Callable[[], Awaitable[None]]:
+        """Checkout: returns the after-commit step that takes the ordered quantities out"""
+        args = []
+        for line in lines:
+            args += [_line_field(line.product_id, line.variant_id), line.quantity]
+
+        async def after_commit():
+            await self._run("consume", _CONSUME_LUA, user_id, *args)
+
+        return after_commit
+
+    async def take_dirty(self, limit: int) -> List[int]:
+        return [int(uid) for uid in await get_redis().spop(self.dirty_key, limit) or []]
+
+    async def mark_dirty(self, *user_ids: int):
+        if user_ids:
+            await get_redis().sadd(self.dirty_key, *user_ids)
+
+    async def peek(self, user_id: int) -> Optional[CartSnapshot]:
+        return await self._read(user_id)
+
+    async def clear(self):
+        client = get_redis()
+        async for key in client.scan_iter(match=redis_key("cart", "*")):
+            await client.delete(key)
+
+
+_store = None
+
+
+def get_cart_store():
+    """取得目前設定的購物車儲存（singleton）"""
+    global _store
+    if _store is None:
+        if settings.CART_BACKEND == "memory":
+            _store = MemoryCartStore()
+        elif settings.CART_BACKEND == "database":
+            _store = DatabaseCartStore()
+        else:
+            _store = RedisCartStore()
+    return _store
+
+
+# ── Write-back ──────────────────────────────────────────────
+async def write_back_carts(db: AsyncSession) -> int:
+    """將變更過的購物車寫回 cart_items，回傳寫入的使用者數"""
+    store = get_cart_store()
+    user_ids = await store.take_dirty(settings.CART_WRITEBACK_BATCH)
+    if not user_ids:
+        return 0
+
+    try:
+        carts = [cart for uid in user_ids if (cart := await store.peek(uid)) is not None]
+        lines = [(cart.user_id, line) for cart in carts for line in cart.lines]
+        # Lines of products / variants deleted since they were added are dropped
+        products = {line.product_id for _, line in lines}
+        variants = {line.variant_id for _, line in lines if line.variant_id}
+        existing = set((await db.execute(select(Product.id).where(Product.id.in_(products)))).scalars()) if products else set()
+        existing_variants = set((await db.execute(
+            select(ProductVariant.id).where(ProductVariant.id.in_(variants))
+        )).scalars()) if variants else set()
+
+        if carts:
+            await db.execute(delete(CartItem).where(CartItem.user_id.in_([cart.user_id for cart in carts])))
+        rows = [
+            {
+                "user_id": user_id,
+                "product_id": line.product_id,
+                "variant_id": line.variant_id if line.variant_id in existing_variants else None,
+                "quantity": line.quantity,
+            }
+            for user_id, line in lines if line.product_id in existing
+        ]
+        if rows:
+            await db.execute(insert(CartItem), rows)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await store.mark_dirty(*user_ids)
+        raise
+
+    logger.info("carts_written_back", carts=len(carts), lines=len(rows))
+    return len(carts)
+
+
+_writer: Optional[asyncio.Task] = None
+
+
+async def _write_back_loop(session_factory):
+    while True:
+        await asyncio.sleep(settings.CART_WRITEBACK_INTERVAL)
+        try:
+            async with session_factory() as db:
+                await write_back_carts(db)
+        except Exception as exc:
+            logger.error("cart_write_back_failed", error=str(exc))
+
+
+def start_cart_writeback(session_factory):
+    """啟動購物車寫回任務（app lifespan 呼叫）"""
+    global _writer
+    if _writer is None and settings.CART_BACKEND != "database":
+        _writer = asyncio.create_task(_write_back_loop(session_factory))
+
+
+async def stop_cart_writeback(session_factory):
+    """停止寫回任務並做最後一次寫回"""
+    global _writer
+    if _writer is not None:
+        _writer.cancel()
+        try:
+            await _writer
+        except asyncio.CancelledError:
+            pass
+        _writer = None
+    try:
+        async with session_factory() as db:
+            while await write_back_carts(db):
+                pass
+    except Exception as exc:
+        logger.error("cart_write_back_failed", error=str(exc))
@@ -0,0 +1,159 @@
+"""
+Category tree snapshot — in-memory, read-only view of the category table
+
+Built from a single ``SELECT * FROM categories`` and holds:
+  - slug → id map (active categories only)
+  - descendant id sets per category (any depth, including itself)
+  - the serialized tree payload for GET /categories
+
+The snapshot is dropped whenever a session commits a Category change in this
+process (ORM events below) and otherwise expires after CATEGORY_TREE_TTL
+seconds, which bounds staleness for writes made by other workers.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.category import Category
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class CategoryNode:
+    id: int
+    parent_id: Optional[int]
+    name: str
+    slug: str
+    description: Optional[str]
+    image_url: Optional[str]
+    sort_order: int
+
+
+class CategoryTree:
+    """Immutable snapshot of the active category tree"""
+
+    def __init__(self, categories: List[Category]):
+        active = [c for c in categories if c.is_active]
+        self.nodes: Dict[int, CategoryNode] = {
+            c.id: CategoryNode(
+                id=c.id,
+                parent_id=c.parent_id,
+                name=c.name,
+                slug=c.slug,
+                description=c.description,
+                image_url=c.image_url,
+                sort_order=c.sort_order or 0,
+            )
+            for c in active
+        }
+        self.slug_to_id: Dict[str, int] = {n.slug: n.id for n in self.nodes.values()}
+
+        # A child whose parent is inactive / missing is hidden with its subtree
+        ordered = sorted(self.nodes.values(), key=lambda n: (n.sort_order, n.name))
+        self.children: Dict[Optional[int], List[int]] = {}
+        for node in ordered:
+            self.children.setdefault(node.parent_id, []).append(node.id)
+
+        self.descendants: Dict[int, FrozenSet[int]] = {}
+        for root_id in self.children.get(None, []):
+            self._collect(root_id, set())
+        self.payload: List[dict] = [self._serialize(i) for i in self.children.get(None, [])]
+        # Content hash — identical across workers holding the same tree
+        self.etag: str = hashlib.sha1(
+            json.dumps(self.payload, sort_keys=True, ensure_ascii=False).encode()
+        ).hexdigest()
+
+    def _collect(self, node_id: int, seen: set) -> FrozenSet[int]:
+        seen.add(node_id)
+        ids = {node_id}
+        for child_id in self.children.get(node_id, []):
+            if child_id not in seen:  # guard against parent_id cycles
+                ids |= self._collect(child_id, seen)
+        self.descendants[node_id] = frozenset(ids)
+        return self.descendants[node_id]
+
+    def _serialize(self, node_id: int) -> dict:
+        node = self.nodes[node_id]
+        return {
+            "id": node.id,
+            "name": node.name,
+            "slug": node.slug,
+            "description": node.description,
+            "image": node.image_url,
+            "sort_order": node.sort_order,
+            "children": [self._serialize(i) for i in self.children.get(node_id, [])],
+        }
+
+    def get_by_slug(self, slug: str) -> Optional[CategoryNode]:
+        """Active, reachable category by slug"""
+        node_id = self.slug_to_id.get(slug)
+        return self.nodes[node_id] if node_id in self.descendants else None
+
+    def descendant_ids(self, category_id: int) -> FrozenSet[int]:
+        """The category itself plus every active descendant"""
+        return self.descendants.get(category_id, frozenset())
+
+    def child_nodes(self, category_id: int) -> List[CategoryNode]:
+        return [self.nodes[i] for i in self.children.get(category_id, [])]
+
+
+_snapshot: Optional[CategoryTree] = None
+_built_at = 0.0
+_lock = asyncio.Lock()
+
+
+async def get_category_tree(db: AsyncSession) -> CategoryTree:
+    """取得分類樹快照（過期或失效時重建）"""
+    global _snapshot, _built_at
+    if _snapshot is not None and time.monotonic() - _built_at < settings.CATEGORY_TREE_TTL:
+        return _snapshot
+
+    async with _lock:
+        if _snapshot is None or time.monotonic() - _built_at >= settings.CATEGORY_TREE_TTL:
+            result = await db.execute(select(Category))
+            _snapshot = CategoryTree(list(result.scalars().all()))
+            _built_at = time.monotonic()
+        return _snapshot
+
+
+async def category_tree_stamp(db: AsyncSession, **_) -> str:
+    """ETag stamp for category endpoints (see app.utils.etag)"""
+    return (await get_category_tree(db)).etag
+
+
+def invalidate_category_tree():
+    """丟棄目前的分類樹快照，下次讀取時重建"""
+    global _snapshot
+    _snapshot = None
+
+
+# ── Invalidate on commit of any Category change ─────────────
+_DIRTY_FLAG = "category_tree_dirty"
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty(session: Session, flush_context):
+    changed = (*session.new, *session.dirty, *session.deleted)
+    if any(isinstance(obj, Category) for obj in changed):
+        session.info[_DIRTY_FLAG] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session):
+    if session.info.pop(_DIRTY_FLAG, False):
+        invalidate_category_tree()
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_on_rollback(session: Session):
+    session.info.pop(_DIRTY_FLAG, None)
@@ -0,0 +1,133 @@
+"""
+Checkout config snapshot — shipping methods + checkout business rules
+
+Built from a single ``SELECT * FROM shipping_methods`` plus the rule
+settings (FREE_SHIPPING_THRESHOLD, DEFAULT_SHIPPING_FEE, POINTS_REDEEM_RATE)
+and held per worker as an immutable, versioned object:
+  - shipping options by code (inactive ones included, pricing honours any
+    configured code as before)
+  - the serialized active options + rules for GET /shipping-methods
+
+The version is that of the ``shipping-methods`` cache tag, which the admin
+settings endpoints bump after every write; every worker compares it on
+access (one cache read, shared through Redis) and reloads when it moved.
+Requests themselves never query shipping_methods.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from decimal import Decimal
+from types import MappingProxyType
+from typing import List, Mapping, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.shipping import ShippingMethod
+from app.utils.cache import get_cache
+
+settings = get_settings()
+
+SHIPPING_METHODS_TAG = "shipping-methods"
+
+
+def _decimal(value) -> Optional[Decimal]:
+    return None if value is None else Decimal(str(value))
+
+
+@dataclass(frozen=True)
+class ShippingOption:
+    id: int
+    code: str
+    name: str
+    description: Optional[str]
+    fee: Decimal
+    free_threshold: Optional[Decimal]
+    estimated_days: Optional[str]
+    is_active: bool
+    sort_order: int
+
+    def fee_for(self, subtotal: Decimal) -> Decimal:
+        """運費；滿 free_threshold 免運"""
+        if self.free_threshold and subtotal >= self.free_threshold:
+            return Decimal(0)
+        return self.fee
+
+
+class CheckoutConfig:
+    """Immutable snapshot of shipping options and checkout rules"""
+
+    def __init__(self, version: Optional[int], methods: List[ShippingMethod]):
+        self.version = version
+        options = sorted(
+            (
+                ShippingOption(
+                    id=m.id,
+                    code=m.code,
+                    name=m.name,
+                    description=m.description,
+                    fee=_decimal(m.fee) or Decimal(0),
+                    free_threshold=_decimal(m.free_threshold),
+                    estimated_days=m.estimated_days,
+                    is_active=bool(m.is_active),
+                    sort_order=m.sort_order or 0,
+                )
+                for m in methods
+            ),
+            key=lambda o: (o.sort_order, o.id),
+        )
+        self.methods: Mapping[str, ShippingOption] = MappingProxyType({o.code: o for o in options})
+        self.active: Tuple[ShippingOption, ...] = tuple(o for o in options if o.is_active)
+        self.free_shipping_threshold = Decimal(settings.FREE_SHIPPING_THRESHOLD)
+        self.default_shipping_fee = Decimal(settings.DEFAULT_SHIPPING_FEE)
+        self.points_redeem_rate = Decimal(str(settings.POINTS_REDEEM_RATE))
+        self.payload = {
+            "methods": [
+                {
+                    "id": o.id,
+                    "name": o.name,
+                    "code": o.code,
+                    "description": o.description,
+                    "fee": float(o.fee),
+                    "free_threshold": float(o.free_threshold) if o.free_threshold else None,
+                    "estimated_days": o.estimated_days,
+                }
+                for o in self.active
+            ],
+            "free_shipping_threshold": float(self.free_shipping_threshold),
+            "default_shipping_fee": float(self.default_shipping_fee),
+        }
+
+    def shipping_fee(self, code: Optional[str], subtotal: Decimal) -> Decimal:
+        """運費（未指定或未設定的運送方式不收運費）"""
+        option = self.methods.get(code) if code else None
+        return option.fee_for(subtotal) if option else Decimal(0)
+
+
+_snapshot: Optional[CheckoutConfig] = None
+_lock = asyncio.Lock()
+
+
+async def get_checkout_config(db: AsyncSession) -> CheckoutConfig:
+    """取得目前版本的結帳設定快照（版本變更時重新載入）"""
+    global _snapshot
+    versions = await get_cache().get_versions(SHIPPING_METHODS_TAG)
+    if versions is None:
+        # Version unknown: read the table for this request, keep nothing
+        result = await db.execute(select(ShippingMethod))
+        return CheckoutConfig(None, list(result.scalars().all()))
+    version = versions[0]
+    if _snapshot is not None and _snapshot.version == version:
+        return _snapshot
+    async with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            result = await db.execute(select(ShippingMethod))
+            _snapshot = CheckoutConfig(version, list(result.scalars().all()))
+        return _snapshot
+
+
+def invalidate_checkout_config():
+    """丟棄目前的快照，下次讀取時重建"""
+    global _snapshot
+    _snapshot = None
@@ -0,0 +1,209 @@
+"""
+Coupons — in-memory snapshot of active coupons + atomic redemption
+
+Snapshot (previews: GET /cart, POST /cart/coupon):
+  One ``SELECT`` of the active, unexpired, not used-up coupons per worker,
+  held as immutable ``CouponTerms``. It is keyed on the version of the
+  ``coupons`` cache tag (bumped by admin promotion writes), so a lookup
+  costs one cache version read; codes missing from the snapshot (unknown,
+  expired, used up, or newer than it) fall back to the coupon row.
+
+Redemption (checkout), in the order's transaction:
+  - ``UPDATE coupons SET used_count = used_count + 1 WHERE <usable>
+    RETURNING`` — concurrent checkouts can never exceed usage_limit
+  - per-user counter upsert on coupon_user_counts, only while under
+    usage_per_user — an indexed row instead of counting coupon_usages
+Both are given back when the order is cancelled (``release_coupons``).
+"""
+
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, FrozenSet, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.coupon import Coupon, CouponUsage, CouponUserCount
+from app.utils.cache import get_cache, invalidate_cache_tags
+
+COUPONS_TAG = "coupons"
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class CouponTerms:
+    """A coupon's pricing terms (no ORM state)"""
+
+    id: int
+    code: str
+    discount_type: str
+    discount_value: Decimal
+    min_order_amount: Decimal
+    max_discount: Optional[Decimal]
+    usage_per_user: int
+    applicable_products: FrozenSet[int]
+    applicable_categories: FrozenSet[int]
+    starts_at: datetime
+    expires_at: datetime
+
+    @classmethod
+    def from_row(cls, coupon: Coupon) -> "CouponTerms":
+        return cls(
+            id=coupon.id,
+            code=coupon.code,
+            discount_type=coupon.discount_type,
+            discount_value=coupon.discount_value,
+            min_order_amount=coupon.min_order_amount or Decimal(0),
+            max_discount=coupon.max_discount,
+            usage_per_user=coupon.usage_per_user or 1,
+            applicable_products=frozenset(coupon.applicable_products or ()),
+            applicable_categories=frozenset(coupon.applicable_categories or ()),
+            starts_at=_aware(coupon.starts_at),
+            expires_at=_aware(coupon.expires_at),
+        )
+
+    def in_window(self, now: datetime) -> bool:
+        return self.starts_at <= now <= self.expires_at
+
+
+@dataclass(frozen=True)
+class CouponSnapshot:
+    version: Optional[int]
+    by_code: Dict[str, CouponTerms]
+
+
+def coupon_usable(now: Optional[datetime] = None):
+    """SQL form of ``Coupon.is_valid`` — active, within its window, under its usage limit"""
+    now = now or datetime.now(timezone.utc)
+    return and_(
+        Coupon.is_active.is_(True),
+        Coupon.starts_at <= now,
+        Coupon.expires_at >= now,
+        or_(Coupon.usage_limit.is_(None), Coupon.used_count < Coupon.usage_limit),
+    )
+
+
+async def load_coupon(db: AsyncSession, code: str) -> Tuple[Optional[Coupon], bool]:
+    """(coupon, usable now)；時間與次數在資料庫比較"""
+    row = (await db.execute(
+        select(Coupon, coupon_usable().label("usable")).where(Coupon.code == code.upper())
+    )).first()
+    return (row[0], bool(row[1])) if row else (None, False)
+
+
+# ── Snapshot ────────────────────────────────────────────────
+_snapshot: Optional[CouponSnapshot] = None
+_lock = asyncio.Lock()
+
+
+async def get_coupon_snapshot(db: AsyncSession) -> CouponSnapshot:
+    """取得目前版本的優惠券快照（版本變更時重新載入）"""
+    global _snapshot
+    versions = await get_cache().get_versions(COUPONS_TAG)
+    if versions is None:
+        return CouponSnapshot(None, {})  # version unknown: every lookup reads the coupon row
+    version = versions[0]
+    if _snapshot is not None and _snapshot.version == version:
+        return _snapshot
+    async with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            now = datetime.now(timezone.utc)
+            result = await db.execute(select(Coupon).where(
+                Coupon.is_active.is_(True),
+                Coupon.expires_at >= now,
+                or_(Coupon.usage_limit.is_(None), Coupon.used_count < Coupon.usage_limit),
+            ))
+            by_code = {c.code: CouponTerms.from_row(c) for c in result.scalars().all()}
+            _snapshot = CouponSnapshot(version, by_code)
+    return _snapshot
+
+
+def invalidate_coupon_snapshot():
+    """Drop this worker's snapshot (tests)"""
+    global _snapshot
+    _snapshot = None
+
+
+async def find_coupon(db: AsyncSession, code: str) -> Tuple[Optional[CouponTerms], bool]:
+    """(terms, usable now) — the snapshot first, the coupon row for anything it does not hold"""
+    code = code.upper()
+    terms = (await get_coupon_snapshot(db)).by_code.get(code)
+    if terms is not None:
+        return terms, terms.in_window(datetime.now(timezone.utc))
+    coupon, usable = await load_coupon(db, code)
+    return (CouponTerms.from_row(coupon), usable) if coupon else (None, False)
+
+
+# ── Redemption ──────────────────────────────────────────────
+def _count_user_use(dialect_name: str, coupon_id: int, user_id: int, limit: int):
+    """INSERT ... ON CONFLICT DO UPDATE used_count + 1 WHERE used_count < limit RETURNING used_count"""
+    stmt = (pg_insert if dialect_name == "postgresql" else sqlite_insert)(CouponUserCount).values(
+        coupon_id=coupon_id, user_id=user_id, used_count=1
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[CouponUserCount.coupon_id, CouponUserCount.user_id],
+        set_={"used_count": CouponUserCount.used_count + 1},
+        where=CouponUserCount.used_count < limit,
+    ).returning(CouponUserCount.used_count)
+
+
+async def reserve_coupon(db: AsyncSession, terms: CouponTerms, user_id: int):
+    """
+    結帳時佔用一次優惠券使用（總次數 + 每人次數），不符時丟出 400
+
+    Runs in the order's transaction, so a failed checkout gives the use back.
+    """
+    reserved = await db.scalar(
+        update(Coupon)
+        .where(Coupon.id == terms.id, coupon_usable())
+        .values(used_count=Coupon.used_count + 1)
+        .returning(Coupon.id)
+        .execution_options(synchronize_session=False)
+    )
+    if reserved is None:
+        if _snapshot is not None and terms.code in _snapshot.by_code:
+            await invalidate_cache_tags(COUPONS_TAG)  # the snapshot still offers a used-up coupon
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="優惠券已失效或已使用完畢")
+
+    used = await db.scalar(_count_user_use(db.get_bind().dialect.name, terms.id, user_id, terms.usage_per_user))
+    if used is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"此優惠券每人限用 {terms.usage_per_user} 次",
+        )
+
+
+async def release_coupons(db: AsyncSession, order_ids: Sequence[int]):
+    """取消訂單時歸還優惠券使用次數（總次數 + 每人次數），並刪除使用紀錄"""
+    if not order_ids:
+        return
+    usages = (await db.execute(
+        select(CouponUsage.coupon_id, CouponUsage.user_id).where(CouponUsage.order_id.in_(order_ids))
+    )).all()
+    if not usages:
+        return
+
+    for coupon_id, uses in Counter(coupon_id for coupon_id, _ in usages).items():
+        await db.execute(
+            update(Coupon)
+            .where(Coupon.id == coupon_id)
+            .values(used_count=Coupon.used_count - uses)
+            .execution_options(synchronize_session=False)
+        )
+    for (coupon_id, user_id), uses in Counter((c, u) for c, u in usages).items():
+        await db.execute(
+            update(CouponUserCount)
+            .where(CouponUserCount.coupon_id == coupon_id, CouponUserCount.user_id == user_id)
+            .values(used_count=CouponUserCount.used_count - uses)
+            .execution_options(synchronize_session=False)
+        )
+    await db.execute(delete(CouponUsage).where(CouponUsage.order_id.in_(order_ids)))
@@ -0,0 +1,56 @@
+"""
+ECPay CheckMacValue — 綠界檢查碼
+
+    CheckMacValue = upper(sha256(lower(urlencode(
+        "HashKey=<key>&" + "&".join(sorted k=v, CheckMacValue excluded) + "&HashIV=<iv>"
+    ))))
+
+URL encoding works character by character, so the ``HashKey=...&`` prefix is
+encoded and fed to a SHA-256 object once (``CheckMacSigner``); each
+notification only copies that keyed state and hashes its own parameters.
+The encoding follows ECPay's .NET ``HttpUtility.UrlEncode`` flavour: spaces
+as ``+`` and ``-_.!*()`` left as is.
+"""
+
+import hashlib
+import hmac
+from typing import Mapping, Optional
+from urllib.parse import quote_plus
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def _encode(text: str) -> bytes:
+    return quote_plus(text, safe="-_.!*()").replace("~", "%7E").lower().encode()
+
+
+class CheckMacSigner:
+    """Keyed SHA-256 CheckMacValue for one (HashKey, HashIV) pair"""
+
+    def __init__(self, hash_key: str, hash_iv: str):
+        self._keyed = hashlib.sha256(_encode(f"HashKey={hash_key}&"))
+        self._suffix = _encode(f"&HashIV={hash_iv}")
+
+    def sign(self, params: Mapping[str, str]) -> str:
+        fields = sorted(((k, v) for k, v in params.items() if k != "CheckMacValue"), key=lambda kv: kv[0].lower())
+        digest = self._keyed.copy()
+        digest.update(_encode("&".join(f"{k}={v}" for k, v in fields)))
+        digest.update(self._suffix)
+        return digest.hexdigest().upper()
+
+    def verify(self, params: Mapping[str, str]) -> bool:
+        mac = params.get("CheckMacValue")
+        return bool(mac) and hmac.compare_digest(self.sign(params), str(mac).upper())
+
+
+_signer: Optional[CheckMacSigner] = None
+
+
+def get_ecpay_signer() -> Optional[CheckMacSigner]:
+    """取得 CheckMacValue 簽章器（未設定 ECPAY_HASH_KEY 時為 None，不驗證；僅限開發環境）"""
+    global _signer
+    if _signer is None and settings.ECPAY_HASH_KEY:
+        _signer = CheckMacSigner(settings.ECPAY_HASH_KEY, settings.ECPAY_HASH_IV)
+    return _signer
@@ -0,0 +1,40 @@
+"""
+Email — SMTP delivery via aiosmtplib
+
+Only called from background tasks (app.tasks), never inline in a request.
+Without SMTP credentials (development / tests) messages are logged and
+dropped.
+"""
+
+from email.message import EmailMessage
+
+import aiosmtplib
+import structlog
+
+from app.config import get_settings
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+
+async def send_email(to: str, subject: str, body: str) -> bool:
+    """寄送純文字 Email，未設定 SMTP 時略過並回傳 False"""
+    if not settings.SMTP_HOST or not settings.SMTP_USER:
+        logger.info("email_skipped", to=to, subject=subject, reason="smtp_not_configured")
+        return False
+
+    message = EmailMessage()
+    message["From"] = f"{settings.SMTP_FROM_NAME} <{settings.SMTP_FROM_EMAIL}>"
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+
+    await aiosmtplib.send(
+        message,
+        hostname=settings.SMTP_HOST,
+        port=settings.SMTP_PORT,
+        username=settings.SMTP_USER,
+        password=settings.SMTP_PASSWORD,
+        start_tls=settings.SMTP_USE_TLS,
+    )
+    return True
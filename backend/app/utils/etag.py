@@ -0,0 +1,110 @@
+"""
+Conditional GET — ETag / If-None-Match for catalog and content reads
+
+The ETag is computed *before* the endpoint runs, from cheap version stamps:
+  - cache tag versions (bumped by invalidate_cache_tags on every admin write)
+  - an optional ``stamp`` callable (e.g. the category tree snapshot hash, or
+    a ``time_window`` for data that changes without a tag bump)
+plus the route namespace and scalar params. A matching If-None-Match returns
+304 without running the main query or serializing the envelope.
+
+ETags are weak (W/"…") because GZipMiddleware may re-encode the body.
+"""
+
+import functools
+import hashlib
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Iterable, Optional, Union
+
+from fastapi import Request, Response, status
+
+from app.utils.cache import get_cache, key_params, make_cache_key
+
+TagsArg = Union[Iterable[str], Callable[..., Iterable[str]]]
+
+CACHE_CONTROL = "no-cache"  # clients may store, but must revalidate
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison per RFC 9110 (W/ prefixes ignored, '*' matches)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == target for tag in if_none_match.split(","))
+
+
+async def compute_etag(namespace: str, params: dict, tags: Iterable[str], stamp: str = "") -> Optional[str]:
+    """None when the tag versions are unavailable — the response then goes out without an ETag"""
+    versions = await get_cache().get_versions(*tags) if tags else []
+    if versions is None:
+        return None
+    raw = f"{make_cache_key(namespace, **params)}|{versions}|{stamp}"
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()[:20]}"'
+
+
+def time_window(seconds: int, stamp: Optional[Callable[..., Awaitable[str]]] = None):
+    """
+    Stamp that rolls over every ``seconds``, optionally combined with ``stamp``.
+
+    Listings show stock / sold_count, which move with every order without
+    bumping the ``products`` tag; the window keeps a 304 from outliving the
+    response cache TTL.
+    """
+
+    async def window_stamp(**kwargs) -> str:
+        window = str(int(time.time() // seconds))
+        return f"{await stamp(**kwargs)}|{window}" if stamp else window
+
+    return window_stamp
+
+
+def etag_response(
+    namespace: str,
+    tags: TagsArg = (),
+    stamp: Optional[Callable[..., Awaitable[str]]] = None,
+    on_not_modified: Optional[Callable[..., Awaitable[Any]]] = None,
+):
+    """
+    ETag decorator for GET endpoints.
+
+    Place it *under* ``@router.get`` and above ``@cached_response``. ``tags``
+    may be static or ``tags(**params)``; ``stamp(**kwargs)`` receives all
+    endpoint kwargs (including the DB session). ``on_not_modified(**kwargs)``
+    runs side effects that must happen even on a 304 (e.g. view counting).
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, _etag_request: Request, _etag_response: Response, **kwargs):
+            params = key_params(kwargs)
+            entry_tags = tags(**params) if callable(tags) else tags
+            extra = await stamp(**kwargs) if stamp else ""
+            etag = await compute_etag(namespace, params, entry_tags, extra)
+            if etag is None:
+                return await func(*args, **kwargs)
+            headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+            if etag_matches(_etag_request.headers.get("if-none-match"), etag):
+                if on_not_modified:
+                    await on_not_modified(**kwargs)
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            result = await func(*args, **kwargs)
+            target = result if isinstance(result, Response) else _etag_response
+            target.headers.update(headers)
+            return result
+
+        # Expose Request / Response to FastAPI without touching the endpoint
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter("_etag_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            inspect.Parameter("_etag_response", inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+        ])
+        return wrapper
+
+    return decorator
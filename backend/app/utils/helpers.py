@@ -5,6 +5,7 @@ Helper utilities — slugify, order number generation, etc.
 import random
 import string
 from datetime import datetime, timezone
+from typing import Optional
 
 from slugify import slugify as _slugify
 
@@ -14,12 +15,37 @@ def generate_slug(text: str) -> str:
     return _slugify(text, lowercase=True, max_length=100)
 
 
-def generate_order_number() -> str:
-    """Generate a unique order number: PFS + date + random"""
-    now = datetime.now(timezone.utc)
-    date_part = now.strftime("%Y%m%d")
-    random_part = "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    return f"PFS{date_part}{random_part}"
+def luhn_check_digit(digits: str) -> str:
+    """Luhn (mod 10) check digit for a string of digits"""
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = int(ch)
+        if i % 2 == 0:
+            d = d * 2 - 9 if d > 4 else d * 2
+        total += d
+    return str(-total % 10)
+
+
+def generate_order_number(sequence: int, issued_at: Optional[datetime] = None) -> str:
+    """Format an order number: PFS + date + sequence (≥ 6 digits) + check digit"""
+    date_part = (issued_at or datetime.now(timezone.utc)).strftime("%Y%m%d")
+    digits = f"{date_part}{sequence:06d}"
+    return f"PFS{digits}{luhn_check_digit(digits)}"
+
+
+def is_valid_order_number(order_number: str) -> bool:
+    """Check prefix and check digit (catches typos in customer-entered numbers)"""
+    digits = order_number[3:]
+    if not order_number.startswith("PFS") or len(digits) < 15 or not digits.isdigit():
+        return False
+    return luhn_check_digit(digits[:-1]) == digits[-1]
+
+
+def order_number_sequence(order_number: str) -> Optional[int]:
+    """Sequence value of a valid order number (None for legacy / invalid numbers)"""
+    if not is_valid_order_number(order_number):
+        return None
+    return int(order_number[11:-1])
 
 
 def generate_random_code(length: int = 8) -> str:
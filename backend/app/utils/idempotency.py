@@ -0,0 +1,179 @@
+"""
+Idempotency — ``Idempotency-Key`` request deduplication with response replay
+
+A client that retries a POST with the same key gets the original response
+back instead of a second order / payment. Per key we store:
+  - while the first request runs : {"state": "pending", "fingerprint"}
+    (expires after IDEMPOTENCY_LOCK_TTL in case the worker dies)
+  - after a 2xx response         : status, headers and body, kept for
+    IDEMPOTENCY_TTL and replayed verbatim
+
+The fingerprint (method, path, query, body) guards against a key being
+reused for a different request. Non-2xx responses release the key so the
+client can fix the request and retry. Keys are scoped per user (or client
+IP) so clients cannot collide with each other.
+
+Backends (IDEMPOTENCY_BACKEND):
+  - RedisIdempotencyStore  : SET NX claim, shared by all workers
+  - MemoryIdempotencyStore : single process / tests
+
+Enforced by app.middleware.idempotency for the routes in IDEMPOTENT_ROUTES.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Dict, Optional, Tuple
+
+from app.config import get_settings
+from app.utils.redis_client import get_redis, redis_key
+
+settings = get_settings()
+
+MAX_KEY_LENGTH = 64
+
+
+class IdempotencyError(Exception):
+    """Request cannot proceed under this key (reused / still in flight)"""
+
+    def __init__(self, status_code: int, message: str, code: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.code = code
+
+
+class MemoryIdempotencyStore:
+    """In-process records with expiry"""
+
+    def __init__(self):
+        self._records: Dict[str, Tuple[float, dict]] = {}
+
+    def _live(self, key: str) -> Optional[dict]:
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._records[key]
+            return None
+        return entry[1]
+
+    async def claim(self, key: str, record: dict, ttl: int) -> Optional[dict]:
+        existing = self._live(key)
+        if existing is None:
+            self._records[key] = (time.monotonic() + ttl, record)
+        return existing
+
+    async def get(self, key: str) -> Optional[dict]:
+        return self._live(key)
+
+    async def set(self, key: str, record: dict, ttl: int):
+        self._records[key] = (time.monotonic() + ttl, record)
+
+    async def delete(self, key: str):
+        self._records.pop(key, None)
+
+    async def clear(self):
+        self._records.clear()
+
+
+class RedisIdempotencyStore:
+    """Records as JSON strings; the claim is a single SET NX"""
+
+    def _key(self, key: str) -> str:
+        return redis_key("idempotency", key)
+
+    async def claim(self, key: str, record: dict, ttl: int) -> Optional[dict]:
+        client = get_redis()
+        if await client.set(self._key(key), json.dumps(record), nx=True, ex=ttl):
+            return None
+        existing = await client.get(self._key(key))
+        if existing is None:  # expired in between — try once more
+            return None if await client.set(self._key(key), json.dumps(record), nx=True, ex=ttl) else record
+        return json.loads(existing)
+
+    async def get(self, key: str) -> Optional[dict]:
+        raw = await get_redis().get(self._key(key))
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, record: dict, ttl: int):
+        await get_redis().set(self._key(key), json.dumps(record), ex=ttl)
+
+    async def delete(self, key: str):
+        await get_redis().delete(self._key(key))
+
+    async def clear(self):
+        client = get_redis()
+        async for key in client.scan_iter(match=redis_key("idempotency", "*")):
+            await client.delete(key)
+
+
+_store = None
+
+
+def get_idempotency_store():
+    """取得目前設定的冪等紀錄後端（singleton）"""
+    global _store
+    if _store is None:
+        if settings.IDEMPOTENCY_BACKEND == "memory":
+            _store = MemoryIdempotencyStore()
+        else:
+            _store = RedisIdempotencyStore()
+    return _store
+
+
+def request_fingerprint(method: str, path: str, query: str, body: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (method.encode(), path.encode(), query.encode()):
+        digest.update(part + b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+async def begin(key: str, fingerprint: str) -> Optional[dict]:
+    """
+    Claim ``key`` for this request. Returns None when the caller owns the key
+    and must run the request, or the completed record to replay. A duplicate
+    that arrives while the first request is running waits for it (up to
+    IDEMPOTENCY_WAIT_SECONDS).
+    """
+    store = get_idempotency_store()
+    pending = {"state": "pending", "fingerprint": fingerprint}
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        record = await store.claim(key, pending, settings.IDEMPOTENCY_LOCK_TTL)
+        if record is None:
+            return None
+        if record["fingerprint"] != fingerprint:
+            raise IdempotencyError(422, "Idempotency-Key 已用於不同的請求", "IDEMPOTENCY_KEY_REUSED")
+        if record["state"] == "done":
+            return record
+        if time.monotonic() >= deadline:
+            raise IdempotencyError(409, "相同請求仍在處理中，請稍後再試", "IDEMPOTENCY_IN_PROGRESS")
+        await asyncio.sleep(0.05)
+
+
+async def complete(key: str, fingerprint: str, status_code: int, headers: list, body: bytes):
+    """Store a finished 2xx response for replay"""
+    await get_idempotency_store().set(
+        key,
+        {
+            "state": "done",
+            "fingerprint": fingerprint,
+            "status": status_code,
+            "headers": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in headers],
+            "body": body.decode("latin-1"),
+        },
+        settings.IDEMPOTENCY_TTL,
+    )
+
+
+async def abandon(key: str):
+    """Release the claim (request failed) so a retry runs again"""
+    await get_idempotency_store().delete(key)
+
+
+async def clear_idempotency():
+    """清除所有冪等紀錄（測試用）"""
+    await get_idempotency_store().clear()
@@ -0,0 +1,350 @@
+"""
+Inventory — batched, atomic stock reservation for checkout / cancellation
+
+``reserve_stock`` decrements every line of an order in one statement whose
+WHERE clause re-checks ``stock >= qty`` in the database, so two concurrent
+checkouts can never both take the last unit. On PostgreSQL:
+
+    WITH locked AS (SELECT id FROM products WHERE id IN (...) ORDER BY id FOR UPDATE)
+    UPDATE products SET stock = stock - v.qty, sold_count = sold_count + v.qty
+    FROM (VALUES ...) AS v(id, qty)
+    WHERE products.id = v.id AND products.id IN (SELECT id FROM locked)
+      AND products.stock >= v.qty
+    RETURNING products.id
+
+The CTE takes row locks in ascending id order, so overlapping checkouts
+queue instead of deadlocking. Other dialects get the same single UPDATE with
+CASE expressions. Lines missing from RETURNING are the ones that failed;
+the statements use ``synchronize_session=False`` — loaded Product objects keep
+their old ``stock`` until refreshed.
+
+Holds: an order paid online keeps its stock only for ORDER_HOLD_MINUTES. Its
+``inventory_holds`` row (one INSERT, indexed on expires_at) is deleted when
+the payment callback confirms payment; otherwise the sweeper cancels the
+order and releases its stock, ORDER_HOLD_SWEEP_BATCH orders per transaction.
+Every path locks the order row before its hold row.
+
+Every cancellation path (customer, admin, sweeper) goes through
+``cancel_orders``, which releases stock, the hold, points, credits and the
+coupon use, and takes back points the order already earned — never below a
+zero balance; a shortfall (points already spent) is logged and noted on the
+points transaction. Cash-on-delivery orders are not held.
+
+Every stock change purges ``product:{id}`` (``stock_cache_tags``) once the
+transaction commits, so product detail ETags / cached responses follow it.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import structlog
+from sqlalchemy import Integer, case, column, delete, func, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.config import get_settings
+from app.models.order import InventoryHold, Order, OrderStatusLog
+from app.models.points import PointsTransaction
+from app.models.product import Product
+from app.models.user import User
+from app.utils.cache import invalidate_cache_tags
+from app.utils.coupons import release_coupons
+from app.utils.order_events import order_state, publish_order_events
+from app.utils.principal import invalidate_principal
+from app.utils.trending import remove_sales
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+UNHELD_PAYMENT_METHODS = {"cod"}
+
+
+def merge_lines(lines: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    """(product_id, qty) lines → qty per product (variants of one product share stock)"""
+    merged: Dict[int, int] = {}
+    for product_id, qty in lines:
+        merged[product_id] = merged.get(product_id, 0) + qty
+    return merged
+
+
+def stock_cache_tags(lines: Iterable[Tuple[int, int]]) -> List[str]:
+    """Cache tags of the products whose stock / sold_count a set of lines changes"""
+    return [f"product:{product_id}" for product_id in sorted(merge_lines(lines))]
+
+
+def _reserve_statement(dialect_name: str, quantities: Dict[int, int]):
+    ids = sorted(quantities)
+    if dialect_name == "postgresql":
+        v = values(column("id", Integer), column("qty", Integer), name="v").data(
+            [(i, quantities[i]) for i in ids]
+        )
+        locked = (
+            select(Product.id).where(Product.id.in_(ids)).order_by(Product.id).with_for_update().cte("locked")
+        )
+        return (
+            update(Product)
+            .add_cte(locked)
+            .where(Product.id == v.c.id, Product.id.in_(select(locked.c.id)), Product.stock >= v.c.qty)
+            .values(stock=Product.stock - v.c.qty, sold_count=Product.sold_count + v.c.qty)
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        )
+    qty = case(quantities, value=Product.id, else_=0)
+    return (
+        update(Product)
+        .where(Product.id.in_(ids), Product.stock >= qty)
+        .values(stock=Product.stock - qty, sold_count=Product.sold_count + qty)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _release_statement(dialect_name: str, quantities: Dict[int, int]):
+    ids = sorted(quantities)
+    if dialect_name == "postgresql":
+        v = values(column("id", Integer), column("qty", Integer), name="v").data(
+            [(i, quantities[i]) for i in ids]
+        )
+        return (
+            update(Product)
+            .where(Product.id == v.c.id)
+            .values(stock=Product.stock + v.c.qty, sold_count=Product.sold_count - v.c.qty)
+            .execution_options(synchronize_session=False)
+        )
+    qty = case(quantities, value=Product.id, else_=0)
+    return (
+        update(Product)
+        .where(Product.id.in_(ids))
+        .values(stock=Product.stock + qty, sold_count=Product.sold_count - qty)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def reserve_stock(db: AsyncSession, lines: Iterable[Tuple[int, int]]) -> List[int]:
+    """
+    扣除庫存（單一 UPDATE），回傳庫存不足的商品 id
+
+    All-or-nothing: if any product fails, the lines that did succeed are put
+    back in the same transaction and nothing stays reserved.
+    """
+    quantities = merge_lines(lines)
+    if not quantities:
+        return []
+    dialect_name = db.get_bind().dialect.name
+
+    result = await db.execute(_reserve_statement(dialect_name, quantities))
+    reserved = set(result.scalars().all())
+    failed = sorted(set(quantities) - reserved)
+    if failed and reserved:
+        await db.execute(_release_statement(dialect_name, {i: quantities[i] for i in reserved}))
+    return failed
+
+
+async def release_stock(db: AsyncSession, lines: Iterable[Tuple[int, int]]):
+    """歸還庫存（取消訂單），單一 UPDATE"""
+    quantities = merge_lines(lines)
+    if quantities:
+        await db.execute(_release_statement(db.get_bind().dialect.name, quantities))
+
+
+# ── Holds ───────────────────────────────────────────────────
+def place_hold(db: AsyncSession, order: Order) -> Optional[datetime]:
+    """訂單等待線上付款期間保留庫存，回傳到期時間（貨到付款不保留）"""
+    if order.payment_method in UNHELD_PAYMENT_METHODS:
+        return None
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=settings.ORDER_HOLD_MINUTES)
+    db.add(InventoryHold(order_id=order.id, expires_at=expires_at))
+    return expires_at
+
+
+async def release_hold(db: AsyncSession, order_id: int):
+    """付款完成或訂單取消時移除保留"""
+    await db.execute(delete(InventoryHold).where(InventoryHold.order_id == order_id))
+
+
+async def sweep_expired_holds(db: AsyncSession, now: Optional[datetime] = None) -> int:
+    """
+    取消逾時未付款的訂單並歸還庫存，回傳取消的訂單數
+
+    One batch per call. Locks are taken order row first, then its hold —
+    the same order as the payment worker (app.tasks.payments), customer and
+    admin cancellation — so the paths cannot deadlock. Orders with an expired
+    hold are claimed with FOR UPDATE SKIP LOCKED: several workers can sweep
+    at once, and an order a payment callback is applying right now is simply
+    skipped (its hold is gone once the payment commits). An order is only
+    cancelled while it is still pending and unpaid. Commits the batch.
+    """
+    now = now or datetime.now(timezone.utc)
+    result = await db.execute(
+        select(Order.id)
+        .join(InventoryHold, InventoryHold.order_id == Order.id)
+        .where(InventoryHold.expires_at <= now)
+        .order_by(InventoryHold.expires_at)
+        .limit(settings.ORDER_HOLD_SWEEP_BATCH)
+        .with_for_update(skip_locked=True, of=Order)
+    )
+    expired = result.scalars().all()
+    if not expired:
+        return 0
+
+    await db.execute(delete(InventoryHold).where(InventoryHold.order_id.in_(expired)))
+    # Already locked above; loaded again with items
+    result = await db.execute(
+        select(Order)
+        .where(Order.id.in_(expired), Order.status == "pending", Order.payment_status != "paid")
+        .options(selectinload(Order.items))
+        .order_by(Order.id)
+        .execution_options(populate_existing=True)
+    )
+    orders = result.scalars().all()
+    after_commit = await cancel_orders(
+        db, orders, note=f"付款逾時，系統自動取消（保留 {settings.ORDER_HOLD_MINUTES} 分鐘）"
+    )
+    await db.commit()
+    await after_commit()
+
+    if orders:
+        logger.info("inventory_holds_expired", orders=len(orders), holds=len(expired))
+    return len(orders)
+
+
+# ── Cancellation ────────────────────────────────────────────
+async def _earned_points(db: AsyncSession, order_ids: List[int]) -> Dict[int, int]:
+    """Points already earned per order (app.tasks.orders), taken back on cancellation"""
+    if not order_ids:
+        return {}
+    result = await db.execute(
+        select(PointsTransaction.reference_id, func.sum(PointsTransaction.amount))
+        .where(
+            PointsTransaction.reference_type == "order",
+            PointsTransaction.reference_id.in_(order_ids),
+            PointsTransaction.type == "earn",
+        )
+        .group_by(PointsTransaction.reference_id)
+    )
+    return {order_id: int(total) for order_id, total in result.all()}
+
+
+async def cancel_orders(
+    db: AsyncSession,
+    orders: Sequence[Order],
+    note: str,
+) -> Callable[[], Awaitable[None]]:
+    """
+    取消訂單並歸還庫存 / 點數 / 購物金 / 優惠券次數，扣回已累積的回饋點數（客戶取消、後台取消、逾時清理共用）
+
+    ``orders`` must be loaded FOR UPDATE with their items, and their status
+    already checked by the caller. Everything here runs in the caller's
+    transaction; the returned coroutine function does the post-commit part
+    (order events, trending, product caches, cached principals) — await it or hand it to
+    BackgroundTasks after the commit.
+    """
+    lines_by_order = []
+    refunded = set()
+    earned = await _earned_points(db, [order.id for order in orders])
+    for order in orders:
+        db.add(OrderStatusLog(order_id=order.id, from_status=order.status, to_status="cancelled", note=note))
+        order.status = "cancelled"
+        lines_by_order.append(([(oi.product_id, oi.quantity) for oi in order.items if oi.product_id], order.created_at))
+
+        clawback = earned.get(order.id, 0)
+        shortfall = 0
+        if clawback > 0:
+            # Never below zero: the earned points may already be spent
+            balance = await db.scalar(select(User.points).where(User.id == order.user_id).with_for_update())
+            available = (balance or 0) + order.points_used
+            shortfall = max(clawback - available, 0)
+            if shortfall:
+                logger.warning("points_clawback_shortfall", order_id=order.id, user_id=order.user_id, shortfall=shortfall)
+            clawback -= shortfall
+        if order.points_used > 0 or order.credits_used > 0 or clawback > 0 or shortfall > 0:
+            result = await db.execute(
+                update(User)
+                .where(User.id == order.user_id)
+                .values(
+                    points=User.points + order.points_used - clawback,
+                    credits=User.credits + order.credits_used,
+                )
+                .returning(User.points)
+                .execution_options(synchronize_session=False)
+            )
+            points_after = result.scalar_one()
+            refunded.add(order.user_id)
+            if order.points_used > 0:
+                db.add(PointsTransaction(
+                    user_id=order.user_id,
+                    type="adjust",
+                    amount=order.points_used,
+                    balance_after=points_after + clawback,
+                    description=f"訂單取消退還 ({order.order_number})",
+                ))
+            if clawback > 0 or shortfall > 0:
+                description = f"訂單取消扣回回饋 ({order.order_number})"
+                if shortfall:
+                    description += f"，點數不足 {shortfall} 點未扣回"
+                db.add(PointsTransaction(
+                    user_id=order.user_id,
+                    type="adjust",
+                    amount=-clawback,
+                    balance_after=points_after,
+                    reference_type="order",
+                    reference_id=order.id,
+                    description=description,
+                ))
+
+    all_lines = [line for lines, _ in lines_by_order for line in lines]
+    await release_stock(db, all_lines)
+    await release_coupons(db, [order.id for order in orders if order.coupon_code])
+    if orders:
+        await db.execute(delete(InventoryHold).where(InventoryHold.order_id.in_([o.id for o in orders])))
+
+    states = [order_state(order) for order in orders]
+
+    async def after_commit():
+        await publish_order_events(*states)
+        # Same timestamp as the original sale → removes exactly its contribution
+        for lines, sold_at in lines_by_order:
+            await remove_sales(lines, sold_at)
+        if all_lines:
+            await invalidate_cache_tags(*stock_cache_tags(all_lines))
+        if refunded:
+            await invalidate_principal(*refunded)
+
+    return after_commit
+
+
+# ── Background sweeper ──────────────────────────────────────
+_sweeper: Optional[asyncio.Task] = None
+
+
+async def _sweep_loop(session_factory):
+    while True:
+        try:
+            # Keep going while full batches come back, then wait for the next interval
+            while True:
+                async with session_factory() as db:
+                    if await sweep_expired_holds(db) < settings.ORDER_HOLD_SWEEP_BATCH:
+                        break
+        except Exception as exc:
+            logger.error("inventory_hold_sweep_failed", error=str(exc))
+        await asyncio.sleep(settings.ORDER_HOLD_SWEEP_INTERVAL)
+
+
+def start_hold_sweeper(session_factory):
+    """啟動逾時保留清理任務（app lifespan 呼叫）"""
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = asyncio.create_task(_sweep_loop(session_factory))
+
+
+async def stop_hold_sweeper():
+    """停止逾時保留清理任務"""
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        try:
+            await _sweeper
+        except asyncio.CancelledError:
+            pass
+        _sweeper = None
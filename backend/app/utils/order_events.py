@@ -0,0 +1,204 @@
+"""
+Order events — live order / payment status for GET /orders/{id}/events (SSE)
+
+Every change of an order's status or payment status (payment callback
+applied, cancellation, admin update) is published after its commit as the
+order's whole state ``{order_id, order_number, status, payment_status}``,
+and each worker fans it out to its own SSE connections:
+
+  - connections subscribe per order id, *before* reading the current state,
+    so nothing published in between is missed
+  - each connection has a bounded buffer (ORDER_EVENTS_BUFFER); a reader
+    that falls behind loses its oldest events, never the newest — every
+    event carries the whole state, so the latest one is all it needs
+  - a heartbeat comment every ORDER_EVENTS_HEARTBEAT seconds keeps proxies
+    from closing the connection; after ORDER_EVENTS_IDLE_TIMEOUT seconds
+    without an event the stream ends (EventSource reconnects and starts
+    from the current state)
+  - no database session is held while a connection waits
+
+Backends (ORDER_EVENTS_BACKEND):
+  - RedisOrderEvents  : PUBLISH on one channel, every worker's listener
+                        (``start_order_events_listener``) delivers locally —
+                        required once publishers (Celery workers) and SSE
+                        connections live in different processes
+  - MemoryOrderEvents : in-process delivery (single worker / tests)
+"""
+
+import asyncio
+import json
+from typing import AsyncIterator, Dict, Optional, Set
+
+import structlog
+
+from app.config import get_settings
+from app.utils.redis_client import get_redis, redis_key
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+RETRY_MS = 3000  # EventSource reconnect delay
+
+
+def order_state(order) -> dict:
+    """訂單狀態事件內容"""
+    return {
+        "order_id": order.id,
+        "order_number": order.order_number,
+        "status": order.status,
+        "payment_status": order.payment_status,
+    }
+
+
+# ── Local fan-out ───────────────────────────────────────────
+class Subscription:
+    """One SSE connection's bounded buffer for one order"""
+
+    def __init__(self, order_id: int):
+        self.order_id = order_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.ORDER_EVENTS_BUFFER)
+
+    def put(self, event: dict):
+        if self.queue.full():
+            self.queue.get_nowait()  # drop the oldest; the newest state always gets through
+        self.queue.put_nowait(event)
+
+    def close(self):
+        subscribers = _subscribers.get(self.order_id)
+        if subscribers is not None:
+            subscribers.discard(self)
+            if not subscribers:
+                del _subscribers[self.order_id]
+
+
+_subscribers: Dict[int, Set[Subscription]] = {}
+
+
+def subscribe_order(order_id: int) -> Subscription:
+    """訂閱訂單事件（連線結束時 ``close``）"""
+    subscription = Subscription(order_id)
+    _subscribers.setdefault(order_id, set()).add(subscription)
+    return subscription
+
+
+def _deliver(message: str):
+    event = json.loads(message)
+    for subscription in list(_subscribers.get(event["order_id"], ())):
+        subscription.put(event)
+
+
+# ── Backends ────────────────────────────────────────────────
+class MemoryOrderEvents:
+    """In-process delivery (single worker / tests)"""
+
+    async def publish(self, message: str):
+        _deliver(message)
+
+    async def listen(self, on_message):
+        pass  # publish already delivered in this process
+
+
+class RedisOrderEvents:
+    """Pub/sub on one channel; each worker delivers to its own connections"""
+
+    def __init__(self):
+        self.channel = redis_key("order-events")
+
+    async def publish(self, message: str):
+        await get_redis().publish(self.channel, message)
+
+    async def listen(self, on_message):
+        pubsub = get_redis().pubsub()
+        try:
+            await pubsub.subscribe(self.channel)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    on_message(message["data"])
+        finally:
+            await pubsub.aclose()
+
+
+_backend = None
+
+
+def get_order_events():
+    """取得目前設定的訂單事件 backend（singleton）"""
+    global _backend
+    if _backend is None:
+        if settings.ORDER_EVENTS_BACKEND == "memory":
+            _backend = MemoryOrderEvents()
+        else:
+            _backend = RedisOrderEvents()
+    return _backend
+
+
+async def publish_order_events(*states: dict):
+    """交易提交後發佈訂單狀態（失敗只記錄；前端重新連線時會讀到最新狀態）"""
+    backend = get_order_events()
+    for state in states:
+        try:
+            await backend.publish(json.dumps(state))
+        except Exception as exc:
+            logger.warning("order_event_publish_failed", order_id=state["order_id"], error=str(exc))
+
+
+# ── SSE stream ──────────────────────────────────────────────
+def _format(event: dict) -> str:
+    return f"event: order\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def stream_order_events(subscription: Subscription, state: dict) -> AsyncIterator[str]:
+    """SSE 內容：目前狀態，之後每次變更一則；心跳與閒置逾時見模組說明"""
+    loop = asyncio.get_running_loop()
+    try:
+        yield f"retry: {RETRY_MS}\n" + _format(state)
+        idle_until = loop.time() + settings.ORDER_EVENTS_IDLE_TIMEOUT
+        while True:
+            remaining = idle_until - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), min(settings.ORDER_EVENTS_HEARTBEAT, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            yield _format(event)
+            idle_until = loop.time() + settings.ORDER_EVENTS_IDLE_TIMEOUT
+    finally:
+        subscription.close()
+
+
+# ── Pub/sub listener ────────────────────────────────────────
+_listener: Optional[asyncio.Task] = None
+
+
+async def _listen_loop():
+    while True:
+        try:
+            await get_order_events().listen(_deliver)
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.error("order_events_listener_failed", error=str(exc))
+            await asyncio.sleep(1)
+
+
+def start_order_events_listener():
+    """啟動訂單事件訂閱（app lifespan 呼叫）"""
+    global _listener
+    if _listener is None:
+        _listener = asyncio.create_task(_listen_loop())
+
+
+async def stop_order_events_listener():
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        try:
+            await _listener
+        except asyncio.CancelledError:
+            pass
+        _listener = None
@@ -0,0 +1,81 @@
+"""
+Order numbers — collision-free, issued from blocks of a database sequence
+
+``PFS`` + issue date (UTC) + sequence value (≥ 6 digits) + Luhn check digit,
+e.g. ``PFS202610170001237``. The date is informational; uniqueness comes
+from the sequence, so numbers never collide across workers and never make
+checkout fail on the unique index.
+
+Each worker reserves ORDER_NUMBER_BLOCK values with one ``nextval`` (the
+PostgreSQL sequence increments by the block size) and hands them out
+locally, so most orders need no round-trip. Sequences are not
+transactional: a rolled-back checkout burns its number and the block is
+never issued twice. Numbers are monotonic per worker — inserts land at the
+right edge of the unique index.
+
+Other dialects (SQLite in tests) count in-process, single worker only,
+continuing after the newest existing order so a restart never reissues a
+number.
+"""
+
+import asyncio
+from typing import Optional
+
+from sqlalchemy import Sequence, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import Base
+from app.models.order import Order
+from app.utils.helpers import generate_order_number, order_number_sequence
+
+# Must match INCREMENT BY in the order_number_seq migration
+ORDER_NUMBER_BLOCK = 50
+
+ORDER_NUMBER_SEQ = Sequence(
+    "order_number_seq", start=1, increment=ORDER_NUMBER_BLOCK, metadata=Base.metadata
+)
+
+
+class OrderNumberAllocator:
+    """Per-process block of sequence values"""
+
+    def __init__(self, block_size: int = ORDER_NUMBER_BLOCK):
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._local_blocks = 0  # fallback for dialects without sequences
+        self._local_base: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    async def _fetch_block(self, db: AsyncSession) -> int:
+        if db.get_bind().dialect.name == "postgresql":
+            return (await db.execute(select(ORDER_NUMBER_SEQ.next_value()))).scalar_one()
+        if self._local_base is None:
+            newest = await db.scalar(select(Order.order_number).order_by(Order.id.desc()).limit(1))
+            self._local_base = (order_number_sequence(newest) or 0) if newest else 0
+        self._local_blocks += 1
+        return self._local_base + (self._local_blocks - 1) * self.block_size + 1
+
+    async def allocate(self, db: AsyncSession) -> int:
+        async with self._lock:
+            if self._next >= self._end:
+                start = await self._fetch_block(db)
+                self._next, self._end = start, start + self.block_size
+            value = self._next
+            self._next += 1
+            return value
+
+
+_allocator: Optional[OrderNumberAllocator] = None
+
+
+def get_order_number_allocator() -> OrderNumberAllocator:
+    global _allocator
+    if _allocator is None:
+        _allocator = OrderNumberAllocator()
+    return _allocator
+
+
+async def next_order_number(db: AsyncSession) -> str:
+    """取得下一個訂單編號（通常不需查詢資料庫）"""
+    return generate_order_number(await get_order_number_allocator().allocate(db))
@@ -1,47 +1,296 @@
 """
 Pagination utility
+
+Two modes:
+  - offset  : page / per_page, with COUNT(*) for total / total_pages
+  - cursor  : keyset pagination on (sort_column, id); no COUNT, no OFFSET
+
+Cursor mode is used when a ``cursor`` token is passed. Offset responses also
+return ``next_cursor`` / ``prev_cursor`` (when ``sort_column`` is given) so a
+client can switch to cursor mode after the first page.
+
+Totals in offset mode (see ``count_total``):
+  - page 1 always runs an exact COUNT and caches it per filter signature
+  - page 2..N reuse the cached count for PAGINATION_COUNT_TTL seconds
+  - cached counts are tagged with the tables they read (``products``,
+    ``brands``, ...) so catalog writes purge them along with the listings
+  - ``exact=False`` lets large PostgreSQL tables use planner estimates
+    (pg_class.reltuples / EXPLAIN rows); meta.total_exact is then False
 """
 
+import base64
+import binascii
+import hashlib
+import json
 import math
+from datetime import datetime
+from decimal import Decimal
 from typing import Any, List, Optional, Sequence
 
-from sqlalchemy import Select, func, select
+import structlog
+from fastapi import HTTPException, status
+from sqlalchemy import Select, Table, func, inspect, select, text, tuple_
+from sqlalchemy.exc import CompileError, DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.util import find_tables
 
+from app.config import get_settings
 from app.schemas.common import PaginationMeta
+from app.utils.cache import get_cache, make_cache_key
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+
+# ── Cursor tokens ────────────────────────────────────────────
+def encode_cursor(direction: str, sort_key: str, order: str, value: Any, row_id: int) -> str:
+    """Encode an opaque cursor: [direction, sort key, sort order, sort value, id]"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    raw = json.dumps([direction, sort_key, order, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_column, descending: bool = True) -> tuple[str, Any, int]:
+    """
+    Decode a cursor token → (direction, sort value, id)
+
+    A cursor issued for a different sort column or order is rejected rather
+    than silently paging through the wrong ordering.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, sort_key, order, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if (
+            direction not in ("next", "prev")
+            or sort_key != sort_column.key
+            or order != _sort_order(descending)
+        ):
+            raise ValueError(cursor)
+        python_type = sort_column.type.python_type
+        if python_type is datetime:
+            value = datetime.fromisoformat(value)
+        elif python_type is Decimal:
+            value = Decimal(value)
+        return direction, value, int(row_id)
+    except (ValueError, TypeError, binascii.Error, json.JSONDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="無效的分頁游標")
+
+
+def _sort_order(descending: bool) -> str:
+    return "desc" if descending else "asc"
+
+
+async def _fetch(db: AsyncSession, query: Select) -> List[Any]:
+    """ORM entities for select(Model), Row objects for column projections"""
+    result = await db.execute(query)
+    if len(query.column_descriptions) == 1:
+        return list(result.scalars().all())
+    return list(result.all())
+
+
+def _id_column(query: Select):
+    entity = query.column_descriptions[0]["entity"]
+    return inspect(entity).primary_key[0]
+
+
+def _row_cursor(direction: str, item, sort_column, id_column, descending: bool) -> str:
+    return encode_cursor(
+        direction,
+        sort_column.key,
+        _sort_order(descending),
+        getattr(item, sort_column.key),
+        getattr(item, id_column.key),
+    )
+
+
+# ── Counting ─────────────────────────────────────────────────
+def _count_tags(query: Select) -> List[str]:
+    """Cache tags for a count: the names of the tables it reads"""
+    return sorted({table.name for table in find_tables(query) if isinstance(table, Table)})
+
+
+def _count_signature(count_query: Select) -> str:
+    """Stable hash of the COUNT statement + its bound filter values"""
+    compiled = count_query.compile()
+    raw = str(compiled) + json.dumps(compiled.params, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+async def _estimate_count(db: AsyncSession, query: Select) -> Optional[int]:
+    """
+    Planner row estimate (PostgreSQL only); None when unavailable.
+
+    Unfiltered single-table queries read pg_class.reltuples, anything else
+    uses the top-level "Plan Rows" of EXPLAIN. Both run in a savepoint so
+    a failure does not abort the request's transaction.
+    """
+    dialect = db.get_bind().dialect
+    if dialect.name != "postgresql":
+        return None
+
+    try:
+        async with db.begin_nested():
+            froms = query.get_final_froms()
+            if query.whereclause is None and len(froms) == 1 and isinstance(froms[0], Table):
+                result = await db.execute(
+                    text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)"),
+                    {"name": froms[0].name},
+                )
+                estimate = result.scalar()
+                # reltuples is -1 until the table has been vacuumed / analyzed
+                return estimate if estimate is not None and estimate >= 0 else None
+
+            sql = query.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+            result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"])
+    except (CompileError, DBAPIError, KeyError, IndexError, TypeError, ValueError) as exc:
+        logger.warning("count_estimate_failed", error=str(exc))
+        return None
+
+
+async def count_total(
+    db: AsyncSession,
+    query: Select,
+    page: int = 1,
+    exact: bool = True,
+) -> tuple[int, bool]:
+    """
+    計算查詢總筆數
+
+    Returns:
+        (total, is_exact)
+    """
+    query = query.order_by(None)
+    if not exact:
+        estimate = await _estimate_count(db, query)
+        if estimate is not None and estimate >= settings.PAGINATION_ESTIMATE_MIN_ROWS:
+            return estimate, False
+
+    count_query = select(func.count()).select_from(query.subquery())
+    cache = get_cache()
+    key = make_cache_key("pagination:count", sig=_count_signature(count_query))
+
+    # Page 1 refreshes the cached count; later pages of the same listing reuse it
+    if page > 1:
+        cached = await cache.get(key)
+        if cached is not None:
+            return cached, True
+
+    total = (await db.execute(count_query)).scalar() or 0
+    await cache.set(key, total, settings.PAGINATION_COUNT_TTL, _count_tags(query))
+    return total, True
 
 
+# ── Paginate ─────────────────────────────────────────────────
 async def paginate(
     db: AsyncSession,
     query: Select,
     page: int = 1,
     per_page: int = 20,
+    cursor: Optional[str] = None,
+    sort_column=None,
+    descending: bool = True,
+    exact: bool = True,
 ) -> tuple[Sequence[Any], PaginationMeta]:
     """
     執行分頁查詢
 
+    When ``sort_column`` is given the query is ordered by
+    (sort_column, id) here — callers must not add their own ORDER BY —
+    and cursor mode becomes available. ``exact=False`` allows an
+    estimated total on large tables.
+
     Returns:
         (items, meta)
     """
+    if sort_column is None:
+        return await _paginate_offset(db, query, page, per_page, exact)
+
+    id_column = _id_column(query)
+    if cursor:
+        return await _paginate_cursor(db, query, per_page, cursor, sort_column, id_column, descending)
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    items, meta = await _paginate_offset(db, query, page, per_page, exact)
+    if items:
+        has_next = page * per_page < meta.total if meta.total_exact else len(items) == per_page
+        if has_next:
+            meta.next_cursor = _row_cursor("next", items[-1], sort_column, id_column, descending)
+        if page > 1:
+            meta.prev_cursor = _row_cursor("prev", items[0], sort_column, id_column, descending)
+    return items, meta
+
+
+async def _paginate_offset(
+    db: AsyncSession,
+    query: Select,
+    page: int,
+    per_page: int,
+    exact: bool = True,
+) -> tuple[Sequence[Any], PaginationMeta]:
     # Count total
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
+    total, total_exact = await count_total(db, query, page, exact)
 
     # Calculate pagination
     total_pages = math.ceil(total / per_page) if per_page > 0 else 0
     offset = (page - 1) * per_page
 
     # Fetch items
-    paginated_query = query.offset(offset).limit(per_page)
-    result = await db.execute(paginated_query)
-    items = result.scalars().all()
+    items = await _fetch(db, query.offset(offset).limit(per_page))
 
     meta = PaginationMeta(
         page=page,
         per_page=per_page,
         total=total,
         total_pages=total_pages,
+        total_exact=total_exact,
     )
 
     return items, meta
+
+
+async def _paginate_cursor(
+    db: AsyncSession,
+    query: Select,
+    per_page: int,
+    cursor: str,
+    sort_column,
+    id_column,
+    descending: bool,
+) -> tuple[Sequence[Any], PaginationMeta]:
+    direction, value, row_id = decode_cursor(cursor, sort_column, descending)
+
+    # Walking backwards flips both the comparison and the ORDER BY
+    forward = direction == "next"
+    take_lower = descending == forward
+    key = tuple_(sort_column, id_column)
+    query = query.where(key < tuple_(value, row_id) if take_lower else key > tuple_(value, row_id))
+    if take_lower:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    # Fetch one extra row to know whether another page exists
+    items = await _fetch(db, query.limit(per_page + 1))
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if not forward:
+        items.reverse()
+
+    meta = PaginationMeta(per_page=per_page, total=None, total_pages=None)
+    if items:
+        if has_more or not forward:
+            meta.next_cursor = _row_cursor("next", items[-1], sort_column, id_column, descending)
+        if has_more or forward:
+            meta.prev_cursor = _row_cursor("prev", items[0], sort_column, id_column, descending)
+    return items, meta
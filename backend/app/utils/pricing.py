@@ -0,0 +1,269 @@
+"""
+Pricing — one Decimal quote shared by GET /cart, POST /cart/coupon and checkout
+
+``quote_cart`` prices a cart store snapshot (app.utils.cart_store) against
+the shared product cards (app.utils.product_cards) in a single pass:
+
+    lines     unit price (sale_price or price) × qty per active product
+    subtotal  Σ line totals
+    coupon    percentage / fixed on the eligible lines (applicable_products /
+              applicable_categories), capped by max_discount and the eligible total;
+              terms come from the coupon snapshot (app.utils.coupons)
+    points    POINTS_REDEEM_RATE per point, never more than what is left to pay
+    credits   NT$1 each, same cap
+    shipping  method fee, free from its free_threshold (on the subtotal);
+              methods come from the checkout config snapshot
+    total     subtotal − coupon − points − credits + shipping
+
+Everything is ``Decimal`` rounded half-up to cents; floats only appear when
+a response is rendered.
+
+Quotes are memoized in the cache backend (PRICING_QUOTE_TTL) under
+(user, cart version, price-book version, coupon, shipping, points, credits):
+
+  - cart version       the store's per-cart version (changes on every write)
+  - price-book version versions of the ``products`` / ``coupons`` /
+                       ``shipping-methods`` cache tags, bumped by admin writes
+
+``Quote.quote_id`` identifies that key, so checkout can insist on the exact
+quote the customer was shown (``OrderCreate.quote_id``) and fail with 409
+instead of charging a different amount.
+"""
+
+import hashlib
+from dataclasses import asdict, dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+from math import ceil
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.utils.cache import get_cache
+from app.utils.cart_store import CartSnapshot
+from app.utils.checkout_config import get_checkout_config
+from app.utils.coupons import CouponTerms, find_coupon
+from app.utils.product_cards import load_cards
+
+settings = get_settings()
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+PRICE_BOOK_TAGS = ("products", "coupons", "shipping-methods")
+
+
+def money(value) -> Decimal:
+    """Numeric / float / int → Decimal rounded to cents"""
+    if value is None:
+        return ZERO
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def unit_price(card: dict) -> Decimal:
+    """售價（有特價用特價）"""
+    return money(card["sale_price"] or card["price"])
+
+
+# ── Quote ───────────────────────────────────────────────────
+@dataclass(frozen=True)
+class PricedLine:
+    """One cart line as priced"""
+
+    item_id: int
+    product_id: int
+    variant_id: Optional[int]
+    quantity: int
+    unit_price: Decimal = ZERO
+    line_total: Decimal = ZERO
+
+
+@dataclass(frozen=True)
+class Quote:
+    quote_id: str
+    lines: Tuple[PricedLine, ...]
+    unavailable: Tuple[int, ...]  # cart item ids whose product is missing / inactive
+    subtotal: Decimal
+    coupon_code: Optional[str] = None
+    coupon_discount: Decimal = ZERO
+    points_used: int = 0
+    points_discount: Decimal = ZERO
+    credits_used: int = 0
+    shipping_fee: Decimal = ZERO
+    total: Decimal = ZERO
+    extra: Dict[str, str] = field(default_factory=dict)  # coupon terms for display
+
+    def to_cache(self) -> dict:
+        return _stringify(asdict(self))
+
+    @classmethod
+    def from_cache(cls, data: dict) -> "Quote":
+        lines = tuple(
+            PricedLine(**{**line, "unit_price": Decimal(line["unit_price"]), "line_total": Decimal(line["line_total"])})
+            for line in data["lines"]
+        )
+        money_fields = ("subtotal", "coupon_discount", "points_discount", "shipping_fee", "total")
+        return cls(**{
+            **data,
+            **{name: Decimal(data[name]) for name in money_fields},
+            "lines": lines,
+            "unavailable": tuple(data["unavailable"]),
+        })
+
+
+def _stringify(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, dict):
+        return {k: _stringify(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_stringify(v) for v in value]
+    return value
+
+
+# ── Versions ────────────────────────────────────────────────
+async def price_book_version() -> Optional[str]:
+    """None while the versions are unavailable (quotes are then not memoized)"""
+    versions = await get_cache().get_versions(*PRICE_BOOK_TAGS)
+    return ".".join(str(v) for v in versions) if versions is not None else None
+
+
+# ── Pricing ─────────────────────────────────────────────────
+def _coupon_eligible(coupon: CouponTerms, card: dict) -> bool:
+    if coupon.applicable_products and card["id"] not in coupon.applicable_products:
+        return False
+    if coupon.applicable_categories and card["category_id"] not in coupon.applicable_categories:
+        return False
+    return True
+
+
+def coupon_discount(coupon: CouponTerms, usable: bool, subtotal: Decimal, eligible_total: Decimal) -> Decimal:
+    """
+    優惠券折抵金額；不符合使用條件時丟出 400
+
+    ``subtotal`` is checked against min_order_amount, the discount itself
+    only applies to ``eligible_total``.
+    """
+    if not usable:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="優惠券已失效或過期")
+    minimum = money(coupon.min_order_amount)
+    if minimum and subtotal < minimum:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"訂單金額需滿 ${minimum:,.0f} 才能使用此優惠券",
+        )
+    if eligible_total <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="購物車中沒有適用此優惠券的商品")
+
+    if coupon.discount_type == "percentage":
+        discount = money(eligible_total * money(coupon.discount_value) / 100)
+        if coupon.max_discount:
+            discount = min(discount, money(coupon.max_discount))
+    else:
+        discount = money(coupon.discount_value)
+    return min(discount, eligible_total)
+
+
+def _redeemable(requested: int, unit_value: Decimal, remaining: Decimal) -> Tuple[int, Decimal]:
+    """(units actually used, their value) — never more than what is left to pay"""
+    if requested <= 0 or remaining <= 0 or unit_value <= 0:
+        return 0, ZERO
+    used = min(requested, ceil(remaining / unit_value))
+    return used, min(money(used * unit_value), remaining)
+
+
+async def _price(
+    db: AsyncSession,
+    quote_id: str,
+    cart: CartSnapshot,
+    cards: Dict[int, dict],
+    coupon_code: Optional[str],
+    shipping_method: Optional[str],
+    points: int,
+    credits: int,
+) -> Quote:
+    available = [line for line in cart.lines if (c := cards.get(line.product_id)) is not None and c["is_active"]]
+    available_ids = {line.item_id for line in available}
+    unavailable = tuple(line.item_id for line in cart.lines if line.item_id not in available_ids)
+
+    # Per-line evaluation in one pass: unit prices, line totals, coupon eligibility
+    unit_prices = [unit_price(cards[line.product_id]) for line in available]
+    priced = tuple(
+        PricedLine(line.item_id, line.product_id, line.variant_id, line.quantity, unit, unit * line.quantity)
+        for line, unit in zip(available, unit_prices)
+    )
+    subtotal = sum((line.line_total for line in priced), ZERO)
+
+    code, discount, extra = None, ZERO, {}
+    if coupon_code:
+        coupon, usable = await find_coupon(db, coupon_code)
+        if coupon is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="優惠券不存在")
+        eligible = sum(
+            (line.line_total for line in priced if _coupon_eligible(coupon, cards[line.product_id])), ZERO
+        )
+        code, discount = coupon.code, coupon_discount(coupon, usable, subtotal, eligible)
+        extra = {"discount_type": coupon.discount_type, "discount_value": str(money(coupon.discount_value))}
+
+    config = await get_checkout_config(db)
+    shipping_fee = money(config.shipping_fee(shipping_method, subtotal))
+
+    remaining = subtotal - discount + shipping_fee
+    points_used, points_discount = _redeemable(points, money(config.points_redeem_rate), remaining)
+    remaining -= points_discount
+    credits_used, credits_discount = _redeemable(credits, Decimal(1), remaining)
+    remaining -= credits_discount
+
+    return Quote(
+        quote_id=quote_id,
+        lines=priced,
+        unavailable=unavailable,
+        subtotal=subtotal,
+        coupon_code=code,
+        coupon_discount=discount,
+        points_used=points_used,
+        points_discount=points_discount,
+        credits_used=credits_used,
+        shipping_fee=shipping_fee,
+        total=max(remaining, ZERO),
+        extra=extra,
+    )
+
+
+async def quote_cart(
+    db: AsyncSession,
+    cart: CartSnapshot,
+    *,
+    cards: Optional[Dict[int, dict]] = None,
+    coupon_code: Optional[str] = None,
+    shipping_method: Optional[str] = None,
+    points: int = 0,
+    credits: int = 0,
+) -> Quote:
+    """
+    計算購物車報價（memoized）
+
+    ``cards`` are the cart's product cards when the caller has them anyway;
+    otherwise they are loaded (shared cache) on a quote cache miss.
+    """
+    coupon_code = coupon_code.upper() if coupon_code else None
+    book = await price_book_version()
+    key = (
+        f"pricing:quote:{cart.user_id}:{cart.version}:{book or '-'}"
+        f":{coupon_code or ''}:{shipping_method or ''}:{points}:{credits}"
+    )
+    cache = get_cache()
+    if book is not None:
+        hit = await cache.get(key)
+        if hit is not None:
+            return Quote.from_cache(hit)
+
+    if cards is None:
+        cards = await load_cards(db, (line.product_id for line in cart.lines))
+    quote_id = hashlib.sha1(key.encode()).hexdigest()[:16]
+    quote = await _price(db, quote_id, cart, cards, coupon_code, shipping_method, points, credits)
+    if book is not None:
+        await cache.set(key, quote.to_cache(), settings.PRICING_QUOTE_TTL, PRICE_BOOK_TAGS)
+    return quote
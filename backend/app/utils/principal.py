@@ -0,0 +1,97 @@
+"""
+Principal cache — authenticated user snapshot for get_current_user
+
+Resolving a bearer token used to cost ``SELECT * FROM users WHERE id = ?`` on
+every authenticated request. The dependencies now return a ``Principal``: a
+slotted snapshot of the columns requests actually read (id, role, is_active,
+points / credits balances), cached per user id for PRINCIPAL_CACHE_TTL
+seconds in the response cache backend (tag ``user:{id}``).
+
+Writers that change a user (profile, password, role / status, balances) call
+``invalidate_principal`` after commit; the TTL bounds staleness for anything
+that slips through. Handlers that mutate the user load an attached ORM
+instance with ``load_user``.
+"""
+
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.user import User
+from app.utils.cache import get_cache
+
+settings = get_settings()
+
+
+class Principal:
+    """Read-only snapshot of the authenticated user"""
+
+    __slots__ = ("id", "email", "role", "is_active", "points", "credits")
+
+    def __init__(self, id: int, email: str, role: str, is_active: bool, points: int, credits: int):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.is_active = is_active
+        self.points = points
+        self.credits = credits
+
+    @classmethod
+    def from_row(cls, row) -> "Principal":
+        return cls(row.id, row.email, row.role, row.is_active, row.points or 0, row.credits or 0)
+
+    def to_list(self) -> list:
+        return [self.id, self.email, self.role, self.is_active, self.points, self.credits]
+
+    @classmethod
+    def from_list(cls, value: list) -> "Principal":
+        return cls(*value)
+
+    def __repr__(self) -> str:
+        return f"Principal(id={self.id}, role={self.role!r})"
+
+
+def _key(user_id: int) -> str:
+    return f"principal:{user_id}"
+
+
+async def get_principal(db: AsyncSession, user_id: int) -> Optional[Principal]:
+    """取得使用者快照（快取 → 資料庫），不存在回傳 None"""
+    cache = get_cache()
+    cached = await cache.get(_key(user_id))
+    if cached is not None:
+        return Principal.from_list(cached)
+
+    result = await db.execute(
+        select(User.id, User.email, User.role, User.is_active, User.points, User.credits)
+        .where(User.id == user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+
+    principal = Principal.from_row(row)
+    await cache.set(
+        _key(user_id), principal.to_list(), settings.PRINCIPAL_CACHE_TTL, tags=[f"user:{user_id}"]
+    )
+    return principal
+
+
+async def invalidate_principal(*user_ids: int):
+    """使用者資料變更後丟棄快照（請於 commit 後呼叫，例如 BackgroundTasks）"""
+    await get_cache().invalidate_tags(*(f"user:{user_id}" for user_id in user_ids))
+
+
+async def load_user(db: AsyncSession, principal: Principal, for_update: bool = False) -> User:
+    """取得 session 內的 User ORM 實體（需要修改使用者時使用）"""
+    query = select(User).where(User.id == principal.id)
+    if for_update:
+        query = query.with_for_update()
+    result = await db.execute(query)
+    user = result.scalar_one_or_none()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="使用者不存在")
+    return user
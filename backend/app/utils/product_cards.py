@@ -0,0 +1,117 @@
+"""
+Product cards — column-projected listing queries
+
+Listing endpoints only need a handful of product columns plus the brand /
+category name and the first image. ``product_card_query`` selects exactly
+those in one statement (outer joins + a correlated ``LIMIT 1`` image
+subquery) and ``serialize_card`` maps the result rows straight to dicts,
+so no ORM Product instances or selectinload round-trips are involved.
+
+``load_cards`` serves the same cards by id from the shared cache
+(``product-card:{id}``, tagged ``product:{id}`` so admin writes and stock
+changes purge them) and fetches only the misses, in one query.
+"""
+
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.brand import Brand
+from app.models.category import Category
+from app.models.product import Product, ProductImage
+from app.utils.cache import get_cache
+
+settings = get_settings()
+
+
+def primary_image_url():
+    """Correlated subquery: first image by (sort_order, id)"""
+    return (
+        select(ProductImage.url)
+        .where(ProductImage.product_id == Product.id)
+        .order_by(ProductImage.sort_order.asc(), ProductImage.id.asc())
+        .limit(1)
+        .correlate(Product)
+        .scalar_subquery()
+    )
+
+
+def card_columns(id_label: str = "id") -> List[Any]:
+    """Columns of a product card; Product.id is labelled ``id_label``"""
+    return [
+        Product.id.label(id_label),
+        Product.name,
+        Product.slug,
+        Product.price,
+        Product.sale_price,
+        Product.avg_rating,
+        Product.review_count,
+        Product.sold_count,
+        Product.is_new,
+        Product.is_featured,
+        Product.is_active,
+        Product.stock,
+        Brand.name.label("brand_name"),
+        Category.name.label("category_name"),
+        primary_image_url().label("primary_image"),
+    ]
+
+
+def with_card_joins(query: Select) -> Select:
+    """LEFT JOIN brands / categories for the card name columns"""
+    return query.outerjoin(Brand, Brand.id == Product.brand_id).outerjoin(
+        Category, Category.id == Product.category_id
+    )
+
+
+def product_card_query(*extra_columns) -> Select:
+    """SELECT card columns (+ extra, e.g. sort keys) FROM products"""
+    return with_card_joins(
+        select(*card_columns(), *extra_columns).select_from(Product)
+    )
+
+
+def serialize_card(row) -> dict:
+    """Row → product card dict"""
+    return {
+        "id": row.id,
+        "name": row.name,
+        "slug": row.slug,
+        "price": float(row.price),
+        "sale_price": float(row.sale_price) if row.sale_price else None,
+        "brand_name": row.brand_name,
+        "category_name": row.category_name,
+        "primary_image": row.primary_image,
+        "avg_rating": row.avg_rating,
+        "review_count": row.review_count,
+        "sold_count": row.sold_count,
+        "is_new": row.is_new,
+        "is_featured": row.is_featured,
+        "stock": row.stock,
+    }
+
+
+async def load_cards(db: AsyncSession, product_ids: Iterable[int]) -> Dict[int, dict]:
+    """
+    Product cards by id (shared cache, one query for the misses)
+
+    Cards carry ``is_active`` and ``category_id`` on top of ``serialize_card``
+    so carts can be priced from them; missing products are simply absent.
+    """
+    ids = sorted(set(product_ids))
+    if not ids:
+        return {}
+    cache = get_cache()
+    hits = await cache.get_many([f"product-card:{pid}" for pid in ids])
+    cards = {pid: card for pid, card in zip(ids, hits) if card is not None}
+
+    missing = [pid for pid in ids if pid not in cards]
+    if missing:
+        result = await db.execute(product_card_query(Product.category_id).where(Product.id.in_(missing)))
+        for row in result.all():
+            card = {**serialize_card(row), "is_active": row.is_active, "category_id": row.category_id}
+            cards[row.id] = card
+            await cache.set(f"product-card:{row.id}", card, settings.CACHE_DEFAULT_TTL, [f"product:{row.id}"])
+    return cards
@@ -0,0 +1,249 @@
+"""
+Rate limiting — GCRA (generic cell rate algorithm) over the RATE_LIMIT_* settings
+
+A limit such as ``"5/minute"`` allows bursts of up to 5 requests and then one
+request every 12 s (a sliding window without per-request bookkeeping). Each
+key stores a single "theoretical arrival time", updated atomically:
+  - RedisRateLimiter  : Lua script, server clock (RATE_LIMIT_BACKEND=redis)
+  - MemoryRateLimiter : per-process dict (single node / tests)
+
+Enforcement:
+  - app.middleware.rate_limit — RATE_LIMIT_API for every /api/v1 request,
+    per user (valid bearer token) or per client IP
+  - ``rate_limit(...)`` dependency — tighter per-route limits (login,
+    register, search); declared in the route decorator so it runs before the
+    DB session dependency
+
+Backend errors fail open: an unavailable Redis must not take the API down.
+"""
+
+import ipaddress
+import math
+import re
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional
+
+import structlog
+from fastapi import HTTPException, Request, Response, status
+from jose import JWTError, jwt
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.utils.redis_client import get_redis, redis_key
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_RATE_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+
+
+@dataclass(frozen=True)
+class Rate:
+    limit: int
+    period: float  # seconds
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.limit
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds until the next request is allowed (0 if allowed)
+    reset_after: float  # seconds until the bucket is full again
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+@lru_cache(maxsize=32)
+def parse_rate(value: str) -> Rate:
+    """Parse ``"100/minute"``, ``"3/hour"``, ``"10/5minutes"``"""
+    match = _RATE_RE.match(value.lower())
+    if not match:
+        raise ValueError(f"Invalid rate limit: {value!r}")
+    count, multiplier, unit = match.groups()
+    if int(count) <= 0:
+        raise ValueError(f"Invalid rate limit: {value!r}")
+    return Rate(int(count), int(multiplier or 1) * _PERIODS[unit])
+
+
+def _gcra(tat: float, now: float, rate: Rate) -> tuple:
+    """Returns (result, new tat or None when rejected)"""
+    tat = max(tat, now)
+    new_tat = tat + rate.interval
+    allow_at = new_tat - rate.period
+    if allow_at > now:
+        return RateLimitResult(False, rate.limit, 0, allow_at - now, tat - now), None
+    remaining = int((now - allow_at) // rate.interval)
+    return RateLimitResult(True, rate.limit, remaining, 0.0, new_tat - now), new_tat
+
+
+class MemoryRateLimiter:
+    """In-process GCRA state"""
+
+    def __init__(self):
+        self._tat: Dict[str, float] = {}
+
+    async def hit(self, key: str, rate: Rate) -> RateLimitResult:
+        now = time.monotonic()
+        result, new_tat = _gcra(self._tat.get(key, now), now, rate)
+        if new_tat is not None:
+            self._tat[key] = new_tat
+        if len(self._tat) > 100000:
+            self._tat = {k: v for k, v in self._tat.items() if v > now}
+        return result
+
+    async def clear(self):
+        self._tat.clear()
+
+
+# KEYS[1] = bucket key; ARGV = interval_ms, period_ms
+# Returns {allowed, remaining, retry_after_ms, reset_after_ms}
+_GCRA_LUA = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if allow_at > now then
+  return {0, 0, allow_at - now, tat - now}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, math.floor((now - allow_at) / interval), 0, new_tat - now}
+"""
+
+
+class RedisRateLimiter:
+    """Shared GCRA state — one key per bucket, updated by a Lua script"""
+
+    def __init__(self):
+        self._script = None
+
+    async def hit(self, key: str, rate: Rate) -> RateLimitResult:
+        if self._script is None:
+            self._script = get_redis().register_script(_GCRA_LUA)
+        allowed, remaining, retry_ms, reset_ms = await self._script(
+            keys=[redis_key("ratelimit", key)],
+            args=[int(rate.interval * 1000), int(rate.period * 1000)],
+        )
+        return RateLimitResult(bool(allowed), rate.limit, int(remaining), retry_ms / 1000, reset_ms / 1000)
+
+    async def clear(self):
+        client = get_redis()
+        async for key in client.scan_iter(match=redis_key("ratelimit", "*")):
+            await client.delete(key)
+
+
+_limiter = None
+
+
+def get_rate_limiter():
+    """取得目前設定的限流後端（singleton）"""
+    global _limiter
+    if _limiter is None:
+        if settings.RATE_LIMIT_BACKEND == "memory":
+            _limiter = MemoryRateLimiter()
+        else:
+            _limiter = RedisRateLimiter()
+    return _limiter
+
+
+async def hit(key: str, rate: str) -> Optional[RateLimitResult]:
+    """Consume one request from ``key``'s bucket; None when limiting is off / unavailable"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    try:
+        return await get_rate_limiter().hit(key, parse_rate(rate))
+    except RedisError as exc:
+        logger.warning("rate_limit_unavailable", key=key, error=str(exc))
+        return None
+
+
+# ── Identity ────────────────────────────────────────────────
+@lru_cache(maxsize=1)
+def _trusted_networks(proxies: tuple) -> tuple:
+    return tuple(ipaddress.ip_network(p, strict=False) for p in proxies)
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_networks(tuple(settings.TRUSTED_PROXIES)))
+
+
+def client_ip(headers: Dict[str, str], client: Optional[tuple]) -> str:
+    """
+    Client IP for limiting.
+
+    X-Forwarded-For is only honoured when the peer is one of TRUSTED_PROXIES;
+    hops are then read right to left, skipping our own proxies, and the first
+    other address is the client. Anything left of it is client-controlled.
+    """
+    peer = client[0] if client else "unknown"
+    forwarded = headers.get("x-forwarded-for")
+    if not forwarded or not _is_trusted_proxy(peer):
+        return peer
+    for hop in reversed([h.strip() for h in forwarded.split(",") if h.strip()]):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return peer
+
+
+def token_subject(authorization: Optional[str], admin: bool = False) -> Optional[str]:
+    """User id from a *validly signed* bearer token (no DB, no revocation check)"""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    secret = settings.ADMIN_JWT_SECRET_KEY if admin else settings.JWT_SECRET_KEY
+    try:
+        payload = jwt.decode(authorization[7:], secret, algorithms=[settings.JWT_ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
+# ── Per-route dependency ────────────────────────────────────
+def rate_limit(setting: str, per: str = "ip"):
+    """
+    Route dependency enforcing ``settings.<setting>`` per client IP
+    (``per="ip"``) or per authenticated user, falling back to IP
+    (``per="user"``). Use it in the decorator: ``dependencies=[Depends(...)]``.
+    """
+
+    async def check_rate_limit(request: Request, response: Response):
+        identity = None
+        if per == "user":
+            subject = token_subject(request.headers.get("authorization"))
+            identity = f"user:{subject}" if subject else None
+        identity = identity or f"ip:{client_ip(request.headers, request.client)}"
+
+        result = await hit(f"{setting.lower()}:{request.url.path}:{identity}", getattr(settings, setting))
+        if result is None:
+            return
+        if not result.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="請求過於頻繁，請稍後再試",
+                headers=result.headers(),
+            )
+        response.headers.update(result.headers())
+
+    return check_rate_limit
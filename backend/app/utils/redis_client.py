@@ -0,0 +1,34 @@
+"""
+Redis client — shared async connection pool
+"""
+
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from app.config import get_settings
+
+settings = get_settings()
+
+_client: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> aioredis.Redis:
+    """取得共用的 Redis client（lazy 建立連線池）"""
+    global _client
+    if _client is None:
+        _client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+
+def redis_key(*parts) -> str:
+    """Build a namespaced key: REDIS_PREFIX + parts joined by ':'"""
+    return settings.REDIS_PREFIX + ":".join(str(p) for p in parts)
+
+
+async def close_redis():
+    """關閉 Redis 連線池"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
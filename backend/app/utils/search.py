@@ -0,0 +1,236 @@
+"""
+Product search — CJK-aware tokenizer, search documents and ranked queries
+
+Each product has a ProductSearchDocument holding pre-tokenized text:
+  - latin words / numbers are kept whole (prefix-matched at query time)
+  - CJK runs are split into unigrams + overlapping bigrams, so 「洋芋片」
+    matches 「洋芋」 and 「芋片」 without a Chinese dictionary
+
+On PostgreSQL the three token columns form a weighted tsvector
+(name A / brand·category·tags B / descriptions D) covered by a GIN index
+(see migration 5b2e8c1d9f4a); results are ranked by ts_rank blended with
+sold_count. Other dialects (SQLite in tests) fall back to LIKE matching.
+
+Documents are rebuilt in the same transaction as the write that changes
+them: ``index_product`` on product writes, and a flush hook for brand /
+category renames (the names are part of every affected product's keywords).
+"""
+
+import re
+import unicodedata
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    Select, and_, bindparam, case, event, false, func, inspect, literal, literal_column, or_, select, update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.brand import Brand
+from app.models.category import Category
+from app.models.product import Product
+from app.models.search import ProductSearchDocument
+
+settings = get_settings()
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"  # kana, CJK ideographs, hangul
+_SEGMENT_RE = re.compile(rf"[{_CJK}]+|[0-9a-z\u00c0-\u024f]+")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+
+
+# ── Tokenizer ────────────────────────────────────────────────
+def _segments(text: Optional[str]) -> List[str]:
+    normalized = unicodedata.normalize("NFKC", text or "").lower()
+    return _SEGMENT_RE.findall(normalized)
+
+
+def _bigrams(segment: str) -> List[str]:
+    return [segment[i:i + 2] for i in range(len(segment) - 1)]
+
+
+def _unique(tokens: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(tokens))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Document tokens: latin words as-is, CJK runs as unigrams + bigrams"""
+    tokens: List[str] = []
+    for segment in _segments(text):
+        if _CJK_RE.match(segment):
+            tokens.extend(segment)
+            tokens.extend(_bigrams(segment))
+        else:
+            tokens.append(segment)
+    return _unique(tokens)
+
+
+def query_terms(q: str) -> List[Tuple[str, bool]]:
+    """
+    Query terms as (token, is_prefix).
+
+    CJK runs become bigrams (a single character stays a unigram) and must all
+    match; latin words are prefix-matched so "choc" finds "chocolate".
+    """
+    terms: List[Tuple[str, bool]] = []
+    for segment in _segments(q):
+        if not _CJK_RE.match(segment):
+            terms.append((segment, True))
+        elif len(segment) == 1:
+            terms.append((segment, False))
+        else:
+            terms.extend((gram, False) for gram in _bigrams(segment))
+    return _unique(terms)
+
+
+def _join(tokens: Iterable[str]) -> str:
+    # Padded with spaces so the LIKE fallback can match whole tokens
+    joined = " ".join(tokens)
+    return f" {joined} " if joined else ""
+
+
+# ── Documents ────────────────────────────────────────────────
+def build_document(
+    product: Product,
+    brand_name: Optional[str] = None,
+    category_name: Optional[str] = None,
+) -> dict:
+    """Token columns for a product's search document"""
+    keywords = [brand_name, category_name, *(product.tags or [])]
+    return {
+        "title_tokens": _join(tokenize(product.name)),
+        "keyword_tokens": _join(tokenize(" ".join(str(k) for k in keywords if k))),
+        "body_tokens": _join(tokenize(f"{product.short_description or ''} {product.description or ''}")),
+    }
+
+
+async def index_product(db: AsyncSession, product: Product) -> ProductSearchDocument:
+    """建立或更新單一商品的搜尋文件（與商品寫入同一交易）"""
+    brand_name = None
+    if product.brand_id:
+        brand_name = await db.scalar(select(Brand.name).where(Brand.id == product.brand_id))
+    category_name = None
+    if product.category_id:
+        category_name = await db.scalar(select(Category.name).where(Category.id == product.category_id))
+
+    doc = await db.get(ProductSearchDocument, product.id)
+    if doc is None:
+        doc = ProductSearchDocument(product_id=product.id)
+        db.add(doc)
+    for field, value in build_document(product, brand_name, category_name).items():
+        setattr(doc, field, value)
+    return doc
+
+
+async def reindex_products(db: AsyncSession) -> int:
+    """重建所有商品的搜尋文件（seed / 資料修復用）"""
+    result = await db.execute(select(Product))
+    products = result.scalars().all()
+    for product in products:
+        await index_product(db, product)
+    await db.flush()
+    return len(products)
+
+
+def _renamed_ids(session: Session, model) -> List[int]:
+    return [
+        obj.id for obj in session.dirty
+        if isinstance(obj, model) and inspect(obj).attrs.name.history.has_changes()
+    ]
+
+
+@event.listens_for(Session, "after_flush")
+def _reindex_renamed(session: Session, flush_context):
+    """Rebuild documents of products whose brand or category was renamed"""
+    brand_ids = _renamed_ids(session, Brand)
+    category_ids = _renamed_ids(session, Category)
+    if not brand_ids and not category_ids:
+        return
+
+    rows = session.connection().execute(
+        select(
+            Product.id, Product.name, Product.short_description, Product.description, Product.tags,
+            Brand.name.label("brand_name"), Category.name.label("category_name"),
+        )
+        .outerjoin(Brand, Brand.id == Product.brand_id)
+        .outerjoin(Category, Category.id == Product.category_id)
+        .where(or_(Product.brand_id.in_(brand_ids), Product.category_id.in_(category_ids)))
+    ).all()
+    if not rows:
+        return
+
+    table = ProductSearchDocument.__table__
+    session.connection().execute(
+        update(table).where(table.c.product_id == bindparam("doc_id")),
+        [
+            {"doc_id": row.id, **build_document(row, row.brand_name, row.category_name)}
+            for row in rows
+        ],
+    )
+
+
+# ── Queries ──────────────────────────────────────────────────
+def search_vector():
+    """
+    Weighted tsvector over the token columns.
+
+    Constants are inlined so the expression matches the GIN index
+    ``ix_product_search_documents_vector`` exactly.
+    """
+    simple = literal_column("'simple'::regconfig")
+    parts = [
+        (ProductSearchDocument.title_tokens, "A"),
+        (ProductSearchDocument.keyword_tokens, "B"),
+        (ProductSearchDocument.body_tokens, "D"),
+    ]
+    vectors = [
+        func.setweight(func.to_tsvector(simple, column), literal_column(f"'{weight}'"))
+        for column, weight in parts
+    ]
+    return vectors[0].op("||")(vectors[1]).op("||")(vectors[2])
+
+
+def _tsquery(terms: List[Tuple[str, bool]]) -> str:
+    return " & ".join(f"{token}:*" if prefix else token for token, prefix in terms)
+
+
+def _like(column, token: str, prefix: bool):
+    return column.like(f"% {token}%" if prefix else f"% {token} %")
+
+
+def search_products_query(q: str, dialect_name: str, base: Optional[Select] = None) -> Select:
+    """
+    Active products matching every query term, best match first.
+
+    ``base`` selects the output columns (default ``select(Product)``).
+    """
+    terms = query_terms(q)
+    query = (
+        (base if base is not None else select(Product))
+        .join(ProductSearchDocument, ProductSearchDocument.product_id == Product.id)
+        .where(Product.is_active.is_(True))
+    )
+    if not terms:
+        return query.where(false())
+
+    if dialect_name == "postgresql":
+        vector = search_vector()
+        tsquery = func.to_tsquery(literal_column("'simple'::regconfig"), _tsquery(terms))
+        popularity = 1 + settings.SEARCH_POPULARITY_WEIGHT * func.ln(1 + Product.sold_count)
+        score = func.ts_rank(vector, tsquery) * popularity
+        return query.where(vector.op("@@")(tsquery)).order_by(score.desc(), Product.id.desc())
+
+    # Fallback: whole-token LIKE matching, name hits weigh more than keyword / body hits
+    doc = ProductSearchDocument
+    everything = doc.title_tokens + doc.keyword_tokens + doc.body_tokens
+    conditions = [_like(everything, token, prefix) for token, prefix in terms]
+    score = literal(0)
+    for token, prefix in terms:
+        score = score + case(
+            (_like(doc.title_tokens, token, prefix), 3),
+            (_like(doc.keyword_tokens, token, prefix), 2),
+            else_=1,
+        )
+    return query.where(and_(*conditions)).order_by(
+        score.desc(), Product.sold_count.desc(), Product.id.desc()
+    )
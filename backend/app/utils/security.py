@@ -1,19 +1,46 @@
 """
 Security utilities — JWT token creation/verification, password hashing
+
+bcrypt is CPU-bound (~250 ms per call at the production cost), so request
+handlers use the ``*_async`` variants, which run in a bounded thread pool
+(bcrypt releases the GIL) and shed load with 503 once
+PASSWORD_HASH_MAX_PENDING calls are queued. The synchronous functions remain
+for seeds, scripts and tests.
+
+The work factor is calibrated at startup to BCRYPT_TARGET_MS on the current
+hardware; hashes below it are upgraded on the next successful login.
 """
 
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
+from uuid import uuid4
 
+import structlog
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.config import get_settings
 
 settings = get_settings()
+logger = structlog.get_logger()
+
+
+def _make_context(rounds: int) -> CryptContext:
+    # min_rounds only affects needs_update(): older, cheaper hashes still verify
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+    )
+
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = _make_context(settings.BCRYPT_ROUNDS)
 
 
 def hash_password(password: str) -> str:
@@ -26,6 +53,92 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# ── Async hashing (off the event loop) ──────────────────────
+_executor: Optional[ThreadPoolExecutor] = None
+_pending = 0
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash"
+        )
+    return _executor
+
+
+async def _run(func, *args):
+    global _pending
+    if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="系統忙碌中，請稍後再試",
+            headers={"Retry-After": "1"},
+        )
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a plaintext password in the hashing pool"""
+    return await _run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the hashing pool"""
+    return await _run(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password; on success also return a replacement hash when the
+    stored one uses an outdated scheme or cost (else None)
+    """
+    return await _run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+def calibrate_bcrypt_rounds(target_ms: Optional[float] = None) -> int:
+    """
+    Pick the highest bcrypt cost whose hash time stays within ``target_ms``
+    (each extra round doubles the time), clamped to
+    [BCRYPT_ROUNDS, BCRYPT_MAX_ROUNDS], and make it the default.
+    """
+    global pwd_context
+    target_ms = target_ms if target_ms is not None else settings.BCRYPT_TARGET_MS
+    base = settings.BCRYPT_ROUNDS
+
+    started = time.perf_counter()
+    _make_context(base).hash("calibration")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    rounds = base
+    while rounds < settings.BCRYPT_MAX_ROUNDS and elapsed_ms * 2 ** (rounds + 1 - base) <= target_ms:
+        rounds += 1
+
+    pwd_context = _make_context(rounds)
+    logger.info("bcrypt_calibrated", rounds=rounds, base_ms=round(elapsed_ms, 1), target_ms=target_ms)
+    return rounds
+
+
+async def init_password_hashing() -> int:
+    """Startup: calibrate the work factor in the hashing pool"""
+    if not settings.BCRYPT_CALIBRATE:
+        return settings.BCRYPT_ROUNDS
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), calibrate_bcrypt_rounds)
+
+
+def shutdown_password_hashing():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
 def create_access_token(
     user_id: int,
     role: str = "customer",
@@ -42,7 +155,8 @@ def create_access_token(
         "sub": str(user_id),
         "role": role,
         "type": "access",
-        "iat": now,
+        "iat": now.timestamp(),  # sub-second: compared with revocation cutoffs
+        "jti": uuid4().hex,
         "exp": expire,
     }
 
@@ -63,7 +177,8 @@ def create_refresh_token(
     payload = {
         "sub": str(user_id),
         "type": "refresh",
-        "iat": now,
+        "iat": now.timestamp(),
+        "jti": uuid4().hex,
         "exp": expire,
     }
 
@@ -92,6 +207,7 @@ def create_password_reset_token(email: str) -> str:
         "sub": email,
         "type": "password_reset",
         "iat": now,
+        "jti": uuid4().hex,
         "exp": expire,
     }
 
@@ -0,0 +1,290 @@
+"""
+Token revocation — logout / password-reset invalidation of JWTs
+
+Two kinds of revocation:
+  - per token  : ``jti`` stored until the token's own ``exp`` (Redis SET EXAT)
+  - per user   : "every token issued before T" cutoff, kept for the longest
+                 token lifetime (password resets). T and the tokens' ``iat``
+                 are fractional seconds, so a token issued right after the
+                 reset (the re-login) is not caught by it.
+
+Every authenticated request has to ask "is this token revoked?", so each
+worker keeps a local view: a Bloom filter of revoked jtis plus the user
+cutoff map. Workers learn about new revocations over Redis pub/sub and
+reload the full set on (re)subscribe. The common case — a token that was
+never revoked — is answered from memory; only Bloom hits (true revocations
+or ~TOKEN_BLOOM_ERROR_RATE false positives) are confirmed with Redis.
+
+Backends (TOKEN_REVOCATION_BACKEND):
+  - RedisRevocationStore  : shared, multi-worker
+  - MemoryRevocationStore : single process / tests
+"""
+
+import asyncio
+import hashlib
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import structlog
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.utils.redis_client import get_redis, redis_key
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on blake2b)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class MemoryRevocationStore:
+    """In-process revocations (single worker / tests)"""
+
+    def __init__(self):
+        self._jtis: Dict[str, float] = {}
+        self._cutoffs: Dict[int, Tuple[float, float]] = {}
+
+    async def revoke(self, jti: str, exp: float):
+        self._jtis[jti] = exp
+
+    async def revoke_user(self, user_id: int, before: float, ttl: int):
+        self._cutoffs[user_id] = (before, time.time() + ttl)
+
+    async def is_revoked(self, jti: str) -> bool:
+        exp = self._jtis.get(jti)
+        return exp is not None and exp > time.time()
+
+    async def load(self) -> Tuple[List[str], Dict[int, Tuple[float, float]]]:
+        now = time.time()
+        self._jtis = {j: exp for j, exp in self._jtis.items() if exp > now}
+        self._cutoffs = {u: c for u, c in self._cutoffs.items() if c[1] > now}
+        return list(self._jtis), dict(self._cutoffs)
+
+    async def publish(self, message: str):
+        pass  # revoking already updated this process
+
+    async def listen(self, on_message, on_subscribe):
+        await on_subscribe()
+
+    async def clear(self):
+        self._jtis.clear()
+        self._cutoffs.clear()
+
+
+class RedisRevocationStore:
+    """Shared revocations: one key per jti / user, pub/sub for propagation"""
+
+    def __init__(self):
+        self.channel = redis_key("revoked", "events")
+
+    def _jti_key(self, jti: str) -> str:
+        return redis_key("revoked", "jti", jti)
+
+    def _user_key(self, user_id) -> str:
+        return redis_key("revoked", "user", user_id)
+
+    async def revoke(self, jti: str, exp: float):
+        await get_redis().set(self._jti_key(jti), 1, exat=int(exp) + 1)
+
+    async def revoke_user(self, user_id: int, before: float, ttl: int):
+        await get_redis().set(self._user_key(user_id), before, ex=ttl)
+
+    async def is_revoked(self, jti: str) -> bool:
+        return bool(await get_redis().exists(self._jti_key(jti)))
+
+    async def load(self) -> Tuple[List[str], Dict[int, Tuple[float, float]]]:
+        client = get_redis()
+        jti_prefix = self._jti_key("")
+        jtis = [key[len(jti_prefix):] async for key in client.scan_iter(match=jti_prefix + "*")]
+
+        cutoffs: Dict[int, Tuple[float, float]] = {}
+        user_prefix = self._user_key("")
+        now = time.time()
+        async for key in client.scan_iter(match=user_prefix + "*"):
+            before, ttl = await client.get(key), await client.ttl(key)
+            if before is not None and ttl > 0:
+                cutoffs[int(key[len(user_prefix):])] = (float(before), now + ttl)
+        return jtis, cutoffs
+
+    async def publish(self, message: str):
+        await get_redis().publish(self.channel, message)
+
+    async def listen(self, on_message, on_subscribe):
+        pubsub = get_redis().pubsub()
+        try:
+            await pubsub.subscribe(self.channel)
+            # Reload after subscribing so nothing published in between is lost
+            await on_subscribe()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    on_message(message["data"])
+        finally:
+            await pubsub.aclose()
+
+    async def clear(self):
+        client = get_redis()
+        async for key in client.scan_iter(match=redis_key("revoked", "*")):
+            await client.delete(key)
+
+
+_store = None
+_bloom: Optional[BloomFilter] = None
+_cutoffs: Dict[int, Tuple[float, float]] = {}  # user_id → (revoked before, entry expires at)
+
+
+def get_revocation_store():
+    """取得目前設定的撤銷儲存（singleton）"""
+    global _store
+    if _store is None:
+        if settings.TOKEN_REVOCATION_BACKEND == "memory":
+            _store = MemoryRevocationStore()
+        else:
+            _store = RedisRevocationStore()
+    return _store
+
+
+def _new_bloom() -> BloomFilter:
+    return BloomFilter(settings.TOKEN_BLOOM_CAPACITY, settings.TOKEN_BLOOM_ERROR_RATE)
+
+
+def _get_bloom() -> BloomFilter:
+    global _bloom
+    if _bloom is None:
+        _bloom = _new_bloom()
+    return _bloom
+
+
+def _max_token_lifetime() -> int:
+    """Seconds until every token issued now has expired (refresh tokens included)"""
+    return max(settings.REFRESH_TOKEN_EXPIRE_DAYS, settings.ADMIN_REFRESH_TOKEN_EXPIRE_DAYS) * 86400
+
+
+async def reload_revocations():
+    """Rebuild the local Bloom filter / cutoff map from the store"""
+    global _bloom, _cutoffs
+    jtis, cutoffs = await get_revocation_store().load()
+    bloom = _new_bloom()
+    for jti in jtis:
+        bloom.add(jti)
+    _bloom, _cutoffs = bloom, cutoffs
+    logger.info("token_revocations_loaded", jtis=len(jtis), users=len(cutoffs))
+
+
+def _apply(message: str):
+    """Pub/sub message: ``jti <jti>`` or ``user <id> <before> <expires_at>``"""
+    kind, *args = message.split()
+    if kind == "jti":
+        _get_bloom().add(args[0])
+    elif kind == "user":
+        user_id, before, expires_at = int(args[0]), float(args[1]), float(args[2])
+        current = _cutoffs.get(user_id)
+        if current is None or current[0] < before:
+            _cutoffs[user_id] = (before, expires_at)
+
+
+async def revoke_token(payload: dict):
+    """撤銷單一 Token（保留到 Token 本身到期）"""
+    jti, exp = payload.get("jti"), payload.get("exp")
+    if not jti or not exp or exp <= time.time():
+        return
+    store = get_revocation_store()
+    await store.revoke(jti, exp)
+    _apply(f"jti {jti}")
+    await store.publish(f"jti {jti}")
+
+    if _get_bloom().count > settings.TOKEN_BLOOM_CAPACITY:
+        await reload_revocations()  # drop expired jtis, keep the error rate bounded
+
+
+async def revoke_user_tokens(user_id: int, before: Optional[float] = None):
+    """撤銷使用者在 ``before``（預設現在）之前簽發的所有 Token"""
+    before = before if before is not None else time.time()
+    ttl = _max_token_lifetime()
+    message = f"user {user_id} {before} {time.time() + ttl}"
+    store = get_revocation_store()
+    await store.revoke_user(user_id, before, ttl)
+    _apply(message)
+    await store.publish(message)
+
+
+async def is_token_revoked(payload: dict) -> bool:
+    """In-memory check; Redis is consulted only on a Bloom filter hit"""
+    cutoff = _cutoffs.get(int(payload.get("sub") or 0))
+    if cutoff is not None and cutoff[1] > time.time():
+        if payload.get("iat", 0) < cutoff[0]:
+            return True
+
+    jti = payload.get("jti")
+    if not jti or jti not in _get_bloom():
+        return False
+    try:
+        return await get_revocation_store().is_revoked(jti)
+    except RedisError as exc:
+        logger.warning("token_revocation_check_failed", error=str(exc))
+        return True  # fail closed on a (probable) revoked token
+
+
+# ── Pub/sub listener ────────────────────────────────────────
+_listener: Optional[asyncio.Task] = None
+
+
+async def _listen_loop():
+    while True:
+        try:
+            await get_revocation_store().listen(_apply, reload_revocations)
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.error("token_revocation_listener_failed", error=str(exc))
+            await asyncio.sleep(1)
+
+
+def start_revocation_listener():
+    """啟動撤銷同步（app lifespan 呼叫）"""
+    global _listener
+    if _listener is None:
+        _listener = asyncio.create_task(_listen_loop())
+
+
+async def stop_revocation_listener():
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        try:
+            await _listener
+        except asyncio.CancelledError:
+            pass
+        _listener = None
+
+
+async def clear_revocations():
+    """清除所有撤銷紀錄（測試用）"""
+    global _bloom
+    await get_revocation_store().clear()
+    _bloom = None
+    _cutoffs.clear()
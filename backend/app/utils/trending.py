@@ -0,0 +1,235 @@
+"""
+Trending engine — exponentially decayed sales (and view) scores per product
+
+A sale of ``qty`` at time ``t`` adds ``qty · 2^((t - epoch) / half_life)`` to
+the product's score. Growing the *increment* instead of decaying every stored
+score keeps updates O(1) while preserving the ranking of
+``Σ qty · 2^(-(now - t) / half_life)``. When the exponent gets large all
+scores are rescaled once and the epoch moves forward (``rebase``).
+
+Scores are updated incrementally by order creation / cancellation and the
+view-count flush. A cold store (restart, Redis flush) is rebuilt from
+OrderItems of the last TRENDING_WINDOW_DAYS; products without recent sales
+are padded from lifetime ``sold_count``.
+
+Backends:
+  - RedisTrendingStore  : ZSET, ZINCRBY / ZREVRANGE (VIEW_COUNTER_BACKEND=redis)
+  - MemoryTrendingStore : dict + heapq.nlargest
+"""
+
+import heapq
+import time
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import structlog
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.utils.redis_client import get_redis, redis_key
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+MAX_EXPONENT = 512  # rebase before 2^exponent approaches float range
+
+
+class MemoryTrendingStore:
+    """In-process scores"""
+
+    def __init__(self):
+        self._scores: Dict[int, float] = {}
+        self._epoch: Optional[float] = None
+        self._built = False
+
+    async def get_epoch(self) -> float:
+        if self._epoch is None:
+            self._epoch = time.time()
+        return self._epoch
+
+    async def incr(self, deltas: Dict[int, float]):
+        for product_id, delta in deltas.items():
+            self._scores[product_id] = self._scores.get(product_id, 0.0) + delta
+
+    async def top(self, n: int) -> List[Tuple[int, float]]:
+        return heapq.nlargest(n, self._scores.items(), key=itemgetter(1))
+
+    async def rebase(self, new_epoch: float, factor: float):
+        self._scores = {k: v * factor for k, v in self._scores.items()}
+        self._epoch = new_epoch
+
+    async def mark_built(self) -> bool:
+        """True if the caller should (re)build; marks the store as built"""
+        built, self._built = self._built, True
+        return not built
+
+    async def clear(self):
+        self._scores.clear()
+        self._epoch = None
+        self._built = False
+
+
+class RedisTrendingStore:
+    """Shared scores — one ZSET of product_id → decayed score"""
+
+    def __init__(self):
+        self.key = redis_key("trending", "scores")
+        self.epoch_key = redis_key("trending", "epoch")
+        self.built_key = redis_key("trending", "built")
+
+    async def get_epoch(self) -> float:
+        client = get_redis()
+        await client.set(self.epoch_key, time.time(), nx=True)
+        return float(await client.get(self.epoch_key))
+
+    async def incr(self, deltas: Dict[int, float]):
+        async with get_redis().pipeline(transaction=True) as pipe:
+            for product_id, delta in deltas.items():
+                pipe.zincrby(self.key, delta, product_id)
+            await pipe.execute()
+
+    async def top(self, n: int) -> List[Tuple[int, float]]:
+        rows = await get_redis().zrevrange(self.key, 0, n - 1, withscores=True)
+        return [(int(member), score) for member, score in rows]
+
+    async def rebase(self, new_epoch: float, factor: float):
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.zunionstore(self.key, {self.key: factor})
+            pipe.set(self.epoch_key, new_epoch)
+            await pipe.execute()
+
+    async def mark_built(self) -> bool:
+        # No TTL: once built, the ZSET is kept current incrementally. The
+        # claimant starts from an empty ZSET so a rebuild never double-counts.
+        client = get_redis()
+        if not await client.set(self.built_key, 1, nx=True):
+            return False
+        await client.delete(self.key, self.epoch_key)
+        return True
+
+    async def clear(self):
+        await get_redis().delete(self.key, self.epoch_key, self.built_key)
+
+
+_store = None
+
+
+def get_trending_store():
+    """取得目前設定的 trending store（singleton）"""
+    global _store
+    if _store is None:
+        if settings.VIEW_COUNTER_BACKEND == "memory":
+            _store = MemoryTrendingStore()
+        else:
+            _store = RedisTrendingStore()
+    return _store
+
+
+def _timestamp(at: Optional[datetime]) -> float:
+    if at is None:
+        return time.time()
+    if at.tzinfo is None:  # SQLite returns naive UTC datetimes
+        at = at.replace(tzinfo=timezone.utc)
+    return at.timestamp()
+
+
+async def _add(weights: Iterable[Tuple[int, float, float]]):
+    """weights: (product_id, amount, unix time)"""
+    store = get_trending_store()
+    epoch = await store.get_epoch()
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+
+    weights = list(weights)
+    latest = max((at for _, _, at in weights), default=epoch)
+    if (latest - epoch) / half_life > MAX_EXPONENT:
+        factor = 2 ** (-(latest - epoch) / half_life)
+        await store.rebase(latest, factor)
+        epoch = latest
+
+    deltas: Dict[int, float] = {}
+    for product_id, amount, at in weights:
+        deltas[product_id] = deltas.get(product_id, 0.0) + amount * 2 ** ((at - epoch) / half_life)
+    if deltas:
+        await store.incr(deltas)
+
+
+async def record_sales(items: Iterable[Tuple[int, int]], sold_at: Optional[datetime] = None, sign: int = 1):
+    """Add (product_id, quantity) sales made at ``sold_at``; sign=-1 reverses them"""
+    at = _timestamp(sold_at)
+    try:
+        await _add((product_id, sign * qty, at) for product_id, qty in items)
+    except RedisError as exc:
+        logger.warning("trending_update_failed", error=str(exc))
+
+
+async def remove_sales(items: Iterable[Tuple[int, int]], sold_at: Optional[datetime]):
+    """Reverse sales exactly (same timestamp → same weight), e.g. on cancellation"""
+    await record_sales(items, sold_at, sign=-1)
+
+
+async def record_views(counts: Dict[int, int]):
+    """Add flushed view counts with TRENDING_VIEW_WEIGHT"""
+    if settings.TRENDING_VIEW_WEIGHT <= 0 or not counts:
+        return
+    now = time.time()
+    try:
+        await _add(
+            (product_id, views * settings.TRENDING_VIEW_WEIGHT, now)
+            for product_id, views in counts.items()
+        )
+    except RedisError as exc:
+        logger.warning("trending_update_failed", error=str(exc))
+
+
+async def rebuild_trending(db: AsyncSession) -> int:
+    """由近期訂單重建 trending 分數（冷啟動用）"""
+    since = datetime.now(timezone.utc) - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    result = await db.execute(
+        select(OrderItem.product_id, OrderItem.quantity, Order.created_at)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.created_at >= since, Order.status != "cancelled", OrderItem.product_id.is_not(None))
+    )
+    rows = result.all()
+    await _add((row.product_id, row.quantity, _timestamp(row.created_at)) for row in rows)
+    return len(rows)
+
+
+async def trending_product_ids(db: AsyncSession, limit: int) -> List[int]:
+    """
+    熱門商品 id（依衰減分數排序）
+
+    Only active products; padded with lifetime bestsellers when fewer than
+    ``limit`` products have recent sales.
+    """
+    store = get_trending_store()
+    ranked: List[int] = []
+    try:
+        if await store.mark_built():
+            await rebuild_trending(db)
+        # Over-fetch a little to absorb deactivated products
+        ranked = [pid for pid, score in await store.top(limit * 2) if score > 0]
+    except RedisError as exc:
+        logger.warning("trending_read_failed", error=str(exc))
+
+    ids: List[int] = []
+    if ranked:
+        result = await db.execute(
+            select(Product.id).where(Product.id.in_(ranked), Product.is_active.is_(True))
+        )
+        active = set(result.scalars().all())
+        ids = [pid for pid in ranked if pid in active][:limit]
+
+    if len(ids) < limit:
+        query = select(Product.id).where(Product.is_active.is_(True))
+        if ids:
+            query = query.where(Product.id.not_in(ids))
+        result = await db.execute(
+            query.order_by(Product.sold_count.desc(), Product.id.desc()).limit(limit - len(ids))
+        )
+        ids += list(result.scalars().all())
+    return ids
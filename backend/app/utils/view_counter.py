@@ -0,0 +1,229 @@
+"""
+View counter — write-behind buffer for products.view_count
+
+GET /products/:id only records a view in the buffer; a background flusher
+applies all pending deltas every VIEW_FLUSH_INTERVAL seconds in a single
+batched UPDATE, so product pages never write to the hot products row.
+
+Backends:
+  - RedisViewBuffer  : HINCRBY into a shared hash (VIEW_COUNTER_BACKEND=redis)
+  - MemoryViewBuffer : per-process dict (single worker / tests)
+
+Loss bounds on crash:
+  - memory : views recorded since the last flush (≤ VIEW_FLUSH_INTERVAL)
+  - redis  : only a batch drained but not yet committed by a crashing worker;
+             a failed UPDATE puts the batch back into the buffer
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+import structlog
+from redis.exceptions import RedisError
+from sqlalchemy import Integer, case, column, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.product import Product
+from app.utils.redis_client import get_redis, redis_key
+from app.utils.trending import record_views
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+
+class MemoryViewBuffer:
+    """In-process pending view counts"""
+
+    def __init__(self):
+        self._pending: Dict[int, int] = {}
+        self._oldest: Optional[float] = None
+
+    async def record(self, product_id: int) -> int:
+        if self._oldest is None:
+            self._oldest = time.time()
+        self._pending[product_id] = self._pending.get(product_id, 0) + 1
+        return self._pending[product_id]
+
+    async def drain(self) -> Dict[int, int]:
+        pending, self._pending, self._oldest = self._pending, {}, None
+        return pending
+
+    async def restore(self, counts: Dict[int, int]):
+        if self._oldest is None:
+            self._oldest = time.time()
+        for product_id, delta in counts.items():
+            self._pending[product_id] = self._pending.get(product_id, 0) + delta
+
+    async def stats(self) -> dict:
+        return {
+            "pending_products": len(self._pending),
+            "pending_views": sum(self._pending.values()),
+            "oldest_pending_at": self._oldest,
+        }
+
+
+class RedisViewBuffer:
+    """Shared pending view counts — hash of product_id → delta"""
+
+    def __init__(self):
+        self.pending_key = redis_key("views", "pending")
+        self.oldest_key = redis_key("views", "oldest")
+
+    async def record(self, product_id: int) -> int:
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                pipe.hincrby(self.pending_key, product_id, 1)
+                pipe.set(self.oldest_key, time.time(), nx=True)
+                count, _ = await pipe.execute()
+            return int(count)
+        except RedisError as exc:
+            logger.warning("view_record_failed", product_id=product_id, error=str(exc))
+            return 0
+
+    async def drain(self) -> Dict[int, int]:
+        # HGETALL + DEL in one MULTI so concurrent workers never double-apply
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.hgetall(self.pending_key)
+            pipe.delete(self.pending_key, self.oldest_key)
+            raw, _ = await pipe.execute()
+        return {int(k): int(v) for k, v in raw.items()}
+
+    async def restore(self, counts: Dict[int, int]):
+        async with get_redis().pipeline(transaction=True) as pipe:
+            for product_id, delta in counts.items():
+                pipe.hincrby(self.pending_key, product_id, delta)
+            pipe.set(self.oldest_key, time.time(), nx=True)
+            await pipe.execute()
+
+    async def stats(self) -> dict:
+        client = get_redis()
+        counts = await client.hvals(self.pending_key)
+        oldest = await client.get(self.oldest_key)
+        return {
+            "pending_products": len(counts),
+            "pending_views": sum(int(c) for c in counts),
+            "oldest_pending_at": float(oldest) if oldest else None,
+        }
+
+
+_buffer = None
+_last_flush: dict = {"at": None, "products": 0, "views": 0}
+
+
+def get_view_buffer():
+    """取得目前設定的 view buffer（singleton）"""
+    global _buffer
+    if _buffer is None:
+        if settings.VIEW_COUNTER_BACKEND == "memory":
+            _buffer = MemoryViewBuffer()
+        else:
+            _buffer = RedisViewBuffer()
+    return _buffer
+
+
+async def record_view(product_id: int) -> int:
+    """記錄一次瀏覽，回傳該商品尚未寫入 DB 的瀏覽數"""
+    return await get_view_buffer().record(product_id)
+
+
+def _batched_update(dialect_name: str, counts: Dict[int, int]):
+    if dialect_name == "postgresql":
+        # UPDATE products SET view_count = view_count + v.delta FROM (VALUES ...) AS v
+        deltas = values(column("id", Integer), column("delta", Integer), name="v").data(
+            list(counts.items())
+        )
+        return (
+            update(Product)
+            .where(Product.id == deltas.c.id)
+            .values(
+                view_count=Product.view_count + deltas.c.delta,
+                updated_at=Product.updated_at,  # not a content change
+            )
+            .execution_options(synchronize_session=False)
+        )
+    # Portable fallback: one UPDATE with a CASE per product
+    return (
+        update(Product)
+        .where(Product.id.in_(list(counts)))
+        .values(
+            view_count=Product.view_count + case(counts, value=Product.id, else_=0),
+            updated_at=Product.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def flush_view_counts(db: AsyncSession) -> int:
+    """將暫存的瀏覽數批次寫入 products.view_count，回傳更新的商品數"""
+    buffer = get_view_buffer()
+    counts = await buffer.drain()
+    if not counts:
+        return 0
+
+    try:
+        await db.execute(_batched_update(db.get_bind().dialect.name, counts))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await buffer.restore(counts)
+        raise
+
+    await record_views(counts)
+    _last_flush.update(at=time.time(), products=len(counts), views=sum(counts.values()))
+    logger.info("view_counts_flushed", products=len(counts), views=_last_flush["views"])
+    return len(counts)
+
+
+async def view_counter_stats() -> dict:
+    """Lag metrics for the admin dashboard"""
+    stats = await get_view_buffer().stats()
+    oldest = stats.pop("oldest_pending_at")
+    now = time.time()
+    return {
+        **stats,
+        "lag_seconds": round(now - oldest, 3) if oldest else 0.0,
+        "last_flush_at": _last_flush["at"],
+        "last_flush_products": _last_flush["products"],
+        "last_flush_views": _last_flush["views"],
+        "flush_interval": settings.VIEW_FLUSH_INTERVAL,
+    }
+
+
+# ── Background flusher ──────────────────────────────────────
+_flusher: Optional[asyncio.Task] = None
+
+
+async def _flush_loop(session_factory):
+    while True:
+        await asyncio.sleep(settings.VIEW_FLUSH_INTERVAL)
+        try:
+            async with session_factory() as db:
+                await flush_view_counts(db)
+        except Exception as exc:
+            logger.error("view_flush_failed", error=str(exc))
+
+
+def start_view_flusher(session_factory):
+    """啟動背景 flush 任務（app lifespan 呼叫）"""
+    global _flusher
+    if _flusher is None:
+        _flusher = asyncio.create_task(_flush_loop(session_factory))
+
+
+async def stop_view_flusher(session_factory):
+    """停止背景 flush 任務並做最後一次 flush"""
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        try:
+            await _flusher
+        except asyncio.CancelledError:
+            pass
+        _flusher = None
+    try:
+        async with session_factory() as db:
+            await flush_view_counts(db)
+    except Exception as exc:
+        logger.error("view_flush_failed", error=str(exc))
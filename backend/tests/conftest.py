@@ -4,6 +4,7 @@ Uses SQLite in-memory database for fast isolated testing.
 """
 
 import asyncio
+import os
 from datetime import datetime, timezone
 
 import pytest
@@ -14,6 +15,16 @@ from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.types import JSON
 
+# ── Use in-process backends (no Redis server in tests) ──────
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("VIEW_COUNTER_BACKEND", "memory")
+os.environ.setdefault("TOKEN_REVOCATION_BACKEND", "memory")
+os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+os.environ.setdefault("IDEMPOTENCY_BACKEND", "memory")
+os.environ.setdefault("TASK_BACKEND", "memory")
+os.environ.setdefault("CART_BACKEND", "memory")
+os.environ.setdefault("ORDER_EVENTS_BACKEND", "memory")
+
 from app.database import Base, get_db
 from app.main import app
 from app.models.brand import Brand
@@ -24,6 +35,18 @@ from app.models.user import User, UserAddress
 from app.models.wishlist import Wishlist
 from app.models.order import Order, OrderItem, OrderStatusLog
 from app.models.points import PointsTransaction
+from app.utils.cache import get_cache
+from app.utils.cart_store import get_cart_store
+from app.utils.category_tree import invalidate_category_tree
+from app.utils.checkout_config import invalidate_checkout_config
+from app.utils.coupons import invalidate_coupon_snapshot
+from app.utils.idempotency import clear_idempotency
+from app.utils.rate_limit import get_rate_limiter
+from app.tasks import configure_outbox
+from app.utils.search import index_product
+from app.utils.token_revocation import clear_revocations
+from app.utils.trending import get_trending_store
+from app.utils.view_counter import get_view_buffer
 from app.utils.security import create_access_token, hash_password
 
 # ── Map PostgreSQL-specific types to SQLite-compatible ones ──
@@ -52,6 +75,7 @@ async def override_get_db():
 
 
 app.dependency_overrides[get_db] = override_get_db
+configure_outbox(TestSessionLocal)  # in-process task handlers use the test database
 
 
 # ── Event loop ───────────────────────────────────────────────
@@ -71,6 +95,16 @@ async def setup_db():
     yield
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
+    await get_cache().clear()
+    invalidate_category_tree()
+    await get_view_buffer().drain()
+    await get_trending_store().clear()
+    await clear_revocations()
+    await get_rate_limiter().clear()
+    await clear_idempotency()
+    await get_cart_store().clear()
+    invalidate_coupon_snapshot()
+    invalidate_checkout_config()
 
 
 # ── DB Session ───────────────────────────────────────────────
@@ -80,6 +114,12 @@ async def db():
         yield session
 
 
+@pytest.fixture
+def session_factory():
+    """Session factory for code that opens its own sessions (task handlers, relay)."""
+    return TestSessionLocal
+
+
 # ── Async HTTP client ────────────────────────────────────────
 @pytest_asyncio.fixture
 async def client():
@@ -252,6 +292,7 @@ async def test_product(db: AsyncSession, test_brand: Brand, test_category: Categ
         is_active=True,
     )
     db.add(variant)
+    await index_product(db, product)
 
     await db.commit()
     await db.refresh(product)
@@ -271,6 +312,7 @@ async def second_product(db: AsyncSession, test_brand: Brand, test_category: Cat
     )
     db.add(product)
     await db.flush()
+    await index_product(db, product)
     await db.commit()
     await db.refresh(product)
     return product
@@ -11,6 +11,11 @@ Tests for Auth API endpoints:
 
 import pytest
 from httpx import AsyncClient
+from passlib.hash import bcrypt
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.utils import security
+from app.utils.security import create_access_token, create_password_reset_token
 
 API = "/api/v1"
 
@@ -90,6 +95,21 @@ class TestLogin:
         assert data["success"] is True
         assert "access_token" in data["data"]
 
+    async def test_login_upgrades_outdated_hash(
+        self, client: AsyncClient, db: AsyncSession, test_user
+    ):
+        test_user.password_hash = bcrypt.using(rounds=4).hash("Test@12345")
+        await db.commit()
+
+        resp = await client.post(f"{API}/auth/login", json={
+            "email": "testuser@example.com",
+            "password": "Test@12345",
+        })
+        assert resp.status_code == 200
+        await db.refresh(test_user)
+        assert not security.pwd_context.needs_update(test_user.password_hash)
+        assert security.verify_password("Test@12345", test_user.password_hash)
+
     async def test_login_wrong_password(self, client: AsyncClient, test_user):
         resp = await client.post(f"{API}/auth/login", json={
             "email": "testuser@example.com",
@@ -147,6 +167,28 @@ class TestLogout:
         resp = await client.post(f"{API}/auth/logout")
         assert resp.status_code == 401
 
+    async def test_logout_revokes_tokens(self, client: AsyncClient, test_user):
+        login = (await client.post(f"{API}/auth/login", json={
+            "email": "testuser@example.com",
+            "password": "Test@12345",
+        })).json()["data"]
+        headers = {"Authorization": f"Bearer {login['access_token']}"}
+
+        resp = await client.post(
+            f"{API}/auth/logout", headers=headers, json={"refresh_token": login["refresh_token"]}
+        )
+        assert resp.status_code == 200
+
+        assert (await client.get(f"{API}/auth/me", headers=headers)).status_code == 401
+        resp = await client.post(f"{API}/auth/refresh", json={"refresh_token": login["refresh_token"]})
+        assert resp.status_code == 401
+
+    async def test_logout_keeps_other_sessions(self, client: AsyncClient, test_user):
+        other = {"Authorization": f"Bearer {create_access_token(test_user.id)}"}
+        mine = {"Authorization": f"Bearer {create_access_token(test_user.id)}"}
+        await client.post(f"{API}/auth/logout", headers=mine)
+        assert (await client.get(f"{API}/auth/me", headers=other)).status_code == 200
+
 
 # ── Forgot / Reset Password ─────────────────────────────────
 class TestPasswordReset:
@@ -171,6 +213,17 @@ class TestPasswordReset:
         })
         assert resp.status_code == 400
 
+    async def test_reset_password_revokes_existing_tokens(
+        self, client: AsyncClient, auth_headers, test_user
+    ):
+        resp = await client.post(f"{API}/auth/reset-password", json={
+            "token": create_password_reset_token(test_user.email),
+            "password": "NewPass@123",
+            "confirm_password": "NewPass@123",
+        })
+        assert resp.status_code == 200
+        assert (await client.get(f"{API}/auth/me", headers=auth_headers)).status_code == 401
+
 
 # ── Get Current User ─────────────────────────────────────────
 class TestGetMe:
@@ -0,0 +1,141 @@
+"""
+Tests for the response cache (app.utils.cache):
+  - MemoryCacheBackend TTL / tag invalidation
+  - cache key normalization
+  - cached public endpoints + admin purge on write
+"""
+
+import asyncio
+
+from httpx import AsyncClient
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.brand import Brand
+from app.utils import cache as cache_module
+from app.utils.admin_security import create_admin_access_token
+from app.utils.cache import MemoryCacheBackend, get_cache, invalidate_cache_tags, make_cache_key
+
+API = "/api/v1"
+
+
+# ── Backend ──────────────────────────────────────────────────
+class TestMemoryCacheBackend:
+    async def test_set_and_get(self):
+        cache = MemoryCacheBackend()
+        await cache.set("k", {"a": 1}, ttl=60)
+        assert await cache.get("k") == {"a": 1}
+
+    async def test_missing_key(self):
+        cache = MemoryCacheBackend()
+        assert await cache.get("nope") is None
+
+    async def test_expired_entry(self):
+        cache = MemoryCacheBackend()
+        await cache.set("k", 1, ttl=0)
+        await asyncio.sleep(0.01)
+        assert await cache.get("k") is None
+
+    async def test_invalidate_tags(self):
+        cache = MemoryCacheBackend()
+        await cache.set("a", 1, ttl=60, tags=["product:1", "products"])
+        await cache.set("b", 2, ttl=60, tags=["product:2"])
+        removed = await cache.invalidate_tags("product:1")
+        assert removed == 1
+        assert await cache.get("a") is None
+        assert await cache.get("b") == 2
+
+
+class TestCacheKey:
+    def test_key_is_order_independent(self):
+        assert make_cache_key("x", b=2, a=1) == make_cache_key("x", a=1, b=2)
+
+    def test_none_params_dropped(self):
+        assert make_cache_key("x", a=1, b=None) == make_cache_key("x", a=1)
+
+
+# ── Endpoints ────────────────────────────────────────────────
+class TestCachedEndpoints:
+    async def test_brand_list_served_from_cache(
+        self, client: AsyncClient, test_brand, db: AsyncSession
+    ):
+        resp = await client.get(f"{API}/brands")
+        assert len(resp.json()["data"]) == 1
+
+        db.add(Brand(name="Another", slug="another", is_active=True))
+        await db.commit()
+
+        resp = await client.get(f"{API}/brands")
+        assert len(resp.json()["data"]) == 1  # still cached
+
+        await invalidate_cache_tags("brands")
+        resp = await client.get(f"{API}/brands")
+        assert len(resp.json()["data"]) == 2
+
+    async def test_cached_response_matches_fresh(self, client: AsyncClient, test_product):
+        fresh = await client.get(f"{API}/products", params={"per_page": 5})
+        cached = await client.get(f"{API}/products", params={"per_page": 5})
+        assert cached.status_code == 200
+        assert cached.json() == fresh.json()
+
+    async def test_brand_products_tagged(self, client: AsyncClient, test_product, test_brand):
+        await client.get(f"{API}/brands/{test_brand.slug}/products")
+        removed = await get_cache().invalidate_tags(f"product:{test_product.id}")
+        assert removed == 1
+
+    async def test_admin_product_update_purges(
+        self, client: AsyncClient, admin_user, test_product
+    ):
+        await client.get(f"{API}/products")
+        token = create_admin_access_token(admin_user.id, admin_user.role)
+        resp = await client.put(
+            f"{API}/admin/products/{test_product.id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"price": 650},
+        )
+        assert resp.status_code == 200
+
+        resp = await client.get(f"{API}/products")
+        assert resp.json()["data"][0]["price"] == 650.0
+
+
+class TestRedisUnavailable:
+    async def test_versions_failure_degrades(self, monkeypatch):
+        class DownRedis:
+            async def mget(self, keys):
+                raise RedisConnectionError("redis down")
+
+        monkeypatch.setattr(cache_module, "get_redis", lambda: DownRedis())
+        assert await cache_module.RedisCacheBackend().get_versions("products") is None
+
+    async def test_invalidate_is_one_script_call(self, monkeypatch):
+        calls = []
+
+        class DownRedis:
+            def register_script(self, lua):
+                async def run(keys):
+                    calls.append(keys)
+                    raise RedisConnectionError("redis down")
+                return run
+
+        monkeypatch.setattr(cache_module, "get_redis", lambda: DownRedis())
+        backend = cache_module.RedisCacheBackend()
+        assert await backend.invalidate_tags("product:1", "brand:2") == 0
+        assert calls == [[backend._tag_key("product:1"), backend._tag_key("brand:2")]]
+
+    async def test_requests_work_without_versions(
+        self, client: AsyncClient, auth_headers, test_brand, test_cart_item, monkeypatch
+    ):
+        async def unavailable(*tags):
+            return None
+
+        monkeypatch.setattr(get_cache(), "get_versions", unavailable)
+        resp = await client.get(f"{API}/brands")
+        assert resp.status_code == 200
+        assert "etag" not in resp.headers
+
+        resp = await client.get(f"{API}/cart", headers=auth_headers, params={"coupon_code": "NOPE"})
+        assert resp.status_code == 404  # coupon looked up in the database, not the snapshot
+        resp = await client.get(f"{API}/cart", headers=auth_headers)
+        assert resp.status_code == 200
+        assert resp.json()["data"]["subtotal"] == 798
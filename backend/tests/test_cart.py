@@ -4,13 +4,45 @@ Tests for Cart API endpoints:
   POST   /api/v1/cart/items
   PUT    /api/v1/cart/items/:id
   DELETE /api/v1/cart/items/:id
+  POST   /api/v1/cart/coupon
 """
 
+from datetime import datetime, timedelta, timezone
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.cart import CartItem
+from app.models.coupon import Coupon
+from app.models.order import Order
+from app.utils.cache import invalidate_cache_tags
+from app.utils.cart_store import DatabaseCartStore, get_cart_store, write_back_carts
 
 API = "/api/v1"
 
+SHIPPING_ADDRESS = {
+    "recipient_name": "Test User",
+    "phone": "0912345678",
+    "city": "台北市",
+    "district": "信義區",
+    "address": "信義路一段1號",
+}
+
+
+async def _coupon(db: AsyncSession, **fields) -> Coupon:
+    now = datetime.now(timezone.utc)
+    coupon = Coupon(
+        name="Test coupon",
+        starts_at=now - timedelta(days=1),
+        expires_at=now + timedelta(days=1),
+        **fields,
+    )
+    db.add(coupon)
+    await db.commit()
+    return coupon
+
 
 class TestGetCart:
     async def test_get_cart_empty(self, client: AsyncClient, auth_headers):
@@ -122,3 +154,197 @@ class TestRemoveCartItem:
             f"{API}/cart/items/99999", headers=auth_headers
         )
         assert resp.status_code == 404
+
+
+class TestCartQuote:
+    async def test_percentage_coupon_is_exact_and_capped(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        await _coupon(db, code="TEN", discount_type="percentage", discount_value=10)
+        await _coupon(db, code="CAPPED", discount_type="percentage", discount_value=15, max_discount=100)
+
+        resp = await client.post(f"{API}/cart/coupon", headers=auth_headers, json={"code": "ten"})
+        assert resp.status_code == 200
+        data = resp.json()["data"]
+        assert (data["subtotal"], data["discount_amount"], data["total"]) == (798, 79.8, 718.2)
+
+        resp = await client.post(f"{API}/cart/coupon", headers=auth_headers, json={"code": "CAPPED"})
+        assert resp.json()["data"]["discount_amount"] == 100
+
+    async def test_coupon_limited_to_other_products(
+        self, client: AsyncClient, auth_headers, test_cart_item, second_product, db: AsyncSession
+    ):
+        await _coupon(
+            db, code="OTHER", discount_type="fixed", discount_value=50,
+            applicable_products=[second_product.id],
+        )
+        resp = await client.post(f"{API}/cart/coupon", headers=auth_headers, json={"code": "OTHER"})
+        assert resp.status_code == 400
+
+    async def test_points_are_capped_at_the_amount_due(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        await _coupon(db, code="BIG", discount_type="fixed", discount_value=750)
+        resp = await client.get(
+            f"{API}/cart", headers=auth_headers, params={"coupon_code": "BIG", "points_used": 100},
+        )
+        data = resp.json()["data"]
+        assert (data["points_used"], data["total"]) == (48, 0)
+
+    async def test_checkout_charges_the_quote_it_was_shown(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        await _coupon(db, code="TEN", discount_type="percentage", discount_value=10)
+        resp = await client.get(f"{API}/cart", headers=auth_headers, params={
+            "coupon_code": "TEN", "shipping_method": "home_delivery", "points_used": 20,
+        })
+        quote = resp.json()["data"]
+
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json={
+            "shipping_address": SHIPPING_ADDRESS, "coupon_code": "TEN", "points_used": 20,
+            "quote_id": quote["quote_id"],
+        })
+        assert resp.status_code == 201
+        order = await db.get(Order, resp.json()["data"]["order_id"])
+        assert float(order.total) == quote["total"] == 698.2
+        assert float(order.discount) == quote["discount"]
+
+    async def test_checkout_rejects_a_stale_quote(
+        self, client: AsyncClient, auth_headers, test_cart_item, test_product, db: AsyncSession
+    ):
+        resp = await client.get(f"{API}/cart", headers=auth_headers, params={"shipping_method": "home_delivery"})
+        quote_id = resp.json()["data"]["quote_id"]
+
+        test_product.sale_price = 299
+        await db.commit()
+        await invalidate_cache_tags("products")  # what an admin product write does
+
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json={
+            "shipping_address": SHIPPING_ADDRESS, "quote_id": quote_id,
+        })
+        assert resp.status_code == 409
+
+
+class TestCartStore:
+    async def test_changes_are_written_back(
+        self, client: AsyncClient, auth_headers, test_user, test_cart_item, second_product, db: AsyncSession
+    ):
+        resp = await client.post(
+            f"{API}/cart/items", headers=auth_headers, json={"product_id": second_product.id, "quantity": 3}
+        )
+        assert resp.status_code == 201
+        await client.delete(f"{API}/cart/items/{test_cart_item.id}", headers=auth_headers)
+
+        assert await write_back_carts(db) == 1
+        rows = (await db.execute(
+            select(CartItem.product_id, CartItem.quantity).where(CartItem.user_id == test_user.id)
+        )).all()
+        assert rows == [(second_product.id, 3)]
+        assert await write_back_carts(db) == 0
+
+    async def test_cold_cart_is_hydrated_with_row_ids(
+        self, client: AsyncClient, auth_headers, test_user, test_cart_item, db: AsyncSession
+    ):
+        cart = await get_cart_store().load(db, test_user.id)
+        assert [(line.item_id, line.quantity) for line in cart.lines] == [(test_cart_item.id, 2)]
+
+        await client.put(f"{API}/cart/items/{test_cart_item.id}", headers=auth_headers, json={"quantity": 4})
+        updated = await get_cart_store().load(db, test_user.id)
+        assert updated.lines[0].quantity == 4
+        assert updated.version != cart.version
+
+    async def test_checkout_consumes_the_ordered_lines(
+        self, client: AsyncClient, auth_headers, test_user, test_cart_item, db: AsyncSession
+    ):
+        resp = await client.post(
+            f"{API}/orders", headers=auth_headers,
+            json={"shipping_address": SHIPPING_ADDRESS, "payment_method": "cod"},
+        )
+        assert resp.status_code == 201
+        assert (await get_cart_store().load(db, test_user.id)).lines == ()
+
+        await write_back_carts(db)
+        rows = await db.execute(select(CartItem).where(CartItem.user_id == test_user.id))
+        assert rows.scalars().all() == []
+
+    async def test_cart_cards_follow_product_updates(
+        self, client: AsyncClient, auth_headers, test_cart_item, test_product, db: AsyncSession
+    ):
+        resp = await client.get(f"{API}/cart", headers=auth_headers)
+        assert resp.json()["data"]["items"][0]["sale_price"] == 399
+
+        test_product.sale_price = 350
+        await db.commit()
+        await invalidate_cache_tags("products", f"product:{test_product.id}")
+        resp = await client.get(f"{API}/cart", headers=auth_headers)
+        assert resp.json()["data"]["items"][0]["sale_price"] == 350
+        assert resp.json()["data"]["subtotal"] == 700
+
+    async def test_database_backend(self, db: AsyncSession, test_user, test_product):
+        store = DatabaseCartStore()
+        line = await store.add(db, test_user.id, test_product.id, None, 2, max_quantity=50)
+        assert await store.add(db, test_user.id, test_product.id, None, 49, max_quantity=50) is None
+        before = await store.load(db, test_user.id)
+
+        await store.set_quantity(db, test_user.id, line.item_id, 5)
+        after = await store.load(db, test_user.id)
+        assert after.lines[0].quantity == 5 and after.version != before.version
+        assert await store.remove(db, test_user.id, line.item_id) is True
+        assert (await store.load(db, test_user.id)).lines == ()
+
+
+class TestCartBatch:
+    async def test_mixed_operations(
+        self, client: AsyncClient, auth_headers, test_cart_item, test_product, second_product
+    ):
+        resp = await client.post(f"{API}/cart/items:batch", headers=auth_headers, json={"operations": [
+            {"op": "add", "product_id": second_product.id, "quantity": 2},
+            {"op": "set", "product_id": test_product.id, "quantity": 5},
+            {"op": "add", "product_id": test_product.id, "quantity": 1},
+            {"op": "remove", "product_id": 99999},
+            {"op": "add", "product_id": 99999},
+        ]})
+        assert resp.status_code == 200
+        data = resp.json()["data"]
+        assert [(r["status"], r.get("quantity")) for r in data["results"]] == [
+            ("ok", 2), ("ok", 6), ("ok", 6), ("error", None), ("error", None),
+        ]
+        assert data["results"][4]["detail"] == "商品不存在"
+        assert {i["product_id"]: i["quantity"] for i in data["cart"]["items"]} == {
+            test_product.id: 6, second_product.id: 2,
+        }
+        assert data["cart"]["subtotal"] == 399 * 6 + 800 * 2
+
+    async def test_stock_is_checked_over_the_whole_batch(
+        self, client: AsyncClient, auth_headers, test_product, second_product
+    ):
+        resp = await client.post(f"{API}/cart/items:batch", headers=auth_headers, json={"operations": [
+            {"product_id": second_product.id, "quantity": 15},
+            {"product_id": test_product.id, "quantity": 1},
+            {"product_id": second_product.id, "quantity": 10},
+        ]})
+        results = resp.json()["data"]["results"]
+        assert [r["status"] for r in results] == ["error", "ok", "error"]
+        assert results[0]["detail"] == "庫存不足"
+        items = resp.json()["data"]["cart"]["items"]
+        assert [(i["product_id"], i["quantity"]) for i in items] == [(test_product.id, 1)]
+
+    async def test_database_backend_upserts_in_one_statement(
+        self, db: AsyncSession, test_user, test_cart_item, test_product, second_product
+    ):
+        store = DatabaseCartStore()
+        cart = await store.load(db, test_user.id)
+        changes = {(test_product.id, None): 7, (second_product.id, None): 1}
+        assert await store.apply(db, test_user.id, cart.version, changes) is True
+        assert await store.apply(db, test_user.id, cart.version, changes) is False  # stale version
+        await db.commit()
+
+        rows = (await db.execute(
+            select(CartItem.id, CartItem.product_id, CartItem.quantity)
+            .where(CartItem.user_id == test_user.id).order_by(CartItem.id)
+        )).all()
+        assert rows == [(test_cart_item.id, test_product.id, 7), (rows[1].id, second_product.id, 1)]
+
+        cart = await store.load(db, test_user.id)
+        assert await store.apply(db, test_user.id, cart.version, {(test_product.id, None): 0}) is True
+        assert [line.product_id for line in (await store.load(db, test_user.id)).lines] == [second_product.id]
@@ -10,10 +10,31 @@ Tests for Categories and Brands API endpoints:
 
 import pytest
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.category import Category
+from app.models.product import Product
 
 API = "/api/v1"
 
 
+async def _add_subtree(db: AsyncSession, root: Category):
+    """root → child → grandchild, with one product in the grandchild"""
+    child = Category(name="Child", slug="child", parent_id=root.id, is_active=True)
+    db.add(child)
+    await db.flush()
+    grandchild = Category(name="Grandchild", slug="grandchild", parent_id=child.id, is_active=True)
+    db.add(grandchild)
+    await db.flush()
+    product = Product(
+        name="Deep Product", slug="deep-product", price=100, stock=5,
+        category_id=grandchild.id, is_active=True,
+    )
+    db.add(product)
+    await db.commit()
+    return child, grandchild, product
+
+
 # ── Categories ───────────────────────────────────────────────
 class TestCategories:
     async def test_list_categories_empty(self, client: AsyncClient):
@@ -48,6 +69,34 @@ class TestCategories:
         assert "products" in data
         assert len(data["products"]) >= 1
 
+    async def test_category_products_include_all_depths(
+        self, client: AsyncClient, db: AsyncSession, test_category, test_product
+    ):
+        _, _, deep = await _add_subtree(db, test_category)
+        resp = await client.get(f"{API}/categories/{test_category.slug}/products")
+        ids = {p["id"] for p in resp.json()["data"]["products"]}
+        assert ids == {test_product.id, deep.id}
+
+    async def test_tree_nests_grandchildren(
+        self, client: AsyncClient, db: AsyncSession, test_category
+    ):
+        await _add_subtree(db, test_category)
+        resp = await client.get(f"{API}/categories")
+        root = resp.json()["data"][0]
+        assert root["children"][0]["slug"] == "child"
+        assert root["children"][0]["children"][0]["slug"] == "grandchild"
+
+    async def test_tree_rebuilt_after_category_commit(
+        self, client: AsyncClient, db: AsyncSession, test_category
+    ):
+        resp = await client.get(f"{API}/categories/new-cat")
+        assert resp.status_code == 404
+
+        db.add(Category(name="New", slug="new-cat", is_active=True))
+        await db.commit()
+        resp = await client.get(f"{API}/categories/new-cat")
+        assert resp.status_code == 200
+
 
 # ── Brands ───────────────────────────────────────────────────
 class TestBrands:
@@ -80,3 +129,31 @@ class TestBrands:
         data = resp.json()["data"]
         assert "products" in data
         assert len(data["products"]) >= 1
+
+    async def test_category_products_include_all_depths(
+        self, client: AsyncClient, db: AsyncSession, test_category, test_product
+    ):
+        _, _, deep = await _add_subtree(db, test_category)
+        resp = await client.get(f"{API}/categories/{test_category.slug}/products")
+        ids = {p["id"] for p in resp.json()["data"]["products"]}
+        assert ids == {test_product.id, deep.id}
+
+    async def test_tree_nests_grandchildren(
+        self, client: AsyncClient, db: AsyncSession, test_category
+    ):
+        await _add_subtree(db, test_category)
+        resp = await client.get(f"{API}/categories")
+        root = resp.json()["data"][0]
+        assert root["children"][0]["slug"] == "child"
+        assert root["children"][0]["children"][0]["slug"] == "grandchild"
+
+    async def test_tree_rebuilt_after_category_commit(
+        self, client: AsyncClient, db: AsyncSession, test_category
+    ):
+        resp = await client.get(f"{API}/categories/new-cat")
+        assert resp.status_code == 404
+
+        db.add(Category(name="New", slug="new-cat", is_active=True))
+        await db.commit()
+        resp = await client.get(f"{API}/categories/new-cat")
+        assert resp.status_code == 200
@@ -0,0 +1,107 @@
+"""
+Tests for conditional GET (app.utils.etag):
+  - ETag / 304 on catalog and content endpoints
+  - invalidation through cache tag versions and the category tree
+"""
+
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.category import Category
+from app.utils.cache import invalidate_cache_tags
+from app.utils.etag import etag_matches
+from app.utils.view_counter import get_view_buffer
+
+API = "/api/v1"
+
+
+class TestEtagMatching:
+    def test_weak_comparison(self):
+        assert etag_matches('"abc"', 'W/"abc"')
+        assert etag_matches('W/"x", W/"abc"', 'W/"abc"')
+        assert etag_matches("*", 'W/"abc"')
+        assert not etag_matches('W/"other"', 'W/"abc"')
+        assert not etag_matches(None, 'W/"abc"')
+
+
+class TestConditionalGet:
+    async def test_brand_list_304(self, client: AsyncClient, test_brand):
+        resp = await client.get(f"{API}/brands")
+        etag = resp.headers["etag"]
+        assert etag.startswith('W/"')
+
+        resp = await client.get(f"{API}/brands", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.content == b""
+        assert resp.headers["etag"] == etag
+
+    async def test_etag_changes_after_invalidation(self, client: AsyncClient, test_brand):
+        etag = (await client.get(f"{API}/brands")).headers["etag"]
+        await invalidate_cache_tags("brands")
+        resp = await client.get(f"{API}/brands", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["etag"] != etag
+
+    async def test_etag_depends_on_params(self, client: AsyncClient, test_product):
+        first = await client.get(f"{API}/products", params={"page": 1})
+        second = await client.get(f"{API}/products", params={"page": 2})
+        assert first.headers["etag"] != second.headers["etag"]
+
+    async def test_product_detail_304_still_counts_view(
+        self, client: AsyncClient, test_product
+    ):
+        url = f"{API}/products/{test_product.id}"
+        etag = (await client.get(url)).headers["etag"]
+        resp = await client.get(url, headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        pending = await get_view_buffer().drain()
+        assert pending[test_product.id] == 2
+
+    async def test_review_invalidates_product_etag(
+        self, client: AsyncClient, auth_headers, test_product
+    ):
+        url = f"{API}/products/{test_product.id}"
+        etag = (await client.get(url)).headers["etag"]
+        resp = await client.post(
+            f"{url}/reviews", headers=auth_headers, json={"rating": 5, "content": "好吃"}
+        )
+        assert resp.status_code == 201
+        resp = await client.get(url, headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+
+    async def test_order_invalidates_product_etag(
+        self, client: AsyncClient, auth_headers, test_cart_item
+    ):
+        url = f"{API}/products/{test_cart_item.product_id}"
+        etag = (await client.get(url)).headers["etag"]
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json={
+            "shipping_address": {
+                "recipient_name": "Test User",
+                "phone": "0912345678",
+                "city": "台北市",
+                "district": "信義區",
+                "address": "信義路一段1號",
+            },
+            "payment_method": "cod",
+        })
+        assert resp.status_code == 201
+        resp = await client.get(url, headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.json()["data"]["stock"] == 48
+
+    async def test_category_etag_follows_tree(
+        self, client: AsyncClient, db: AsyncSession, test_category
+    ):
+        etag = (await client.get(f"{API}/categories")).headers["etag"]
+        resp = await client.get(f"{API}/categories", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+
+        db.add(Category(name="New", slug="new", is_active=True))
+        await db.commit()
+        resp = await client.get(f"{API}/categories", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+
+    async def test_content_banners_304(self, client: AsyncClient):
+        etag = (await client.get(f"{API}/content/banners")).headers["etag"]
+        resp = await client.get(f"{API}/content/banners", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
@@ -0,0 +1,127 @@
+"""
+Tests for Idempotency-Key handling (app.middleware.idempotency):
+  - replay of a stored response without re-running checkout
+  - key reuse with a different body, failed requests, concurrent duplicates
+  - payment creation deduplicated by Payment.idempotency_key
+"""
+
+import asyncio
+
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.cart import CartItem
+from app.models.order import Order
+from app.models.payment import Payment
+from app.utils.idempotency import clear_idempotency
+
+API = "/api/v1"
+
+ORDER_BODY = {
+    "shipping_address": {
+        "recipient_name": "Test User",
+        "phone": "0912345678",
+        "city": "台北市",
+        "district": "信義區",
+        "address": "信義路一段1號",
+    },
+    "payment_method": "credit_card",
+}
+
+
+async def _count(db: AsyncSession, model) -> int:
+    return (await db.execute(select(func.count()).select_from(model))).scalar()
+
+
+# ── Orders ───────────────────────────────────────────────────
+class TestOrderIdempotency:
+    async def test_retry_replays_response(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        headers = {**auth_headers, "Idempotency-Key": "order-1"}
+        first = await client.post(f"{API}/orders", headers=headers, json=ORDER_BODY)
+        assert first.status_code == 201
+        assert "idempotent-replayed" not in first.headers
+
+        retry = await client.post(f"{API}/orders", headers=headers, json=ORDER_BODY)
+        assert retry.status_code == 201
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert retry.json() == first.json()
+        assert await _count(db, Order) == 1
+
+    async def test_key_reused_for_different_request(
+        self, client: AsyncClient, auth_headers, test_cart_item
+    ):
+        headers = {**auth_headers, "Idempotency-Key": "order-2"}
+        assert (await client.post(f"{API}/orders", headers=headers, json=ORDER_BODY)).status_code == 201
+
+        resp = await client.post(f"{API}/orders", headers=headers, json={**ORDER_BODY, "payment_method": "cod"})
+        assert resp.status_code == 422
+        assert resp.json()["error"]["code"] == "IDEMPOTENCY_KEY_REUSED"
+
+    async def test_failed_request_can_be_retried(
+        self, client: AsyncClient, auth_headers, test_user, test_product, db: AsyncSession
+    ):
+        headers = {**auth_headers, "Idempotency-Key": "order-3"}
+        assert (await client.post(f"{API}/orders", headers=headers, json=ORDER_BODY)).status_code == 400
+
+        db.add(CartItem(user_id=test_user.id, product_id=test_product.id, quantity=1))
+        await db.commit()
+        resp = await client.post(f"{API}/orders", headers=headers, json=ORDER_BODY)
+        assert resp.status_code == 201
+        assert "idempotent-replayed" not in resp.headers
+
+    async def test_concurrent_duplicates_create_one_order(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        headers = {**auth_headers, "Idempotency-Key": "order-4"}
+        responses = await asyncio.gather(
+            *(client.post(f"{API}/orders", headers=headers, json=ORDER_BODY) for _ in range(3))
+        )
+        assert [r.status_code for r in responses] == [201, 201, 201]
+        assert len({r.json()["data"]["order_id"] for r in responses}) == 1
+        assert await _count(db, Order) == 1
+
+    async def test_keys_are_scoped_per_user(self, client: AsyncClient, auth_headers, test_cart_item):
+        headers = {**auth_headers, "Idempotency-Key": "shared"}
+        assert (await client.post(f"{API}/orders", headers=headers, json=ORDER_BODY)).status_code == 201
+        # Anonymous request with the same key is not served the user's order
+        resp = await client.post(f"{API}/orders", headers={"Idempotency-Key": "shared"}, json=ORDER_BODY)
+        assert resp.status_code in (401, 403)
+
+    async def test_key_too_long(self, client: AsyncClient, auth_headers):
+        headers = {**auth_headers, "Idempotency-Key": "x" * 65}
+        resp = await client.post(f"{API}/orders", headers=headers, json=ORDER_BODY)
+        assert resp.status_code == 400
+
+
+# ── Payments ─────────────────────────────────────────────────
+class TestPaymentIdempotency:
+    async def test_duplicate_payment_not_created(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        order = await client.post(f"{API}/orders", headers=auth_headers, json=ORDER_BODY)
+        body = {"order_id": order.json()["data"]["order_id"], "payment_method": "credit_card"}
+        headers = {**auth_headers, "Idempotency-Key": "pay-1"}
+
+        first = await client.post(f"{API}/payments/create", headers=headers, json=body)
+        assert first.status_code == 201
+        replay = await client.post(f"{API}/payments/create", headers=headers, json=body)
+        assert replay.headers["idempotent-replayed"] == "true"
+
+        # Past the replay window the persisted key still prevents a second row
+        await clear_idempotency()
+        again = await client.post(f"{API}/payments/create", headers=headers, json=body)
+        assert again.status_code == 201
+        assert again.json()["data"]["payment_id"] == first.json()["data"]["payment_id"]
+        assert await _count(db, Payment) == 1
+
+    async def test_without_key_each_request_creates_payment(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        order = await client.post(f"{API}/orders", headers=auth_headers, json=ORDER_BODY)
+        body = {"order_id": order.json()["data"]["order_id"], "payment_method": "credit_card"}
+        for _ in range(2):
+            assert (await client.post(f"{API}/payments/create", headers=auth_headers, json=body)).status_code == 201
+        assert await _count(db, Payment) == 2
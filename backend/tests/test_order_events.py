@@ -0,0 +1,97 @@
+"""
+Tests for order status events:
+  GET /api/v1/orders/:id/events (SSE), app.utils.order_events
+"""
+
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import get_settings
+from app.utils import order_events
+from app.utils.order_events import Subscription
+
+API = "/api/v1"
+
+ORDER_BODY = {
+    "shipping_address": {
+        "recipient_name": "Test User",
+        "phone": "0912345678",
+        "city": "台北市",
+        "district": "信義區",
+        "address": "信義路一段1號",
+    },
+    "payment_method": "credit_card",
+}
+
+
+@pytest.fixture
+def short_streams(monkeypatch):
+    """Streams end quickly (the test client reads the whole body)"""
+    settings = get_settings()
+    monkeypatch.setattr(settings, "ORDER_EVENTS_HEARTBEAT", 0.1)
+    monkeypatch.setattr(settings, "ORDER_EVENTS_IDLE_TIMEOUT", 0.3)
+
+
+def _events(body: str) -> list:
+    return [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+
+
+class TestOrderEventStream:
+    async def _order(self, client, auth_headers) -> dict:
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json=ORDER_BODY)
+        assert resp.status_code == 201
+        return resp.json()["data"]
+
+    async def _stream_while(self, client, auth_headers, order_id, action) -> str:
+        async def later():
+            await asyncio.sleep(0.05)
+            await action()
+
+        resp, _ = await asyncio.gather(
+            client.get(f"{API}/orders/{order_id}/events", headers=auth_headers), later()
+        )
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        return resp.text
+
+    async def test_streams_state_then_payment(self, client: AsyncClient, auth_headers, test_cart_item, short_streams):
+        data = await self._order(client, auth_headers)
+
+        async def pay():
+            callback = {"MerchantTradeNo": data["order_number"], "RtnCode": "1", "TradeNo": "T123"}
+            await client.post(f"{API}/payments/callback", data=callback)
+
+        body = await self._stream_while(client, auth_headers, data["order_id"], pay)
+        assert body.startswith("retry: ")
+        assert ": heartbeat" in body
+        events = _events(body)
+        assert [(e["status"], e["payment_status"]) for e in events] == [("pending", "pending"), ("paid", "paid")]
+        assert order_events._subscribers == {}
+
+    async def test_streams_cancellation(self, client: AsyncClient, auth_headers, test_cart_item, short_streams):
+        data = await self._order(client, auth_headers)
+
+        async def cancel():
+            await client.post(f"{API}/orders/{data['order_id']}/cancel", headers=auth_headers)
+
+        body = await self._stream_while(client, auth_headers, data["order_id"], cancel)
+        assert [e["status"] for e in _events(body)] == ["pending", "cancelled"]
+
+    async def test_unknown_order(self, client: AsyncClient, auth_headers):
+        resp = await client.get(f"{API}/orders/99999/events", headers=auth_headers)
+        assert resp.status_code == 404
+        assert order_events._subscribers == {}
+
+
+class TestSubscriptionBuffer:
+    def test_full_buffer_drops_oldest(self):
+        subscription = Subscription(1)
+        size = subscription.queue.maxsize
+        for i in range(size + 4):
+            subscription.put({"order_id": 1, "seq": i})
+
+        seqs = [subscription.queue.get_nowait()["seq"] for _ in range(subscription.queue.qsize())]
+        assert seqs == list(range(4, size + 4))
@@ -12,11 +12,34 @@ from httpx import AsyncClient
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.order import Order, OrderItem, OrderStatusLog
-from app.utils.helpers import generate_order_number
+from app.models.cart import CartItem
+from app.models.coupon import Coupon, CouponUsage, CouponUserCount
+from datetime import datetime, timedelta, timezone
+
+from app.models.order import InventoryHold, Order, OrderItem, OrderStatusLog
+from app.routers import orders as orders_router
+from app.utils.admin_security import create_admin_access_token
+from app.utils.cache import invalidate_cache_tags
+from app.utils.cart_store import get_cart_store
+from app.utils.helpers import is_valid_order_number
+from app.utils.inventory import reserve_stock, sweep_expired_holds
+from app.utils.order_numbers import next_order_number
+from app.utils.pricing import quote_cart
+from app.utils.trending import get_trending_store
 
 API = "/api/v1"
 
+ORDER_BODY = {
+    "shipping_address": {
+        "recipient_name": "Test User",
+        "phone": "0912345678",
+        "city": "台北市",
+        "district": "信義區",
+        "address": "信義路一段1號",
+    },
+    "payment_method": "credit_card",
+}
+
 
 # ── Create Order ─────────────────────────────────────────────
 class TestCreateOrder:
@@ -37,6 +60,31 @@ class TestCreateOrder:
         data = resp.json()["data"]
         assert "order_number" in data
         assert data["order_number"].startswith("PFS")
+        assert is_valid_order_number(data["order_number"])
+
+    async def test_create_and_cancel_order_update_trending(
+        self, client: AsyncClient, auth_headers, test_cart_item
+    ):
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json={
+            "shipping_address": {
+                "recipient_name": "Test User",
+                "phone": "0912345678",
+                "city": "台北市",
+                "district": "信義區",
+                "address": "信義路一段1號",
+            },
+            "payment_method": "credit_card",
+        })
+        assert resp.status_code == 201
+        [(product_id, score)] = await get_trending_store().top(1)
+        assert product_id == test_cart_item.product_id
+        assert score > 0
+
+        order_id = resp.json()["data"]["order_id"]
+        resp = await client.post(f"{API}/orders/{order_id}/cancel", headers=auth_headers)
+        assert resp.status_code == 200
+        [(_, score)] = await get_trending_store().top(1)
+        assert score == pytest.approx(0, abs=1e-9)
 
     async def test_create_order_empty_cart(
         self, client: AsyncClient, auth_headers
@@ -53,6 +101,27 @@ class TestCreateOrder:
         })
         assert resp.status_code == 400
 
+    async def test_cart_changed_during_checkout(
+        self, client: AsyncClient, auth_headers, test_user, test_product, test_cart_item, db: AsyncSession, monkeypatch
+    ):
+        store = get_cart_store()
+
+        async def quote_then_change(db, cart, **kwargs):
+            quote = await quote_cart(db, cart, **kwargs)
+            await store.add(db, test_user.id, test_product.id, None, 1, 99)  # another tab adds one more
+            return quote
+
+        monkeypatch.setattr(orders_router, "quote_cart", quote_then_change)
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json=ORDER_BODY)
+        assert resp.status_code == 409
+        assert (await db.execute(select(Order))).scalar_one_or_none() is None
+
+        monkeypatch.undo()
+        cart = await store.load(db, test_user.id)
+        assert [line.quantity for line in cart.lines] == [3]
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json=ORDER_BODY)
+        assert resp.status_code == 201
+
     async def test_create_order_unauthenticated(self, client: AsyncClient):
         resp = await client.post(f"{API}/orders", json={
             "shipping_address": {
@@ -72,7 +141,7 @@ class TestListOrders:
         """Helper to create an order directly in DB."""
         order = Order(
             user_id=user.id,
-            order_number=generate_order_number(),
+            order_number=await next_order_number(db),
             status="pending",
             subtotal=1000,
             discount=0,
@@ -119,6 +188,42 @@ class TestListOrders:
         )
         assert resp.status_code == 200
 
+    async def test_list_orders_cursor_pagination(
+        self, client: AsyncClient, auth_headers, test_user, db: AsyncSession
+    ):
+        for _ in range(3):
+            await self._create_test_order(db, test_user)
+        first = await client.get(
+            f"{API}/orders", headers=auth_headers, params={"per_page": 2}
+        )
+        meta = first.json()["meta"]
+        assert meta["next_cursor"] is not None
+        assert meta["prev_cursor"] is None
+
+        second = await client.get(
+            f"{API}/orders", headers=auth_headers,
+            params={"per_page": 2, "cursor": meta["next_cursor"]},
+        )
+        assert second.status_code == 200
+        body = second.json()
+        assert len(body["data"]) == 1
+        assert body["meta"]["next_cursor"] is None
+        assert body["meta"]["total"] is None
+        first_ids = {o["id"] for o in first.json()["data"]}
+        assert body["data"][0]["id"] not in first_ids
+
+        back = await client.get(
+            f"{API}/orders", headers=auth_headers,
+            params={"per_page": 2, "cursor": body["meta"]["prev_cursor"]},
+        )
+        assert [o["id"] for o in back.json()["data"]] == [o["id"] for o in first.json()["data"]]
+
+    async def test_list_orders_invalid_cursor(self, client: AsyncClient, auth_headers):
+        resp = await client.get(
+            f"{API}/orders", headers=auth_headers, params={"cursor": "not-a-cursor"}
+        )
+        assert resp.status_code == 400
+
     async def test_list_orders_unauthenticated(self, client: AsyncClient):
         resp = await client.get(f"{API}/orders")
         assert resp.status_code == 401
@@ -131,7 +236,7 @@ class TestGetOrder:
     ):
         order = Order(
             user_id=test_user.id,
-            order_number=generate_order_number(),
+            order_number=await next_order_number(db),
             status="pending",
             subtotal=500,
             discount=0,
@@ -162,6 +267,115 @@ class TestGetOrder:
         assert resp.status_code == 404
 
 
+# ── Stock Reservation ────────────────────────────────────────
+class TestStockReservation:
+    async def test_order_reserves_and_cancel_restores_stock(
+        self, client: AsyncClient, auth_headers, test_cart_item, test_product, db: AsyncSession
+    ):
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json=ORDER_BODY)
+        assert resp.status_code == 201
+        await db.refresh(test_product)
+        assert (test_product.stock, test_product.sold_count) == (48, 102)
+
+        order_id = resp.json()["data"]["order_id"]
+        resp = await client.post(f"{API}/orders/{order_id}/cancel", headers=auth_headers)
+        assert resp.status_code == 200
+        await db.refresh(test_product)
+        assert (test_product.stock, test_product.sold_count) == (50, 100)
+
+    async def test_insufficient_line_fails_whole_order(
+        self, client: AsyncClient, auth_headers, test_user, test_cart_item,
+        test_product, second_product, db: AsyncSession,
+    ):
+        db.add(CartItem(user_id=test_user.id, product_id=second_product.id, quantity=21))
+        await db.commit()
+
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json=ORDER_BODY)
+        assert resp.status_code == 400
+        assert "Second Product" in resp.json()["detail"]
+        assert "Test Product" not in resp.json()["detail"]
+
+        await db.refresh(test_product)
+        await db.refresh(second_product)
+        assert test_product.stock == 50
+        assert second_product.stock == 20
+        count = await db.execute(select(Order).where(Order.user_id == test_user.id))
+        assert count.scalars().all() == []
+
+    async def test_reserve_stock_reports_failed_lines(
+        self, db: AsyncSession, test_product, second_product
+    ):
+        failed = await reserve_stock(
+            db, [(test_product.id, 10), (second_product.id, 15), (second_product.id, 6)]
+        )
+        assert failed == [second_product.id]
+        await db.commit()
+        await db.refresh(test_product)
+        assert test_product.stock == 50  # all-or-nothing
+
+        assert await reserve_stock(db, [(test_product.id, 50), (second_product.id, 20)]) == []
+        await db.commit()
+        await db.refresh(test_product)
+        await db.refresh(second_product)
+        assert (test_product.stock, second_product.stock) == (0, 0)
+
+
+# ── Inventory Holds ──────────────────────────────────────────
+class TestInventoryHolds:
+    async def _hold(self, db: AsyncSession, order_id: int):
+        result = await db.execute(select(InventoryHold).where(InventoryHold.order_id == order_id))
+        return result.scalar_one_or_none()
+
+    async def test_online_payment_places_hold(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json=ORDER_BODY)
+        data = resp.json()["data"]
+        assert data["payment_expires_at"] is not None
+        assert await self._hold(db, data["order_id"]) is not None
+
+    async def test_cod_is_not_held(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json={**ORDER_BODY, "payment_method": "cod"})
+        data = resp.json()["data"]
+        assert data["payment_expires_at"] is None
+        assert await self._hold(db, data["order_id"]) is None
+
+    async def test_sweeper_cancels_expired_orders(
+        self, client: AsyncClient, auth_headers, test_user, test_cart_item, test_product, db: AsyncSession
+    ):
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json={**ORDER_BODY, "points_used": 50})
+        order_id = resp.json()["data"]["order_id"]
+
+        assert await sweep_expired_holds(db) == 0  # not expired yet
+        later = datetime.now(timezone.utc) + timedelta(days=1)
+        assert await sweep_expired_holds(db, now=later) == 1
+
+        order = await db.get(Order, order_id, populate_existing=True)
+        assert order.status == "cancelled"
+        assert await self._hold(db, order_id) is None
+        await db.refresh(test_product)
+        await db.refresh(test_user)
+        assert (test_product.stock, test_product.sold_count) == (50, 100)
+        assert test_user.points == 100
+        logs = await db.execute(select(OrderStatusLog).where(OrderStatusLog.order_id == order_id))
+        assert "付款逾時" in logs.scalars().all()[-1].note
+
+    async def test_paid_order_is_not_swept(
+        self, client: AsyncClient, auth_headers, test_cart_item, test_product, db: AsyncSession
+    ):
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json=ORDER_BODY)
+        data = resp.json()["data"]
+        callback = {"MerchantTradeNo": data["order_number"], "RtnCode": "1", "TradeNo": "T123"}
+        assert (await client.post(f"{API}/payments/callback", data=callback)).status_code == 200
+        assert await self._hold(db, data["order_id"]) is None
+
+        assert await sweep_expired_holds(db, now=datetime.now(timezone.utc) + timedelta(days=1)) == 0
+        await db.refresh(test_product)
+        assert test_product.stock == 48
+
+
 # ── Cancel Order ─────────────────────────────────────────────
 class TestCancelOrder:
     async def test_cancel_pending_order(
@@ -169,7 +383,7 @@ class TestCancelOrder:
     ):
         order = Order(
             user_id=test_user.id,
-            order_number=generate_order_number(),
+            order_number=await next_order_number(db),
             status="pending",
             subtotal=500,
             discount=0,
@@ -192,7 +406,7 @@ class TestCancelOrder:
     ):
         order = Order(
             user_id=test_user.id,
-            order_number=generate_order_number(),
+            order_number=await next_order_number(db),
             status="shipped",
             subtotal=500,
             discount=0,
@@ -214,6 +428,29 @@ class TestCancelOrder:
         resp = await client.post(f"{API}/orders/99999/cancel", headers=auth_headers)
         assert resp.status_code == 404
 
+    async def test_admin_cancel_refunds_points_and_stock(
+        self, client: AsyncClient, auth_headers, admin_user, test_user, test_cart_item, test_product,
+        db: AsyncSession,
+    ):
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json={**ORDER_BODY, "points_used": 30})
+        order_id = resp.json()["data"]["order_id"]
+
+        token = create_admin_access_token(admin_user.id, admin_user.role)
+        resp = await client.put(
+            f"{API}/admin/orders/{order_id}/status",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"status": "cancelled"},
+        )
+        assert resp.status_code == 200
+
+        await db.refresh(test_user)
+        await db.refresh(test_product)
+        assert test_user.points == 100
+        assert test_product.stock == 50
+        assert await db.get(InventoryHold, order_id) is None
+        resp = await client.get(f"{API}/points", headers=auth_headers)
+        assert resp.json()["data"]["points"] == 100  # cached principal dropped
+
 
 # ── Return Request ───────────────────────────────────────────
 class TestReturnOrder:
@@ -222,7 +459,7 @@ class TestReturnOrder:
     ):
         order = Order(
             user_id=test_user.id,
-            order_number=generate_order_number(),
+            order_number=await next_order_number(db),
             status="delivered",
             subtotal=500,
             discount=0,
@@ -249,7 +486,7 @@ class TestReturnOrder:
     ):
         order = Order(
             user_id=test_user.id,
-            order_number=generate_order_number(),
+            order_number=await next_order_number(db),
             status="pending",
             subtotal=500,
             discount=0,
@@ -270,3 +507,76 @@ class TestReturnOrder:
             json={"reason": "商品瑕疵"},
         )
         assert resp.status_code == 400
+
+
+# ── Coupon Redemption ────────────────────────────────────────
+class TestCouponRedemption:
+    async def _coupon(self, db: AsyncSession, **fields) -> Coupon:
+        now = datetime.now(timezone.utc)
+        coupon = Coupon(
+            code="SAVE50", name="Save 50", discount_type="fixed", discount_value=50,
+            starts_at=now - timedelta(days=1), expires_at=now + timedelta(days=1), **fields,
+        )
+        db.add(coupon)
+        await db.commit()
+        return coupon
+
+    async def _checkout(self, client: AsyncClient, auth_headers, product_id: int):
+        await client.post(f"{API}/cart/items", headers=auth_headers, json={"product_id": product_id, "quantity": 1})
+        return await client.post(f"{API}/orders", headers=auth_headers, json={**ORDER_BODY, "coupon_code": "SAVE50"})
+
+    async def test_usage_limit_is_reserved_atomically(
+        self, client: AsyncClient, auth_headers, test_product, db: AsyncSession
+    ):
+        coupon = await self._coupon(db, usage_limit=1, usage_per_user=5)
+        assert (await self._checkout(client, auth_headers, test_product.id)).status_code == 201
+
+        resp = await self._checkout(client, auth_headers, test_product.id)
+        assert resp.status_code == 400
+        assert resp.json()["detail"] == "優惠券已失效或已使用完畢"
+        await db.refresh(coupon)
+        assert coupon.used_count == 1
+
+    async def test_usage_per_user_is_enforced(
+        self, client: AsyncClient, auth_headers, test_user, test_product, db: AsyncSession
+    ):
+        coupon = await self._coupon(db, usage_per_user=1)
+        assert (await self._checkout(client, auth_headers, test_product.id)).status_code == 201
+
+        resp = await self._checkout(client, auth_headers, test_product.id)
+        assert resp.status_code == 400
+        assert resp.json()["detail"] == "此優惠券每人限用 1 次"
+        await db.refresh(coupon)
+        assert coupon.used_count == 1  # the failed checkout gave its reservation back
+        counter = await db.get(CouponUserCount, (coupon.id, test_user.id))
+        assert counter.used_count == 1
+
+    async def test_cancel_gives_the_use_back(
+        self, client: AsyncClient, auth_headers, test_user, test_product, db: AsyncSession
+    ):
+        coupon = await self._coupon(db, usage_limit=1)
+        resp = await self._checkout(client, auth_headers, test_product.id)
+        order_id = resp.json()["data"]["order_id"]
+        assert (await client.post(f"{API}/orders/{order_id}/cancel", headers=auth_headers)).status_code == 200
+
+        await db.refresh(coupon)
+        assert coupon.used_count == 0
+        assert (await db.get(CouponUserCount, (coupon.id, test_user.id))).used_count == 0
+        assert (await db.execute(select(CouponUsage))).scalars().all() == []
+        assert (await self._checkout(client, auth_headers, test_product.id)).status_code == 201
+
+    async def test_preview_reads_the_snapshot_until_coupons_change(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        coupon = await self._coupon(db)
+        resp = await client.post(f"{API}/cart/coupon", headers=auth_headers, json={"code": "save50"})
+        assert resp.json()["data"]["discount_amount"] == 50
+
+        coupon.discount_value = 80
+        await db.commit()
+        resp = await client.post(f"{API}/cart/coupon", headers=auth_headers, json={"code": "SAVE50"})
+        assert resp.json()["data"]["discount_amount"] == 50  # no database read
+
+        await invalidate_cache_tags("coupons")
+        resp = await client.post(f"{API}/cart/coupon", headers=auth_headers, json={"code": "SAVE50"})
+        assert resp.json()["data"]["discount_amount"] == 80
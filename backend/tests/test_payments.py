@@ -0,0 +1,209 @@
+"""
+Tests for the payment callback inbox:
+  POST /api/v1/payments/callback
+  app.tasks.payments (apply / replay), app.utils.ecpay (CheckMacValue)
+"""
+
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order, OrderStatusLog
+from app.models.payment import Payment, PaymentCallback
+from app.tasks import publish_events
+from app.tasks.payments import replay_payment_callbacks
+from app.utils.admin_security import create_admin_access_token
+from app.utils import ecpay
+from app.utils.ecpay import CheckMacSigner
+
+API = "/api/v1"
+
+ORDER_BODY = {
+    "shipping_address": {
+        "recipient_name": "Test User",
+        "phone": "0912345678",
+        "city": "台北市",
+        "district": "信義區",
+        "address": "信義路一段1號",
+    },
+    "payment_method": "credit_card",
+}
+
+
+async def _order(client: AsyncClient, auth_headers) -> dict:
+    resp = await client.post(f"{API}/orders", headers=auth_headers, json=ORDER_BODY)
+    assert resp.status_code == 201
+    return resp.json()["data"]
+
+
+async def _callback(client: AsyncClient, order_number: str, rtn_code="1", trade_no="T123", **extra) -> str:
+    data = {"MerchantTradeNo": order_number, "RtnCode": rtn_code, "TradeNo": trade_no, **extra}
+    resp = await client.post(f"{API}/payments/callback", data=data)
+    assert resp.status_code == 200
+    return resp.json()["data"]["message"]
+
+
+async def _paid_logs(db: AsyncSession, order_id: int) -> int:
+    logs = await db.execute(
+        select(OrderStatusLog).where(OrderStatusLog.order_id == order_id, OrderStatusLog.to_status == "paid")
+    )
+    return len(logs.scalars().all())
+
+
+class TestPaymentCallback:
+    async def test_callback_is_stored_and_applied(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        data = await _order(client, auth_headers)
+        assert await _callback(client, data["order_number"]) == "1|OK"
+
+        order = await db.get(Order, data["order_id"], populate_existing=True)
+        assert (order.status, order.payment_status) == ("paid", "paid")
+        callback = (await db.execute(select(PaymentCallback))).scalar_one()
+        assert (callback.trade_no, callback.outcome) == ("T123", "paid")
+        assert callback.processed_at is not None
+
+    async def test_redelivered_notification_is_dropped(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        data = await _order(client, auth_headers)
+        assert await _callback(client, data["order_number"]) == "1|OK"
+        assert await _callback(client, data["order_number"]) == "1|OK"
+
+        assert len((await db.execute(select(PaymentCallback))).scalars().all()) == 1
+        assert await _paid_logs(db, data["order_id"]) == 1
+
+    async def test_late_failure_does_not_undo_payment(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        data = await _order(client, auth_headers)
+        await _callback(client, data["order_number"])
+        await _callback(client, data["order_number"], rtn_code="10100058")
+
+        order = await db.get(Order, data["order_id"], populate_existing=True)
+        assert order.payment_status == "paid"
+        outcomes = (await db.execute(select(PaymentCallback.outcome).order_by(PaymentCallback.id))).scalars().all()
+        assert outcomes == ["paid", "ignored"]
+
+    async def test_atm_account_issued_then_paid(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        data = await _order(client, auth_headers)
+        await _callback(client, data["order_number"], rtn_code="2", vAccount="9103522175887271")
+
+        order = await db.get(Order, data["order_id"], populate_existing=True)
+        assert (order.status, order.payment_status) == ("pending", "pending")
+        payment = (await db.execute(select(Payment))).scalar_one()
+        assert (payment.status, payment.gateway_response["vAccount"]) == ("pending", "9103522175887271")
+
+        await _callback(client, data["order_number"])
+        await db.refresh(order)
+        assert (order.status, order.payment_status) == ("paid", "paid")
+        payment = (await db.execute(select(Payment).execution_options(populate_existing=True))).scalar_one()
+        assert payment.status == "completed"
+        outcomes = (await db.execute(select(PaymentCallback.outcome).order_by(PaymentCallback.id))).scalars().all()
+        assert outcomes == ["issued", "paid"]
+
+    async def test_order_with_several_payments(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        data = await _order(client, auth_headers)
+        for key in ("first", "second"):
+            body = {"order_id": data["order_id"], "payment_method": "credit_card", "idempotency_key": key}
+            assert (await client.post(f"{API}/payments/create", headers=auth_headers, json=body)).status_code == 201
+
+        await _callback(client, data["order_number"])
+        statuses = (await db.execute(
+            select(Payment.status).where(Payment.order_id == data["order_id"]).order_by(Payment.id)
+        )).scalars().all()
+        assert statuses == ["pending", "completed"]
+
+    async def test_paid_order_moves_on_through_admin(
+        self, client: AsyncClient, auth_headers, admin_user, test_cart_item, db: AsyncSession
+    ):
+        data = await _order(client, auth_headers)
+        await _callback(client, data["order_number"])
+
+        headers = {"Authorization": f"Bearer {create_admin_access_token(admin_user.id, admin_user.role)}"}
+        for next_status in ("processing", "shipped"):
+            resp = await client.put(
+                f"{API}/admin/orders/{data['order_id']}/status", headers=headers, json={"status": next_status}
+            )
+            assert resp.status_code == 200
+        order = await db.get(Order, data["order_id"], populate_existing=True)
+        assert order.status == "shipped"
+
+    async def test_unknown_order_is_recorded(self, client: AsyncClient, db: AsyncSession):
+        assert await _callback(client, "PF-UNKNOWN") == "1|OK"
+        callback = (await db.execute(select(PaymentCallback))).scalar_one()
+        assert callback.outcome == "order_not_found"
+
+
+class TestCheckMacValue:
+    # Example from ECPay's CheckMacValue documentation (stage HashKey / HashIV)
+    PARAMS = {
+        "ChoosePayment": "ALL",
+        "EncryptType": "1",
+        "ItemName": "Apple iphone 15",
+        "MerchantID": "3002607",
+        "MerchantTradeDate": "2023/03/12 15:30:23",
+        "MerchantTradeNo": "ecpay20230312153023",
+        "PaymentType": "aio",
+        "ReturnURL": "https://www.ecpay.com.tw/receive.php",
+        "TotalAmount": "30000",
+        "TradeDesc": "促銷方案",
+    }
+
+    def test_sign_matches_gateway(self):
+        signer = CheckMacSigner("pwFHCqoQZGmho4w6", "EkRm7iFT261dpevs")
+        assert signer.sign(self.PARAMS) == "6C51C9E6888DE861FD62FB1DD17029FC742634498FD813DC43D4243B5685B840"
+        assert signer.verify({**self.PARAMS, "CheckMacValue": signer.sign(self.PARAMS).lower()})
+        assert not signer.verify({**self.PARAMS, "TotalAmount": "1", "CheckMacValue": signer.sign(self.PARAMS)})
+
+    async def test_forged_callback_is_rejected(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession, monkeypatch
+    ):
+        signer = CheckMacSigner("pwFHCqoQZGmho4w6", "EkRm7iFT261dpevs")
+        monkeypatch.setattr(ecpay, "_signer", signer)
+        data = await _order(client, auth_headers)
+
+        assert await _callback(client, data["order_number"], CheckMacValue="0" * 64) == "0|CheckMacValue Error"
+        assert (await db.execute(select(PaymentCallback))).scalar_one_or_none() is None
+
+        fields = {"MerchantTradeNo": data["order_number"], "RtnCode": "1", "TradeNo": "T123"}
+        assert await _callback(client, data["order_number"], CheckMacValue=signer.sign(fields)) == "1|OK"
+        order = await db.get(Order, data["order_id"], populate_existing=True)
+        assert order.payment_status == "paid"
+
+
+class TestReplay:
+    async def test_replay_applies_stranded_callbacks(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        data = await _order(client, auth_headers)
+        # Stored, but its event never made it (e.g. written by hand after an outage)
+        db.add(PaymentCallback(
+            gateway="ecpay", trade_no="T9", rtn_code="1", merchant_trade_no=data["order_number"], payload={}
+        ))
+        await db.commit()
+
+        event_ids = await replay_payment_callbacks(db)
+        await db.commit()
+        await publish_events(*event_ids)
+
+        order = await db.get(Order, data["order_id"], populate_existing=True)
+        assert order.payment_status == "paid"
+
+    async def test_replaying_processed_callbacks_is_idempotent(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        data = await _order(client, auth_headers)
+        await _callback(client, data["order_number"])
+
+        event_ids = await replay_payment_callbacks(db, order_number=data["order_number"], include_processed=True)
+        await db.commit()
+        await publish_events(*event_ids)
+
+        callback = (await db.execute(select(PaymentCallback).execution_options(populate_existing=True))).scalar_one()
+        assert callback.outcome == "duplicate"
+        assert await _paid_logs(db, data["order_id"]) == 1
@@ -8,8 +8,18 @@ Tests for Products API endpoints:
   POST /api/v1/products/:id/reviews
 """
 
+from datetime import datetime, timedelta, timezone
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order, OrderItem
+from app.models.product import ProductImage
+from app.utils.admin_security import create_admin_access_token
+from app.utils.search import query_terms, tokenize
+from app.utils.trending import get_trending_store, record_sales, remove_sales
+from app.utils.view_counter import flush_view_counts
 
 API = "/api/v1"
 
@@ -30,6 +40,20 @@ class TestListProducts:
         assert len(products) >= 1
         assert products[0]["name"] == "Test Product"
 
+    async def test_list_products_card_fields(
+        self, client: AsyncClient, db: AsyncSession, test_product
+    ):
+        db.add(ProductImage(product_id=test_product.id, url="https://example.com/cover.jpg", sort_order=-1))
+        await db.commit()
+
+        resp = await client.get(f"{API}/products")
+        card = resp.json()["data"][0]
+        assert card["brand_name"] == "Test Brand"
+        assert card["category_name"] == "Test Category"
+        assert card["primary_image"] == "https://example.com/cover.jpg"
+        assert card["sale_price"] == 399.0
+        assert "description" not in card
+
     async def test_list_products_filter_by_category(
         self, client: AsyncClient, test_product, test_category
     ):
@@ -70,6 +94,23 @@ class TestListProducts:
         assert meta["page"] == 1
         assert meta["per_page"] == 5
 
+    async def test_list_products_cursor_rejects_other_sort(
+        self, client: AsyncClient, test_product, second_product
+    ):
+        params = {"sort_by": "price", "sort_order": "asc", "per_page": 1}
+        first = await client.get(f"{API}/products", params=params)
+        cursor = first.json()["meta"]["next_cursor"]
+        assert cursor is not None
+
+        resp = await client.get(f"{API}/products", params={**params, "cursor": cursor})
+        assert resp.status_code == 200
+        assert resp.json()["data"][0]["id"] == second_product.id
+
+        resp = await client.get(
+            f"{API}/products", params={**params, "sort_order": "desc", "cursor": cursor}
+        )
+        assert resp.status_code == 400
+
 
 # ── Search Products ──────────────────────────────────────────
 class TestSearchProducts:
@@ -90,6 +131,60 @@ class TestSearchProducts:
         resp = await client.get(f"{API}/products/search")
         assert resp.status_code == 422
 
+    async def test_search_cjk_tag(self, client: AsyncClient, test_product):
+        resp = await client.get(f"{API}/products/search", params={"q": "有機"})
+        assert [p["id"] for p in resp.json()["data"]] == [test_product.id]
+
+    async def test_search_latin_prefix(self, client: AsyncClient, test_product):
+        resp = await client.get(f"{API}/products/search", params={"q": "prod"})
+        assert len(resp.json()["data"]) == 1
+
+    async def test_name_match_ranks_first(
+        self, client: AsyncClient, test_product, second_product
+    ):
+        # "second" only appears in second_product's name; "product" in both
+        resp = await client.get(f"{API}/products/search", params={"q": "second product"})
+        assert [p["id"] for p in resp.json()["data"]] == [second_product.id]
+
+        resp = await client.get(f"{API}/products/search", params={"q": "testing"})
+        assert [p["id"] for p in resp.json()["data"]] == [test_product.id]
+
+    async def test_admin_update_reindexes(
+        self, client: AsyncClient, admin_user, test_product
+    ):
+        token = create_admin_access_token(admin_user.id, admin_user.role)
+        resp = await client.put(
+            f"{API}/admin/products/{test_product.id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"name": "北海道洋芋片"},
+        )
+        assert resp.status_code == 200
+
+        resp = await client.get(f"{API}/products/search", params={"q": "洋芋"})
+        assert [p["id"] for p in resp.json()["data"]] == [test_product.id]
+
+    async def test_brand_rename_reindexes(
+        self, client: AsyncClient, db: AsyncSession, test_product, second_product, test_brand
+    ):
+        test_brand.name = "卡樂比"
+        await db.commit()
+
+        resp = await client.get(f"{API}/products/search", params={"q": "卡樂比"})
+        assert {p["id"] for p in resp.json()["data"]} == {test_product.id, second_product.id}
+
+
+class TestSearchTokenizer:
+    def test_cjk_unigrams_and_bigrams(self):
+        assert tokenize("洋芋片") == ["洋", "芋", "片", "洋芋", "芋片"]
+
+    def test_latin_lowercased_and_normalized(self):
+        assert tokenize("Ｃalbee 100g") == ["calbee", "100g"]
+
+    def test_query_terms(self):
+        assert query_terms("洋芋片 Choc") == [("洋芋", False), ("芋片", False), ("choc", True)]
+        assert query_terms("糖") == [("糖", False)]
+        assert query_terms("!!!") == []
+
 
 # ── Trending Products ────────────────────────────────────────
 class TestTrendingProducts:
@@ -103,6 +198,55 @@ class TestTrendingProducts:
         resp = await client.get(f"{API}/products/trending", params={"limit": 5})
         assert resp.status_code == 200
 
+    async def test_falls_back_to_sold_count(
+        self, client: AsyncClient, test_product, second_product
+    ):
+        resp = await client.get(f"{API}/products/trending")
+        ids = [p["id"] for p in resp.json()["data"]]
+        assert ids == [test_product.id, second_product.id]
+
+    async def test_recent_sales_outrank_lifetime_bestseller(
+        self, client: AsyncClient, test_product, second_product
+    ):
+        await record_sales([(second_product.id, 3)])
+        resp = await client.get(f"{API}/products/trending")
+        ids = [p["id"] for p in resp.json()["data"]]
+        assert ids == [second_product.id, test_product.id]
+
+    async def test_older_sales_decay(self, client: AsyncClient, test_product, second_product):
+        # 4 units three half-lives ago weigh 0.5 < 1 unit now
+        await record_sales([(test_product.id, 4)], datetime.now(timezone.utc) - timedelta(hours=72))
+        await record_sales([(second_product.id, 1)])
+        top = await get_trending_store().top(2)
+        assert [pid for pid, _ in top] == [second_product.id, test_product.id]
+        assert top[1][1] == pytest.approx(top[0][1] / 2)
+
+    async def test_remove_sales_is_exact(self, second_product):
+        sold_at = datetime.now(timezone.utc) - timedelta(hours=5)
+        await record_sales([(second_product.id, 2)], sold_at)
+        await remove_sales([(second_product.id, 2)], sold_at)
+        [(_, score)] = await get_trending_store().top(1)
+        assert score == pytest.approx(0, abs=1e-9)
+
+    async def test_cold_store_rebuilds_from_orders(
+        self, client: AsyncClient, db: AsyncSession, test_user, test_product, second_product
+    ):
+        order = Order(
+            user_id=test_user.id, order_number="PFS-TRENDING", status="pending",
+            subtotal=800, total=800, payment_method="credit_card", shipping_address={},
+        )
+        db.add(order)
+        await db.flush()
+        db.add(OrderItem(
+            order_id=order.id, product_id=second_product.id, product_name=second_product.name,
+            unit_price=800, quantity=1, subtotal=800,
+        ))
+        await db.commit()
+
+        resp = await client.get(f"{API}/products/trending")
+        ids = [p["id"] for p in resp.json()["data"]]
+        assert ids[0] == second_product.id
+
 
 # ── Product Detail ───────────────────────────────────────────
 class TestProductDetail:
@@ -128,6 +272,38 @@ class TestProductDetail:
         data = resp.json()["data"]
         assert data["view_count"] > initial_views
 
+    async def test_view_is_buffered_then_flushed(
+        self, client: AsyncClient, db: AsyncSession, test_product, second_product
+    ):
+        for _ in range(3):
+            await client.get(f"{API}/products/{test_product.id}")
+        await client.get(f"{API}/products/{second_product.id}")
+
+        # GET is read-only: the row is untouched until the flush
+        await db.refresh(test_product)
+        assert test_product.view_count == 500
+
+        assert await flush_view_counts(db) == 2
+        await db.refresh(test_product)
+        await db.refresh(second_product)
+        assert test_product.view_count == 503
+        assert second_product.view_count == 1
+        assert await flush_view_counts(db) == 0
+
+    async def test_view_counter_lag_metric(
+        self, client: AsyncClient, admin_user, test_product
+    ):
+        await client.get(f"{API}/products/{test_product.id}")
+        token = create_admin_access_token(admin_user.id, admin_user.role)
+        resp = await client.get(
+            f"{API}/admin/dashboard/view-counter",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert resp.status_code == 200
+        stats = resp.json()["data"]
+        assert stats["pending_views"] == 1
+        assert stats["lag_seconds"] >= 0
+
 
 # ── Reviews ──────────────────────────────────────────────────
 class TestReviews:
@@ -0,0 +1,123 @@
+"""
+Tests for rate limiting (app.utils.rate_limit, app.middleware.rate_limit):
+  - rate string parsing and GCRA accounting
+  - global per-IP / per-user API limit (middleware)
+  - per-route limits enforced before the DB session is opened
+"""
+
+import pytest
+from httpx import AsyncClient
+
+from app.database import get_db
+from app.main import app
+from app.utils import rate_limit
+from app.utils.rate_limit import MemoryRateLimiter, client_ip, parse_rate
+from app.utils.security import create_access_token
+
+API = "/api/v1"
+
+
+# ── Parsing / algorithm ──────────────────────────────────────
+class TestRateParsing:
+    def test_parse_rates(self):
+        assert parse_rate("5/minute") == parse_rate("5 / minutes")
+        rate = parse_rate("10/5minutes")
+        assert (rate.limit, rate.period) == (10, 300)
+        assert parse_rate("3/hour").interval == 1200
+
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            parse_rate("often")
+        with pytest.raises(ValueError):
+            parse_rate("0/minute")
+
+
+class TestGcra:
+    async def test_burst_then_reject(self):
+        limiter = MemoryRateLimiter()
+        rate = parse_rate("3/minute")
+        results = [await limiter.hit("k", rate) for _ in range(4)]
+        assert [r.allowed for r in results] == [True, True, True, False]
+        assert [r.remaining for r in results[:3]] == [2, 1, 0]
+        assert results[3].retry_after == pytest.approx(20, abs=0.5)
+        assert results[3].headers()["Retry-After"] == "20"
+
+    async def test_keys_are_independent(self):
+        limiter = MemoryRateLimiter()
+        rate = parse_rate("1/minute")
+        assert (await limiter.hit("a", rate)).allowed
+        assert (await limiter.hit("b", rate)).allowed
+        assert not (await limiter.hit("a", rate)).allowed
+
+
+class TestClientIp:
+    def test_forwarded_for_ignored_without_trusted_proxy(self):
+        headers = {"x-forwarded-for": "1.2.3.4"}
+        assert client_ip(headers, ("203.0.113.9", 5000)) == "203.0.113.9"
+
+    def test_forwarded_for_from_trusted_proxy(self, monkeypatch):
+        monkeypatch.setattr(rate_limit.settings, "TRUSTED_PROXIES", ["10.0.0.0/8"])
+        headers = {"x-forwarded-for": "6.6.6.6, 198.51.100.7, 10.0.0.2"}
+        assert client_ip(headers, ("10.0.0.1", 5000)) == "198.51.100.7"
+        assert client_ip(headers, ("203.0.113.9", 5000)) == "203.0.113.9"
+
+
+# ── Middleware ───────────────────────────────────────────────
+class TestApiLimit:
+    async def test_headers_and_429(self, client: AsyncClient, monkeypatch):
+        monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_API", "2/minute")
+        first = await client.get(f"{API}/brands")
+        assert first.headers["x-ratelimit-limit"] == "2"
+        assert first.headers["x-ratelimit-remaining"] == "1"
+        await client.get(f"{API}/brands")
+
+        resp = await client.get(f"{API}/brands")
+        assert resp.status_code == 429
+        assert resp.json()["error"]["code"] == "RATE_LIMITED"
+        assert int(resp.headers["retry-after"]) >= 1
+
+    async def test_authenticated_users_have_own_bucket(
+        self, client: AsyncClient, monkeypatch, test_user, admin_user
+    ):
+        monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_API", "1/minute")
+        user_headers = {"Authorization": f"Bearer {create_access_token(test_user.id)}"}
+        other_headers = {"Authorization": f"Bearer {create_access_token(admin_user.id)}"}
+
+        assert (await client.get(f"{API}/points", headers=user_headers)).status_code == 200
+        assert (await client.get(f"{API}/points", headers=other_headers)).status_code == 200
+        assert (await client.get(f"{API}/points", headers=user_headers)).status_code == 429
+
+    async def test_disabled(self, client: AsyncClient, monkeypatch):
+        monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_API", "1/minute")
+        monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_ENABLED", False)
+        for _ in range(3):
+            assert (await client.get(f"{API}/brands")).status_code == 200
+
+
+# ── Route limits ─────────────────────────────────────────────
+class TestRouteLimits:
+    async def test_login_limited_before_db(self, client: AsyncClient, monkeypatch, test_user):
+        monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_LOGIN", "1/minute")
+        credentials = {"email": "testuser@example.com", "password": "wrong-password"}
+        assert (await client.post(f"{API}/auth/login", json=credentials)).status_code == 401
+
+        async def no_db():
+            raise AssertionError("DB session opened for a rate-limited request")
+            yield
+
+        original = app.dependency_overrides[get_db]
+        app.dependency_overrides[get_db] = no_db
+        try:
+            resp = await client.post(f"{API}/auth/login", json=credentials)
+        finally:
+            app.dependency_overrides[get_db] = original
+        assert resp.status_code == 429
+        assert "retry-after" in resp.headers
+
+    async def test_search_route_headers_take_precedence(
+        self, client: AsyncClient, monkeypatch, test_product
+    ):
+        monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_SEARCH", "7/minute")
+        resp = await client.get(f"{API}/products/search", params={"q": "test"})
+        assert resp.status_code == 200
+        assert resp.headers.get_list("x-ratelimit-limit") == ["7"]
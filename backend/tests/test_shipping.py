@@ -0,0 +1,62 @@
+"""
+Tests for shipping methods / checkout config snapshot:
+  GET /api/v1/shipping-methods
+  shipping fees in GET /api/v1/cart
+"""
+
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.shipping import ShippingMethod
+from app.utils.cache import invalidate_cache_tags
+
+API = "/api/v1"
+
+
+async def _methods(db: AsyncSession):
+    methods = [
+        ShippingMethod(name="超商取貨", code="convenience-store", fee=60, free_threshold=700, sort_order=2),
+        ShippingMethod(name="宅配到府", code="home-delivery", fee=100, free_threshold=1500, sort_order=1),
+        ShippingMethod(name="停用", code="retired", fee=10, is_active=False, sort_order=0),
+    ]
+    db.add_all(methods)
+    await db.commit()
+    return methods
+
+
+class TestShippingMethods:
+    async def test_lists_active_methods_and_rules(self, client: AsyncClient, db: AsyncSession):
+        await _methods(db)
+        resp = await client.get(f"{API}/shipping-methods")
+        assert resp.status_code == 200
+        data = resp.json()["data"]
+        assert [m["code"] for m in data["methods"]] == ["home-delivery", "convenience-store"]
+        assert data["methods"][0]["fee"] == 100
+        assert (data["free_shipping_threshold"], data["default_shipping_fee"]) == (1500, 100)
+
+        resp = await client.get(f"{API}/shipping-methods", headers={"If-None-Match": resp.headers["ETag"]})
+        assert resp.status_code == 304
+
+    async def test_snapshot_reloads_on_version_bump(self, client: AsyncClient, db: AsyncSession):
+        home = (await _methods(db))[1]
+        await client.get(f"{API}/shipping-methods")
+
+        home.fee = 120
+        await db.commit()
+        resp = await client.get(f"{API}/shipping-methods")
+        assert resp.json()["data"]["methods"][0]["fee"] == 100  # served from the snapshot
+
+        await invalidate_cache_tags("shipping-methods")  # what the admin settings endpoints do
+        resp = await client.get(f"{API}/shipping-methods")
+        assert resp.json()["data"]["methods"][0]["fee"] == 120
+
+    async def test_cart_prices_shipping_from_the_snapshot(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession
+    ):
+        await _methods(db)
+        resp = await client.get(f"{API}/cart", headers=auth_headers, params={"shipping_method": "home-delivery"})
+        assert (resp.json()["data"]["shipping_fee"], resp.json()["data"]["total"]) == (100, 898)
+
+        # 798 is over the convenience-store free_threshold (700)
+        resp = await client.get(f"{API}/cart", headers=auth_headers, params={"shipping_method": "convenience-store"})
+        assert resp.json()["data"]["shipping_fee"] == 0
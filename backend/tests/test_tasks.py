@@ -0,0 +1,148 @@
+"""
+Tests for the transactional outbox and order_created / order_paid handlers (TASK_BACKEND=memory)
+"""
+
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.outbox import OutboxEvent, OutboxReceipt
+from app.models.points import PointsTransaction
+from app.tasks import orders as order_tasks
+from app.tasks import add_event, relay_outbox, run_handler
+from app.utils.admin_security import create_admin_access_token
+
+API = "/api/v1"
+
+ORDER_BODY = {
+    "shipping_address": {
+        "recipient_name": "Test User",
+        "phone": "0912345678",
+        "city": "台北市",
+        "district": "信義區",
+        "address": "信義路一段1號",
+    },
+    "payment_method": "cod",
+}
+
+
+class TestOrderCreatedEvent:
+    async def _checkout(self, client, auth_headers, **extra):
+        resp = await client.post(f"{API}/orders", headers=auth_headers, json={**ORDER_BODY, **extra})
+        assert resp.status_code == 201
+        return resp.json()["data"]
+
+    async def _admin(self, client, admin_user, order_id, next_status):
+        headers = {"Authorization": f"Bearer {create_admin_access_token(admin_user.id, admin_user.role)}"}
+        resp = await client.put(f"{API}/admin/orders/{order_id}/status", headers=headers, json={"status": next_status})
+        assert resp.status_code == 200
+
+    async def test_checkout_publishes_and_runs_handlers(
+        self, client: AsyncClient, auth_headers, test_user, test_cart_item, db: AsyncSession, monkeypatch
+    ):
+        sent = []
+
+        async def fake_send(to, subject, body):
+            sent.append((to, subject))
+            return True
+
+        monkeypatch.setattr(order_tasks, "send_email", fake_send)
+        data = await self._checkout(client, auth_headers)
+
+        event = (await db.execute(select(OutboxEvent))).scalar_one()
+        assert (event.event_type, event.aggregate_id) == ("order_created", data["order_id"])
+        assert event.published_at is not None
+        receipts = (await db.execute(select(OutboxReceipt.handler))).scalars().all()
+        assert set(receipts) == {"send_order_confirmation", "record_order_sales"}
+
+        assert sent == [(test_user.email, f"[Popular Food Shop] 訂單確認 {data['order_number']}")]
+        resp = await client.get(f"{API}/points", headers=auth_headers)
+        assert resp.json()["data"]["points"] == 100  # nothing earned before payment
+
+    async def test_payment_earns_points(
+        self, client: AsyncClient, auth_headers, admin_user, test_cart_item, db: AsyncSession
+    ):
+        data = await self._checkout(client, auth_headers)
+        await self._admin(client, admin_user, data["order_id"], "paid")
+
+        event = (await db.execute(select(OutboxEvent).where(OutboxEvent.event_type == "order_paid"))).scalar_one()
+        assert await db.get(OutboxReceipt, (event.id, "earn_order_points")) is not None
+        resp = await client.get(f"{API}/points", headers=auth_headers)
+        assert resp.json()["data"]["points"] == 100 + int(data["total"] * 0.01)
+
+    async def test_redelivered_task_is_a_no_op(
+        self, client: AsyncClient, auth_headers, admin_user, test_cart_item, db: AsyncSession, session_factory
+    ):
+        data = await self._checkout(client, auth_headers)
+        await self._admin(client, admin_user, data["order_id"], "paid")
+        event_id = (await db.execute(select(OutboxEvent.id).where(OutboxEvent.event_type == "order_paid"))).scalar_one()
+
+        assert await run_handler("earn_order_points", event_id, session_factory) is False
+        earns = await db.execute(select(PointsTransaction).where(PointsTransaction.type == "earn"))
+        assert len(earns.scalars().all()) == 1
+
+    async def test_failed_handler_can_be_retried(
+        self, client: AsyncClient, auth_headers, test_cart_item, db: AsyncSession, session_factory, monkeypatch
+    ):
+        async def smtp_down(to, subject, body):
+            raise ConnectionError("smtp down")
+
+        monkeypatch.setattr(order_tasks, "send_email", smtp_down)
+        await self._checkout(client, auth_headers)
+        event_id = (await db.execute(select(OutboxEvent.id))).scalar_one()
+        assert await db.get(OutboxReceipt, (event_id, "send_order_confirmation")) is None
+        assert await db.get(OutboxReceipt, (event_id, "record_order_sales")) is not None
+
+        monkeypatch.undo()
+        assert await run_handler("send_order_confirmation", event_id, session_factory) is True
+
+    async def test_cancel_takes_back_earned_points(
+        self, client: AsyncClient, auth_headers, admin_user, test_user, test_cart_item, db: AsyncSession
+    ):
+        data = await self._checkout(client, auth_headers)
+        await self._admin(client, admin_user, data["order_id"], "paid")
+        resp = await client.post(f"{API}/orders/{data['order_id']}/cancel", headers=auth_headers)
+        assert resp.status_code == 200
+
+        await db.refresh(test_user)
+        assert test_user.points == 100
+
+    async def test_cancel_after_points_are_spent(
+        self, client: AsyncClient, auth_headers, admin_user, test_user, test_product, test_cart_item, db: AsyncSession
+    ):
+        first = await self._checkout(client, auth_headers)
+        await self._admin(client, admin_user, first["order_id"], "paid")
+        await db.refresh(test_user)
+        earned = test_user.points - 100
+        assert earned > 0
+
+        # Every point, the earned ones included, goes into a second order
+        resp = await client.post(f"{API}/cart/items", headers=auth_headers, json={"product_id": test_product.id, "quantity": 2})
+        assert resp.status_code == 201
+        await self._checkout(client, auth_headers, points_used=test_user.points)
+        await db.refresh(test_user)
+        assert test_user.points == 0
+
+        await self._admin(client, admin_user, first["order_id"], "cancelled")
+        await db.refresh(test_user)
+        assert test_user.points == 0
+        clawback = (await db.execute(
+            select(PointsTransaction).where(PointsTransaction.reference_id == first["order_id"], PointsTransaction.amount <= 0)
+        )).scalar_one()
+        assert (clawback.amount, clawback.balance_after) == (0, 0)
+        assert f"點數不足 {earned} 點" in clawback.description
+
+
+class TestOutboxRelay:
+    async def test_relay_publishes_missed_events(self, db: AsyncSession, session_factory):
+        event = await add_event(db, "order_created", 0, {"lines": [], "created_at": "2026-10-17T00:00:00+00:00"})
+        await db.commit()
+
+        async with session_factory() as relay_db:
+            assert await relay_outbox(relay_db) == 1
+        async with session_factory() as relay_db:
+            assert await relay_outbox(relay_db) == 0
+
+        await db.refresh(event)
+        assert event.published_at is not None
+        assert await db.get(OutboxReceipt, (event.id, "record_order_sales")) is not None
@@ -14,6 +14,10 @@ Tests for Users API endpoints:
 import pytest
 from httpx import AsyncClient
 
+from app.utils.admin_security import create_admin_access_token
+from app.utils.cache import get_cache
+from app.utils.principal import Principal
+
 API = "/api/v1"
 
 
@@ -33,6 +37,41 @@ class TestProfile:
         assert resp.status_code == 401
 
 
+# ── Principal Cache ──────────────────────────────────────────
+class TestPrincipalCache:
+    async def test_principal_is_cached(self, client: AsyncClient, auth_headers, test_user):
+        resp = await client.get(f"{API}/points", headers=auth_headers)
+        assert resp.status_code == 200
+        cached = await get_cache().get(f"principal:{test_user.id}")
+        principal = Principal.from_list(cached)
+        assert principal.id == test_user.id
+        assert principal.points == test_user.points
+
+    async def test_profile_update_invalidates(self, client: AsyncClient, auth_headers, test_user):
+        await client.get(f"{API}/auth/me", headers=auth_headers)
+        await client.put(f"{API}/users/profile", headers=auth_headers, json={"first_name": "New"})
+        assert await get_cache().get(f"principal:{test_user.id}") is None
+
+        resp = await client.get(f"{API}/auth/me", headers=auth_headers)
+        assert resp.json()["data"]["first_name"] == "New"
+
+    async def test_admin_deactivation_applies_immediately(
+        self, client: AsyncClient, auth_headers, test_user, admin_user
+    ):
+        assert (await client.get(f"{API}/points", headers=auth_headers)).status_code == 200
+
+        token = create_admin_access_token(admin_user.id, admin_user.role)
+        resp = await client.put(
+            f"{API}/admin/users/{test_user.id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"is_active": False},
+        )
+        assert resp.status_code == 200
+
+        resp = await client.get(f"{API}/points", headers=auth_headers)
+        assert resp.status_code == 403
+
+
 # ── Password Change ──────────────────────────────────────────
 class TestPasswordChange:
     async def test_change_password_success(self, client: AsyncClient, auth_headers):
@@ -2,25 +2,39 @@
 Tests for utility functions: security, helpers, pagination
 """
 
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 
 import pytest
-
+from sqlalchemy import select
+from passlib.hash import bcrypt
+
+from app.models.brand import Brand
+from app.models.order import Order
+from app.utils.cache import invalidate_cache_tags
+from app.utils import security
+from app.utils.pagination import count_total, paginate
 from app.utils.security import (
+    calibrate_bcrypt_rounds,
     create_access_token,
     create_password_reset_token,
     create_refresh_token,
     decode_token,
     hash_password,
+    hash_password_async,
+    verify_and_update_password,
     verify_password,
+    verify_password_async,
     verify_password_reset_token,
 )
+from app.utils.token_revocation import BloomFilter, is_token_revoked, revoke_user_tokens
 from app.utils.helpers import (
     format_price,
     generate_order_number,
     generate_random_code,
     generate_slug,
+    is_valid_order_number,
 )
+from app.utils.order_numbers import OrderNumberAllocator
 
 
 # ── Password Hashing ────────────────────────────────────────
@@ -43,6 +57,59 @@ class TestPasswordHashing:
         h2 = hash_password("SamePass1!")
         assert h1 != h2  # bcrypt uses random salt
 
+    async def test_async_roundtrip(self):
+        hashed = await hash_password_async("AsyncPass1!")
+        assert await verify_password_async("AsyncPass1!", hashed) is True
+        assert await verify_password_async("WrongPass1!", hashed) is False
+
+    async def test_outdated_cost_is_upgraded(self):
+        cheap = bcrypt.using(rounds=4).hash("OldPass1!")
+        verified, new_hash = await verify_and_update_password("OldPass1!", cheap)
+        assert verified is True
+        assert new_hash is not None and verify_password("OldPass1!", new_hash)
+
+        verified, new_hash = await verify_and_update_password("OldPass1!", hash_password("OldPass1!"))
+        assert verified is True and new_hash is None
+
+    async def test_backpressure_rejects_when_queue_full(self, monkeypatch):
+        from fastapi import HTTPException
+
+        monkeypatch.setattr(security.settings, "PASSWORD_HASH_MAX_PENDING", 0)
+        with pytest.raises(HTTPException) as exc:
+            await hash_password_async("x")
+        assert exc.value.status_code == 503
+
+    def test_calibration_respects_bounds(self, monkeypatch):
+        original = security.pwd_context
+        try:
+            assert calibrate_bcrypt_rounds(target_ms=0) == security.settings.BCRYPT_ROUNDS
+            monkeypatch.setattr(security.settings, "BCRYPT_MAX_ROUNDS", security.settings.BCRYPT_ROUNDS + 1)
+            assert calibrate_bcrypt_rounds(target_ms=10**9) == security.settings.BCRYPT_ROUNDS + 1
+        finally:
+            security.pwd_context = original
+
+
+# ── Token Revocation ────────────────────────────────────────
+class TestTokenRevocation:
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+        assert all(f"jti-{i}" in bloom for i in range(1000))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        assert false_positives < 300  # ~1% expected
+
+    async def test_user_cutoff_only_hits_older_tokens(self):
+        old = decode_token(create_access_token(7))
+        await revoke_user_tokens(7, before=old["iat"] + 0.001)
+        assert await is_token_revoked(old) is True
+        assert await is_token_revoked({**old, "sub": "8"}) is False
+
+    async def test_token_issued_after_cutoff_in_same_second(self):
+        await revoke_user_tokens(7)
+        fresh = decode_token(create_access_token(7))  # e.g. the re-login after a reset
+        assert await is_token_revoked(fresh) is False
+
 
 # ── JWT Tokens ───────────────────────────────────────────────
 class TestJWTTokens:
@@ -99,13 +166,32 @@ class TestHelpers:
         assert " " not in generate_slug("spaces in here")
 
     def test_generate_order_number_format(self):
-        order_num = generate_order_number()
-        assert order_num.startswith("PFS")
-        assert len(order_num) == 17  # PFS + 8 date + 6 random
-
-    def test_generate_order_number_uniqueness(self):
-        numbers = {generate_order_number() for _ in range(50)}
-        assert len(numbers) == 50  # All unique
+        order_num = generate_order_number(123, datetime(2026, 10, 17, tzinfo=timezone.utc))
+        assert order_num.startswith("PFS20261017000123")
+        assert len(order_num) == 18  # PFS + 8 date + 6 sequence + check digit
+        assert is_valid_order_number(order_num)
+
+    def test_order_number_check_digit_catches_typos(self):
+        order_num = generate_order_number(4567)
+        typo = order_num[:-3] + str((int(order_num[-3]) + 1) % 10) + order_num[-2:]
+        swapped = order_num[:-3] + order_num[-2] + order_num[-3] + order_num[-1]
+        assert not is_valid_order_number(typo)
+        assert not is_valid_order_number(swapped)  # ...67 → ...76
+        assert not is_valid_order_number("PFS20261017ABC123")
+
+    async def test_order_number_allocator_blocks(self, db):
+        allocator = OrderNumberAllocator(block_size=3)
+        values = [await allocator.allocate(db) for _ in range(7)]
+        assert values == sorted(set(values))  # unique and monotonic
+        assert allocator._local_blocks == 3  # one fetch per block
+
+    async def test_order_number_allocator_resumes_after_restart(self, db, test_user):
+        db.add(Order(
+            user_id=test_user.id, order_number=generate_order_number(41), status="pending",
+            subtotal=0, total=0, payment_method="cod", shipping_address={},
+        ))
+        await db.commit()
+        assert await OrderNumberAllocator(block_size=3).allocate(db) == 42
 
     def test_generate_random_code_default_length(self):
         code = generate_random_code()
@@ -122,3 +208,42 @@ class TestHelpers:
 
     def test_format_price_usd(self):
         assert format_price(29.99, "USD") == "$29.99"
+
+
+# ── Pagination Counts ───────────────────────────────────────
+class TestPaginationCount:
+    async def _add_brands(self, db, *slugs):
+        db.add_all([Brand(name=slug, slug=slug, is_active=True) for slug in slugs])
+        await db.commit()
+
+    async def test_later_pages_reuse_cached_count(self, db):
+        await self._add_brands(db, "a", "b", "c")
+        query = select(Brand)
+        _, meta = await paginate(db, query, page=1, per_page=2)
+        assert meta.total == 3
+
+        await self._add_brands(db, "d")
+        _, meta = await paginate(db, query, page=2, per_page=2)
+        assert meta.total == 3  # not recounted
+        _, meta = await paginate(db, query, page=1, per_page=2)
+        assert meta.total == 4  # page 1 refreshes
+
+    async def test_count_keyed_by_filter(self, db):
+        await self._add_brands(db, "a", "b")
+        await count_total(db, select(Brand))
+        total, _ = await count_total(db, select(Brand).where(Brand.slug == "a"), page=2)
+        assert total == 1
+
+    async def test_cached_count_purged_by_table_tag(self, db):
+        await self._add_brands(db, "a", "b")
+        await count_total(db, select(Brand))
+        await self._add_brands(db, "c")
+        await invalidate_cache_tags("brands")
+        total, _ = await count_total(db, select(Brand), page=2)
+        assert total == 3
+
+    async def test_estimate_falls_back_to_exact(self, db):
+        await self._add_brands(db, "a", "b")
+        _, meta = await paginate(db, select(Brand), exact=False)
+        assert meta.total == 2
+        assert meta.total_exact is True